@@ -1,13 +1,17 @@
-from flask import Flask, render_template, jsonify, current_app
+from flask import Flask, render_template, jsonify, current_app, Response
 from flask_cors import CORS
 from src.auth import auth_bp, configure_auth
 from src.models import Base, engine, User, get_db
+from src.metrics import registry
+from src.logging_config import configure_logging
 import os
 from contextlib import closing
 from sqlalchemy import func
 from flask import jsonify, request
 from src.models import User, Subject, ProfessorProfile, GoogleDriveCredentials
 
+configure_logging()
+
 app = Flask(__name__, 
     static_url_path='',
     static_folder='static',
@@ -44,11 +48,26 @@ from src.chat_bot_endpoints import chat_bp
 # Add these with your other blueprint registrations
 app.register_blueprint(chat_bp)
 
+from src.llm.providers import check_configuration
+
+# A misconfigured LLM provider only breaks chat; report it at start-up
+check_configuration()
+
 from src.faq_routes import faq_bp
+from src.faq_store import faq_exporter
 
 # Add this with your other blueprint registrations
 app.register_blueprint(faq_bp)
 
+# Export FAQ changes left unexported by a previous run
+faq_exporter.start()
+
+from src.jobs import job_workers
+
+# Knowledge base builds run in `python -m src.jobs` (with the off-peak
+# scheduler); workers start here only if JOB_WORKERS is set
+job_workers.start()
+
 @app.route('/register')
 def register():
     return render_template('register_page/register.html')
@@ -150,6 +169,12 @@ def submit_contact():
 
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: chat stage latencies and LLM provider latencies"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.context_processor
 def inject_js_type():
     return dict(js_type='module' if not app.debug else 'text/javascript')
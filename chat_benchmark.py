@@ -0,0 +1,76 @@
+"""
+chat_benchmark.py
+Load test for the chat query path.
+Start the mock LLM (python -m src.llm.mock_server) and the app with
+LLM_PROVIDER=mock, then:
+
+    python chat_benchmark.py --subject 6 --requests 200 --concurrency 8
+"""
+
+import argparse
+import statistics
+import threading
+import time
+import requests
+
+
+def run(base_url: str, subject: int, total: int, concurrency: int, question: str):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker():
+        # Each worker is its own chat session
+        client = requests.Session()
+        client.post(f"{base_url}/chat/initialize/{subject}").raise_for_status()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                response = client.post(
+                    f"{base_url}/chat/query/{subject}",
+                    json={"question": question}
+                )
+                response.raise_for_status()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"Requests: {len(latencies)} ok, {len(errors)} failed in {elapsed:.2f}s")
+    if latencies:
+        latencies.sort()
+        print(f"Throughput: {len(latencies) / elapsed:.2f} req/s")
+        print(f"Latency p50: {statistics.median(latencies) * 1000:.0f} ms")
+        print(f"Latency p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+        print(f"Latency p99: {latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f} ms")
+    if errors:
+        print("First error:", errors[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /chat/query throughput")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--subject", type=int, required=True)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--question", default="What are the main topics of this course?")
+    args = parser.parse_args()
+    run(args.base_url, args.subject, args.requests, args.concurrency, args.question)
+
+
+if __name__ == "__main__":
+    main()
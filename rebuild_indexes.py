@@ -0,0 +1,138 @@
+"""
+rebuild_indexes.py
+Rebuild every subject's knowledge base, e.g. after changing EMBEDDING_MODEL,
+CHUNK_SIZE or CHUNK_OVERLAP.
+Subjects are queued as knowledge base jobs, most recently queried first, and
+built by a pool of job workers sized to the machine's cores and memory.
+Subjects whose published index already matches the current settings are
+skipped, so running the command again after an interruption resumes it.
+
+    python rebuild_indexes.py                  # rebuild subjects built with other settings
+    python rebuild_indexes.py --force          # rebuild every subject
+    python rebuild_indexes.py --dry-run        # list what would be rebuilt
+    python rebuild_indexes.py --enqueue-only   # leave the builds to python -m src.jobs
+"""
+
+import argparse
+import os
+import time
+from typing import List, Optional, Tuple
+import psutil
+from src.config import settings
+from src.models import KBJob, SessionLocal, Subject
+from src.kb_builder import buildable_subjects, reusable_manifest
+from src.vector_store import index_fingerprint
+from src.logging_config import configure_logging
+from src import jobs
+
+FINISHED = ('succeeded', 'failed')
+
+
+def is_current(subject: Subject) -> bool:
+    """Whether the subject's published index was built with the current settings"""
+    return reusable_manifest(subject.professor_id, subject.id) is not None
+
+
+def pool_size(requested: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Worker count bounded by physical cores and by available memory
+
+    Returns:
+        tuple: (workers, math library threads per worker)
+    """
+    cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    by_memory = psutil.virtual_memory().available // (settings.KB_WORKER_MEMORY_MB * 1024 * 1024)
+    workers = requested or max(1, min(cores, by_memory))
+    return workers, max(1, cores // workers)
+
+
+def wait_for(job_ids: List[str], pool: jobs.JobWorkers, interval: float) -> List[KBJob]:
+    """Print progress until every job has finished, replacing workers that die; returns the jobs"""
+    while True:
+        pool.start()
+        db = SessionLocal()
+        try:
+            rows = db.query(KBJob).filter(KBJob.id.in_(job_ids)).all()
+            db.expunge_all()
+        finally:
+            db.close()
+
+        finished = sum(1 for job in rows if job.status in FINISHED)
+        running = sum(1 for job in rows if job.status == 'running')
+        failed = sum(1 for job in rows if job.status == 'failed')
+        print(f"{finished}/{len(job_ids)} done, {running} running, {failed} failed", flush=True)
+        if finished >= len(job_ids):
+            return rows
+        time.sleep(interval)
+
+
+def format_summary(finished: List[KBJob], skipped: int, workers: int, seconds: float) -> str:
+    succeeded = [job for job in finished if job.status == 'succeeded']
+    failed = [job for job in finished if job.status == 'failed']
+    chunks = sum((job.result or {}).get("document_count", 0) for job in succeeded)
+    files = sum((job.result or {}).get("file_count", 0) for job in succeeded)
+    build_seconds = [(job.result or {}).get("seconds", 0.0) for job in succeeded]
+
+    lines = [
+        f"Rebuilt {len(succeeded)} subjects, {len(failed)} failed, {skipped} already current "
+        f"in {seconds / 60:.1f} min with {workers} workers",
+        f"  {files} files, {chunks} chunks",
+    ]
+    if seconds > 0:
+        lines.append(f"  {len(succeeded) / seconds * 3600:.1f} subjects/hour, {chunks / seconds:.1f} chunks/s")
+    if build_seconds:
+        lines.append(f"  build time per subject: mean {sum(build_seconds) / len(build_seconds):.1f}s, "
+                     f"max {max(build_seconds):.1f}s")
+    for job in failed:
+        lines.append(f"  subject {job.subject_id} failed: {job.error}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild subject knowledge bases")
+    parser.add_argument("--force", action="store_true", help="rebuild subjects that are already current")
+    parser.add_argument("--professor-id", type=int, help="only this professor's subjects")
+    parser.add_argument("--workers", type=int, help="worker processes (default: sized to cores and memory)")
+    parser.add_argument("--dry-run", action="store_true", help="list subjects without queuing builds")
+    parser.add_argument("--enqueue-only", action="store_true", help="queue builds and exit")
+    parser.add_argument("--interval", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    configure_logging()
+    db = SessionLocal()
+    try:
+        subjects = buildable_subjects(db, args.professor_id)
+        todo = [subject for subject in subjects if args.force or not is_current(subject)]
+        skipped = len(subjects) - len(todo)
+        print(f"{len(todo)} of {len(subjects)} subjects to rebuild for {index_fingerprint()}")
+
+        if args.dry_run:
+            for subject in todo:
+                print(f"  {subject.id}  {subject.name}")
+            return
+
+        # Most recently queried first, all below builds requested from the dashboard (priority 0)
+        job_ids = []
+        for rank, subject in enumerate(todo):
+            job, _ = jobs.enqueue(db, subject.id, subject.professor_id, priority=-(rank + 1),
+                                  trigger='bulk', full_rebuild=True)
+            job_ids.append(job.id)
+    finally:
+        db.close()
+
+    if args.enqueue_only or not job_ids:
+        return
+
+    workers, threads = pool_size(args.workers)
+    print(f"Starting {workers} workers, {threads} threads each")
+    pool = jobs.JobWorkers(workers, threads=threads)
+    started = time.monotonic()
+    try:
+        finished = wait_for(job_ids, pool, args.interval)
+    finally:
+        pool.stop()
+    print(format_summary(finished, skipped, workers, time.monotonic() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,53 @@
 """
 chat_bot.py
-Main chatbot class handling query processing and OpenRouter API communication.
+Main chatbot class handling query processing and LLM provider communication.
 Includes conversation history management and retrieval-augmented generation.
 """
 
 import re
 import os
-import json
-import requests
-import spacy
-from typing import List, Dict
-from langchain.schema import Document
+import threading
+from typing import TYPE_CHECKING, List, Dict, Optional
 from src.config import settings
-import spacy 
+from src.tokenizer import count_tokens
+from src.conversation_summary import conversation_summaries
+from src.context_packer import pack_context
+from src.llm.providers import get_provider
+from src.metrics import span
+from src.logging_config import get_logger, log_prompt
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+logger = get_logger("chat")
+
+_ner_pipeline = None
+_ner_lock = threading.Lock()
+
+
+def get_ner_pipeline():
+    """spaCy pipeline shared by all chatbots, imported and loaded on first use"""
+    global _ner_pipeline
+    if _ner_pipeline is None:
+        with _ner_lock:
+            if _ner_pipeline is None:
+                import spacy
+                _ner_pipeline = spacy.load("en_core_web_sm")
+    return _ner_pipeline
 
 
 
 
 class ChatBot:
-    def __init__(self, vector_store, subject_name: str):
+    def __init__(self, vector_store, subject_name: str, conversation_id: Optional[str] = None,
+                 subject_id: Optional[int] = None):
         self.vector_store = vector_store
         self.subject_name = subject_name
+        self.conversation_id = conversation_id
+        self.subject_id = subject_id
         self.conversation_history: List[Dict] = []
         self.entity_buffer = set()
-        self.ner_pipeline = spacy.load("en_core_web_sm")
+        self.ner_pipeline = get_ner_pipeline()
         self.pronouns = {"he", "she", "it", "they", "his", "her", "their", "them"}
         
         
@@ -50,40 +74,64 @@ class ChatBot:
     
     
     def _count_tokens(self, text: str) -> int:
-        """Approximate token count by splitting on whitespace"""
-        return len(text.split())
+        """Count tokens with the configured tokenizer"""
+        return count_tokens(text)
+
+    def _format_exchange(self, item: Dict) -> str:
+        return f"User: {item['question']}\nAssistant: {item['response']}"
+
+    def _exchange_tokens(self, item: Dict) -> int:
+        """Token count of a history exchange, cached on the entry itself"""
+        if "tokens" not in item:
+            # +1 for the newline joining exchanges
+            item["tokens"] = self._count_tokens(self._format_exchange(item)) + 1
+        return item["tokens"]
     
-    def _get_truncated_history(self) -> str:
+    def _summary_enabled(self) -> bool:
+        return settings.HISTORY_SUMMARY_ENABLED and bool(self.conversation_id)
+
+    def _get_truncated_history(self, exchanges: Optional[List[Dict]] = None) -> str:
         """Get conversation history within token/length limits"""
+        if exchanges is None:
+            exchanges = self.conversation_history
         # Get last N exchanges based on MAX_HISTORY_LENGTH
-        history_exchanges = self.conversation_history[-settings.MAX_HISTORY_LENGTH:]
-        
-        # Convert to formatted text
-        history_text = "\n".join([
-            f"User: {item['question']}\nAssistant: {item['response']}" 
-            for item in history_exchanges
-        ])
-        
-        # Truncate by token count if needed
-        while self._count_tokens(history_text) > settings.MAX_HISTORY_TOKENS and len(history_exchanges) > 0:
-            # Remove oldest exchange
-            history_exchanges = history_exchanges[1:]
-            history_text = "\n".join([
-                f"User: {item['question']}\nAssistant: {item['response']}" 
-                for item in history_exchanges
-            ])
-        
-        return history_text
-
-    def _format_prompt(self, query: str, context: List[Document]) -> str:
+        history_exchanges = exchanges[-settings.MAX_HISTORY_LENGTH:]
+        
+        # Walk back from the newest exchange, keeping as many as fit the budget
+        total_tokens = 0
+        start = len(history_exchanges)
+        while start > 0:
+            exchange_tokens = self._exchange_tokens(history_exchanges[start - 1])
+            if total_tokens + exchange_tokens > settings.MAX_HISTORY_TOKENS:
+                break
+            total_tokens += exchange_tokens
+            start -= 1
+        
+        return "\n".join(
+            self._format_exchange(item) for item in history_exchanges[start:]
+        )
+
+    def _get_history_text(self) -> str:
+        """History for the prompt: rolling summary plus recent raw turns when enabled"""
+        if not self._summary_enabled():
+            return self._get_truncated_history()
+
+        summary, covered = conversation_summaries.get(self.conversation_id)
+        # Exchanges not yet folded into the summary are sent raw (still token-bounded)
+        recent_text = self._get_truncated_history(self.conversation_history[covered:])
+        if not summary:
+            return recent_text
+        return f"Summary of earlier conversation: {summary}\n{recent_text}"
+
+    def _format_prompt(self, query: str, context: List["Document"]) -> str:
         """Format prompt with conversation history and context"""
-        history_text = self._get_truncated_history()
+        history_text = self._get_history_text()
         
         formatted_context = []
         for doc in context:
             source = os.path.basename(doc.metadata.get("source", "unknown"))
             formatted_context.append(f"[Source: {source}] {doc.page_content}")
-            formatted_context.append(" + ")
+        context_text = "\n\n".join(formatted_context)
             
         entity_context = f"| Known Entities: {', '.join(self.entity_buffer)} |" if self.entity_buffer else ""
         
@@ -99,57 +147,55 @@ class ChatBot:
         Stay focused on the subject matter of {self.subject_name}.
         
         Information from current "new Context":
-        {', '.join(formatted_context)}
+        {context_text}
         
         Question: {query}
         
         Answer:"""
         
-        print(f"Generated prompt for {self.subject_name}:", prompt)
+        log_prompt(logger, self.subject_name, prompt)
         return prompt
 
-    def _openrouter_request(self, prompt: str) -> str:
-        headers = {
-            "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": settings.LLM_MODEL,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.7
-        }
-
-        response = requests.post(
-            f"{settings.OPENROUTER_URL}/chat/completions",
-            headers=headers,
-            data=json.dumps(payload)
-        )
-        return response.json()["choices"][0]["message"]["content"]
+    def _llm_request(self, prompt: str) -> str:
+        return get_provider().complete(prompt)
 
     def query(self, question: str) -> str:
         # Augment query with entities
         augmented_query = self._augment_query(question)
-        print("Current Entity Buffer: " , self.entity_buffer)
-        print("Query to vector base:", augmented_query)
+        logger.debug("Current entity buffer: %s", self.entity_buffer)
+        logger.debug("Query to vector base: %s", augmented_query)
         
+        subject = self.subject_id or ""
+
         # Retrieve and filter documents
-        docs_with_scores = self.vector_store.similarity_search_with_score(augmented_query, k=settings.NUMBER_OF_CHUNKS)
+        with span("query_embedding", subject):
+            query_embedding = self.vector_store.embeddings.embed_query(augmented_query)
+        with span("faiss_search", subject):
+            docs_with_scores = self.vector_store.similarity_search_with_score_by_vector(
+                query_embedding, k=settings.NUMBER_OF_CHUNKS
+            )
         relevant_docs = [doc for doc, score in docs_with_scores if score >= settings.SIMILARITY_THRESHOLD]
         
         if not relevant_docs:
             return "I couldn't find any relevant information in my knowledge base."
         
+        # Drop duplicate/overlapping chunks and fit the context token budget
+        with span("context_packing", subject):
+            relevant_docs = pack_context(relevant_docs)
+        
         # Update entity buffer
-        self.entity_buffer.update(self._extract_entities(question))
-        self.entity_buffer.update(self._extract_entities(" ".join([doc.page_content for doc in relevant_docs])))
+        with span("entity_extraction", subject):
+            self.entity_buffer.update(self._extract_entities(question))
+            self.entity_buffer.update(self._extract_entities(" ".join([doc.page_content for doc in relevant_docs])))
         
         # Keep only recent 5 entities
         self.entity_buffer = set(list(self.entity_buffer)[-5:])
 
         # Generate and execute prompt
-        prompt = self._format_prompt(question, relevant_docs)
-        response = self._openrouter_request(prompt)
+        with span("prompt_build", subject):
+            prompt = self._format_prompt(question, relevant_docs)
+        with span("llm", subject):
+            response = self._llm_request(prompt)
         
         # Process response
         # Extract sources from the relevant documents instead of the response
@@ -160,11 +206,18 @@ class ChatBot:
         clean_response = re.sub(r"$$Source:.*?$$", "", response).strip()
         
         # Update history
-        self.conversation_history.append({
+        exchange = {
             "question": question,
             "response": clean_response,
             "sources": sources,
             "entities": list(self.entity_buffer)
-        })
+        }
+        self._exchange_tokens(exchange)
+        self.conversation_history.append(exchange)
+
+        if self._summary_enabled():
+            conversation_summaries.schedule(
+                self.conversation_id, self.conversation_history, self._llm_request
+            )
         
         return f"{clean_response}\n\nSources: {', '.join(sources)}"
\ No newline at end of file
@@ -3,13 +3,19 @@
 """src/chat.py"""
 from flask import Blueprint, request, jsonify, session
 from src.models import Subject, get_db
-from src.vector_store import VectorStore
+from src.vector_store import VectorStore, has_index
 from src.chat_bot import ChatBot
 from contextlib import closing
 import os
+import uuid
 from src.models import GoogleDriveCredentials
-from src.google_drive.auth import GoogleDriveAuth
-from src.google_drive.drive_service import GoogleDriveService
+from src import faq_store
+from src.subject_activity import activity_recorder
+from src.conversation_summary import conversation_summaries
+from src.metrics import span
+from src.logging_config import get_logger
+
+logger = get_logger("chat")
 
 
 chat_bp = Blueprint('chat', __name__, url_prefix='/chat')
@@ -18,6 +24,9 @@ chat_bp = Blueprint('chat', __name__, url_prefix='/chat')
 def get_session_key(subject_id: int) -> str:
     return f"chat_history_{subject_id}"
 
+def get_conversation_key(subject_id: int) -> str:
+    return f"chat_conversation_{subject_id}"
+
 @chat_bp.route('/subjects', methods=['GET'])
 def get_available_subjects():
     """Get list of subjects that have knowledge bases"""
@@ -40,12 +49,8 @@ def get_available_subjects():
         subjects = query.all()
         
         for subject in subjects:
-            # Check if vector store exists for this subject
-            professor_dir = f'professor_{subject.professor_id}'
-            subject_dir = f'subject_{subject.id}'
-            subject_path = os.path.join(vector_base_path, professor_dir, subject_dir)
-            
-            if os.path.exists(subject_path):
+            # Check if a published vector store exists for this subject
+            if has_index(subject.professor_id, subject.id):
                 available_subjects.append({
                     "id": subject.id,
                     "name": subject.name,
@@ -56,7 +61,7 @@ def get_available_subjects():
         return jsonify({"subjects": available_subjects})
         
     except Exception as e:
-        print(f"Error loading subjects: {str(e)}")
+        logger.error("Error loading subjects: %s", e)
         return jsonify({"error": f"Failed to load subjects: {str(e)}"}), 500
     finally:
         db.close()
@@ -65,21 +70,24 @@ def get_available_subjects():
 def initialize_chatbot(subject_id):
     """Initialize chat session for a subject"""
     with closing(next(get_db())) as db:
-        subject = db.query(Subject).get(subject_id)
+        with span("db_lookup", subject_id):
+            subject = db.query(Subject).get(subject_id)
         if not subject:
             return jsonify({"error": "Subject not found"}), 404
 
-        vector_store = VectorStore()
-        subject_vector_store = vector_store.load_subject_vector_store(
-            professor_id=subject.professor_id,
-            subject_id=subject.id
-        )
+        with span("index_load", subject_id):
+            vector_store = VectorStore()
+            subject_vector_store = vector_store.load_subject_vector_store(
+                professor_id=subject.professor_id,
+                subject_id=subject.id
+            )
         
         if not subject_vector_store:
             return jsonify({"error": "No knowledge base found for this subject"}), 404
 
         # Initialize empty conversation history in session
         session[get_session_key(subject_id)] = []
+        session[get_conversation_key(subject_id)] = uuid.uuid4().hex
         
         return jsonify({
             "message": "Chat initialized successfully",
@@ -102,28 +110,40 @@ def query_chatbot(subject_id):
         return jsonify({"error": "Question is required"}), 400
 
     try:
-        with closing(next(get_db())) as db:
-            subject = db.query(Subject).get(subject_id)
+        with closing(next(get_db())) as db, span("request_total", subject_id):
+            with span("db_lookup", subject_id):
+                subject = db.query(Subject).get(subject_id)
             if not subject:
                 return jsonify({"error": "Subject not found"}), 404
 
             # Create a new ChatBot instance for this query
-            vector_store = VectorStore()
-            subject_vector_store = vector_store.load_subject_vector_store(
-                professor_id=subject.professor_id,
-                subject_id=subject.id
-            )
+            with span("index_load", subject_id):
+                vector_store = VectorStore()
+                subject_vector_store = vector_store.load_subject_vector_store(
+                    professor_id=subject.professor_id,
+                    subject_id=subject.id
+                )
             
             if not subject_vector_store:
                 return jsonify({"error": "Knowledge base not found"}), 404
 
-            chatbot = ChatBot(subject_vector_store, subject.name)
+            with span("chatbot_init", subject_id):
+                chatbot = ChatBot(
+                    subject_vector_store,
+                    subject.name,
+                    conversation_id=session.get(get_conversation_key(subject_id)),
+                    subject_id=subject_id
+                )
             
             # Load conversation history from session
             chatbot.conversation_history = session[session_key]
             
             # Get response
-            response = chatbot.query(data['question'])
+            with span("chatbot_query", subject_id):
+                response = chatbot.query(data['question'])
+            
+            # Recent use orders bulk index rebuilds
+            activity_recorder.record(subject_id)
             
             # Update session with new conversation history
             session[session_key] = chatbot.conversation_history
@@ -150,6 +170,11 @@ def reset_chat(subject_id):
     session_key = get_session_key(subject_id)
     if session_key in session:
         session[session_key] = []
+        # Drop the old rolling summary and start a new conversation
+        conversation_id = session.get(get_conversation_key(subject_id))
+        if conversation_id:
+            conversation_summaries.reset(conversation_id)
+        session[get_conversation_key(subject_id)] = uuid.uuid4().hex
     
     return jsonify({"message": "Chat history reset successfully"})
    
@@ -178,16 +203,8 @@ def submit_feedback(subject_id):
             if not drive_creds:
                 return jsonify({"error": "Drive not connected"}), 403
                 
-            # Initialize Drive service
-            google_auth = GoogleDriveAuth()
-            credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-            drive_service = GoogleDriveService(credentials)
-            
-            # Update FAQ file
-            drive_service.update_faq_file(
-                subject.faq_file_id,
-                data['questionForReview']
-            )
+            # Queue the question; the FAQ flusher adds it to faq.csv in the background
+            faq_store.submit_question(db, subject.id, data['questionForReview'])
             
             return jsonify({"message": "Question submitted successfully"})
             
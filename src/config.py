@@ -4,13 +4,23 @@ Handles configuration and environment variables for the project.
 Uses pydantic settings for validation.
 """
 
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    OPENROUTER_API_KEY: str
+    DATABASE_URL: str = "sqlite:///university.db"
+    OPENROUTER_API_KEY: str = ""
     OPENROUTER_URL: str = "https://openrouter.ai/api/v1"
+    LLM_PROVIDER: str = "openrouter"  # "openrouter" or "mock"
+    MOCK_LLM_URL: str = "http://127.0.0.1:8089/v1"  # src/llm/mock_server.py
+    LLM_TIMEOUT: float = 60
+    
+    # Hedging: ask LLM_FALLBACK_MODEL too if no first token after LLM_HEDGE_AFTER_MS (0 = off)
+    LLM_FALLBACK_MODEL: Optional[str] = None
+    LLM_HEDGE_AFTER_MS: int = 0
     EMBEDDING_MODEL: str = "sentence-transformers/multi-qa-mpnet-base-dot-v1"
     LLM_MODEL: str = "google/palm-2-chat-bison"
+    TOKENIZER_MODEL: str = "gpt2"  # HuggingFace tokenizer used for token budgets
     
     # For Vector base creation
     CHUNK_SIZE: int = 2000
@@ -20,10 +30,65 @@ class Settings(BaseSettings):
     SIMILARITY_THRESHOLD: float = 0.8 # Adjust as needed
     NUMBER_OF_CHUNKS: int = 5
     
+    # For prompt context packing
+    CONTEXT_MAX_TOKENS: int = 3000
+    CONTEXT_DEDUP_THRESHOLD: float = 0.9  # Shingle similarity treated as duplicate
+    
     # for chat history 
     MAX_HISTORY_LENGTH: int = 10  # Keep last 10 exchanges
     MAX_HISTORY_TOKENS: int = 4000  # Truncate if over
     
+    # Rolling summary of older exchanges (prompt carries summary + last raw turns)
+    HISTORY_SUMMARY_ENABLED: bool = False
+    HISTORY_RAW_TURNS: int = 3
+    HISTORY_SUMMARY_MAX_TOKENS: int = 300
+    
+    # Google Drive client reuse
+    DRIVE_SERVICE_CACHE_SIZE: int = 64
+    DRIVE_SERVICE_IDLE_TTL: int = 600  # Seconds before an unused client is dropped
+    DRIVE_HTTP_TIMEOUT: int = 60
+    DRIVE_TRANSPORT_POOL_SIZE: int = 4  # Idle HTTP transports kept per professor
+    DRIVE_TOKEN_REFRESH_INTERVAL: int = 60  # Seconds between background expiry checks
+    DRIVE_TOKEN_REFRESH_MARGIN: int = 300  # Refresh tokens this long before they expire
+    DRIVE_FOLDER_CACHE_TTL: int = 300  # Cached folder counts and page cursors
+    DRIVE_MIRROR_MAX_AGE: int = 30  # Seconds before reads trigger a Changes API delta
+    DRIVE_UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024  # Resumable upload chunk, a multiple of 256 KiB
+    DRIVE_USER_RATE: float = 10.0  # Client-side Drive calls per second per professor
+    DRIVE_PROJECT_RATE: float = 150.0  # Client-side Drive calls per second for the whole app
+    DRIVE_MIN_RATE: float = 0.5  # Floor for rates lowered after throttling
+    DRIVE_MAX_RETRIES: int = 6  # Retries of throttled or transiently failing Drive calls
+    DRIVE_BACKOFF_BASE: float = 1.0  # Seconds; doubles per retry, with full jitter
+    DRIVE_BACKOFF_MAX: float = 64.0
+    FAQ_EXPORT_DELAY: int = 10  # Seconds FAQ writes are coalesced before faq.csv is rewritten
+    FAQ_EXPORT_RETRY: int = 60  # Seconds before a failed faq.csv export is retried
+    FAQ_FEEDBACK_FLUSH_INTERVAL: int = 30  # Seconds student questions are collected per faq.csv write
+    FAQ_REVISION_CHECK_TTL: int = 30  # Seconds FAQ views trust faq.csv unchanged before asking Drive
+    FAQ_CLUSTER_THRESHOLD: float = 0.85  # Cosine similarity for a pending question to join a cluster
+    FAQ_PAGE_SIZE: int = 20  # Default FAQ listing page size
+    FAQ_MAX_PAGE_SIZE: int = 100
+    UPLOAD_CONCURRENCY: int = 4  # Parallel Drive uploads for multi-file uploads
+    
+    # Knowledge base build jobs (src/jobs.py)
+    JOB_WORKERS: int = 0  # Worker processes started by each web process; builds normally run in `python -m src.jobs`
+    JOB_RUNNER_WORKERS: int = 2  # Worker processes started by `python -m src.jobs`
+    JOB_POLL_INTERVAL: float = 1.0  # Seconds idle workers wait before checking for queued jobs
+    JOB_PROGRESS_INTERVAL: float = 1.0  # Minimum seconds between progress writes
+    JOB_STALE_AFTER: int = 300  # Seconds without a heartbeat before a running job is marked failed
+    EMBED_BATCH_SIZE: int = 64  # Chunks embedded per batch during builds
+    KB_KEEP_VERSIONS: int = 2  # Published index versions kept per subject
+    KB_INDEX_CACHE_SIZE: int = 32  # Loaded indexes kept per process
+    KB_WORKER_MEMORY_MB: int = 2048  # Memory budgeted per rebuild worker (embedding model + index)
+    ACTIVITY_FLUSH_INTERVAL: int = 60  # Seconds chat queries are counted before subject_activity is updated
+    KB_SCHEDULER_ENABLED: bool = True  # Queue updates of changed subjects from `python -m src.jobs`
+    KB_SCHEDULE_WINDOW: str = "1-6"  # Off-peak local hours "start-end", end exclusive; may wrap midnight
+    KB_SCHEDULE_INTERVAL: int = 900  # Seconds between change checks inside the window
+    KB_SCHEDULE_CONCURRENCY: int = 2  # Scheduled jobs queued or running at once
+    KB_SCHEDULE_MAX_PER_HOUR: int = 20  # Scheduled jobs queued per hour
+    
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_SAMPLE_RATES: Dict[str, float] = {}  # e.g. {"chat": 0.1}; warnings always logged
+    PROMPT_LOG_SAMPLE_RATE: float = 0.0  # Share of prompts logged in full above DEBUG
     
     
     class Config:
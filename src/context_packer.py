@@ -0,0 +1,130 @@
+"""
+context_packer.py
+Packs retrieved chunks into the prompt context.
+Drops near-duplicate chunks, merges overlapping chunks from the same source
+and fills a token budget in relevance order.
+"""
+
+import re
+import zlib
+import numpy as np
+from typing import TYPE_CHECKING, List, Optional
+from src.config import settings
+from src.tokenizer import count_tokens
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+SHINGLE_DIM = 4096
+SHINGLE_SIZE = 3
+MIN_OVERLAP_PROBE = 64
+
+
+def _shingle_vectors(texts: List[str]) -> np.ndarray:
+    """Unit-length hashed word-shingle vectors, one row per text"""
+    vectors = np.zeros((len(texts), SHINGLE_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = re.findall(r"\w+", text.lower())
+        size = SHINGLE_SIZE if len(words) >= SHINGLE_SIZE else 1
+        for i in range(len(words) - size + 1):
+            shingle = " ".join(words[i:i + size])
+            vectors[row, zlib.crc32(shingle.encode("utf-8")) % SHINGLE_DIM] += 1.0
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def remove_near_duplicates(docs: List["Document"], threshold: float) -> List["Document"]:
+    """Keep the most relevant copy of chunks whose shingle similarity >= threshold"""
+    if len(docs) < 2:
+        return docs
+
+    vectors = _shingle_vectors([doc.page_content for doc in docs])
+    similarities = vectors @ vectors.T
+
+    kept = []
+    for i in range(len(docs)):
+        if kept and similarities[i, kept].max() >= threshold:
+            continue
+        kept.append(i)
+    return [docs[i] for i in kept]
+
+
+def _merge_text(first: "Document", second: "Document") -> Optional[str]:
+    """Merged text if second continues first (by start_index or textual overlap)"""
+    a, b = first.page_content, second.page_content
+    a_start = first.metadata.get("start_index")
+    b_start = second.metadata.get("start_index")
+
+    if a_start is not None and b_start is not None:
+        a_end = a_start + len(a)
+        if a_start <= b_start <= a_end:
+            return a + b[a_end - b_start:]
+        return None
+
+    probe = b[:MIN_OVERLAP_PROBE]
+    if len(probe) < MIN_OVERLAP_PROBE:
+        return None
+    idx = a.rfind(probe)
+    if idx != -1 and b.startswith(a[idx:]):
+        return a + b[len(a) - idx:]
+    return None
+
+
+def merge_adjacent_chunks(docs: List["Document"]) -> List["Document"]:
+    """Merge chunks from the same source that overlap or touch; keeps the better rank"""
+    from langchain.schema import Document
+
+    merged: List["Document"] = []
+    for doc in docs:
+        source = doc.metadata.get("source")
+        for i, existing in enumerate(merged):
+            if existing.metadata.get("source") != source:
+                continue
+            text = _merge_text(existing, doc)
+            start = existing.metadata.get("start_index")
+            if text is None:
+                text = _merge_text(doc, existing)
+                start = doc.metadata.get("start_index")
+            if text is not None:
+                metadata = dict(existing.metadata)
+                if start is not None:
+                    metadata["start_index"] = start
+                merged[i] = Document(page_content=text, metadata=metadata)
+                break
+        else:
+            merged.append(doc)
+    return merged
+
+
+def pack_context(docs: List["Document"], max_tokens: Optional[int] = None) -> List["Document"]:
+    """
+    Select and merge chunks for the prompt
+
+    Args:
+        docs: Retrieved chunks, most relevant first
+        max_tokens: Token budget for the packed context
+
+    Returns:
+        list: Packed documents, most relevant first
+    """
+    if max_tokens is None:
+        max_tokens = settings.CONTEXT_MAX_TOKENS
+
+    docs = remove_near_duplicates(docs, settings.CONTEXT_DEDUP_THRESHOLD)
+    docs = merge_adjacent_chunks(docs)
+
+    packed = []
+    used = 0
+    for doc in docs:
+        tokens = count_tokens(doc.page_content)
+        if used + tokens > max_tokens:
+            continue
+        packed.append(doc)
+        used += tokens
+
+    # Always send the best chunk, even if it alone exceeds the budget
+    if not packed and docs:
+        packed.append(docs[0])
+    return packed
@@ -0,0 +1,110 @@
+"""
+conversation_summary.py
+Rolling summaries of older chat exchanges.
+Summaries are built in a background thread after each answer, so prompts can
+carry one bounded summary plus the last few raw turns instead of the full history.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+from src.config import settings
+from src.tokenizer import count_tokens
+from src.logging_config import get_logger
+
+logger = get_logger("chat")
+
+MAX_CONVERSATIONS = 1000
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a student and a course assistant.
+Keep names, definitions and open questions the student may refer back to.
+Write at most {max_words} words of plain prose.
+
+Current summary:
+{summary}
+
+New exchanges:
+{exchanges}
+
+Updated summary:"""
+
+
+class ConversationSummaries:
+    """In-process store of rolling summaries keyed by conversation id"""
+
+    def __init__(self, max_workers: int = 2):
+        self._summaries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._in_flight = set()
+        self._reset = set()  # In flight when reset; their result is dropped
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary")
+
+    def get(self, conversation_id: str) -> Tuple[str, int]:
+        """Return (summary, number of exchanges it covers)"""
+        with self._lock:
+            entry = self._summaries.get(conversation_id)
+            if not entry:
+                return "", 0
+            self._summaries.move_to_end(conversation_id)
+            return entry["summary"], entry["covered"]
+
+    def reset(self, conversation_id: str):
+        """Forget a conversation's summary, including one still being built"""
+        with self._lock:
+            self._summaries.pop(conversation_id, None)
+            if conversation_id in self._in_flight:
+                self._reset.add(conversation_id)
+
+    def schedule(self, conversation_id: str, history: List[Dict], summarize: Callable[[str], str]):
+        """Fold exchanges older than the raw-turn window into the summary in the background"""
+        target = len(history) - settings.HISTORY_RAW_TURNS
+        with self._lock:
+            covered = self._summaries.get(conversation_id, {}).get("covered", 0)
+            if target <= covered or conversation_id in self._in_flight:
+                return
+            self._in_flight.add(conversation_id)
+
+        # Snapshot the exchanges now; the caller keeps mutating its history list
+        exchanges = [dict(item) for item in history[covered:target]]
+        self._executor.submit(self._summarize, conversation_id, exchanges, target, summarize)
+
+    def _summarize(self, conversation_id: str, exchanges: List[Dict], target: int,
+                   summarize: Callable[[str], str]):
+        try:
+            summary, _ = self.get(conversation_id)
+            prompt = SUMMARY_PROMPT.format(
+                max_words=settings.HISTORY_SUMMARY_MAX_TOKENS // 2,
+                summary=summary or "(none)",
+                exchanges="\n".join(
+                    f"User: {item['question']}\nAssistant: {item['response']}"
+                    for item in exchanges
+                )
+            )
+            new_summary = self._bound(summarize(prompt).strip())
+
+            with self._lock:
+                if conversation_id in self._reset:
+                    return
+                self._summaries[conversation_id] = {"summary": new_summary, "covered": target}
+                self._summaries.move_to_end(conversation_id)
+                while len(self._summaries) > MAX_CONVERSATIONS:
+                    self._summaries.popitem(last=False)
+        except Exception as e:
+            logger.error("Error summarizing conversation %s: %s", conversation_id, e)
+        finally:
+            with self._lock:
+                self._in_flight.discard(conversation_id)
+                self._reset.discard(conversation_id)
+
+    def _bound(self, summary: str) -> str:
+        """Hard cap on summary size in case the model ignores the word limit"""
+        if count_tokens(summary) <= settings.HISTORY_SUMMARY_MAX_TOKENS:
+            return summary
+        words = summary.split()
+        while words and count_tokens(" ".join(words)) > settings.HISTORY_SUMMARY_MAX_TOKENS:
+            words = words[:int(len(words) * 0.9)]
+        return " ".join(words)
+
+
+conversation_summaries = ConversationSummaries()
@@ -2,27 +2,79 @@
 document_loader.py
 Loads and processes documents from the knowledge base directory.
 Uses UnstructuredFileLoader to handle multiple file types.
+LangChain and unstructured are imported when a loader is first created.
 """
-from langchain.document_loaders import UnstructuredFileLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
 from src.config import settings
 from src.models import Subject, GoogleDriveCredentials, get_db
-from src.google_drive.auth import GoogleDriveAuth
-from src.google_drive.drive_service import GoogleDriveService
-from typing import List
+from src.google_drive.service_cache import get_drive_service
+from src.google_drive import mirror as drive_mirror
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 import os
 import tempfile
+from src.logging_config import get_logger
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+logger = get_logger("kb")
+
+# progress(stage, done, total), called as files are downloaded and parsed
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def same_file(previous: Optional[Dict[str, str]], current: Dict[str, str]) -> bool:
+    """Whether a Drive file is unchanged since a build recorded it (md5, or modifiedTime for Google Docs)"""
+    if not previous:
+        return False
+    if current.get('md5Checksum'):
+        return previous.get('md5Checksum') == current['md5Checksum']
+    return previous.get('modifiedTime') == current.get('modifiedTime')
+
+
+def same_files(previous: Dict[str, Dict[str, str]], current: Dict[str, Dict[str, str]]) -> bool:
+    """Whether two build file lists hold the same file ids at the same versions and outcomes"""
+    if previous.keys() != current.keys():
+        return False
+    return all(
+        same_file(previous[file_id], file) and bool(previous[file_id].get('failed')) == bool(file.get('failed'))
+        for file_id, file in current.items()
+    )
+
+
+def _file_entry(file: Dict[str, str], failed: bool = False) -> Dict[str, str]:
+    entry = {key: file[key] for key in ('name', 'md5Checksum', 'modifiedTime')}
+    if failed:
+        entry['failed'] = True
+    return entry
+
 
 class SubjectDocumentLoader:
     def __init__(self):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            add_start_index=True
         )
+        # Drive files of the last load by id: name, md5Checksum, modifiedTime, and
+        # failed=True for files that could not be downloaded or parsed
+        self.files = {}
+        # Ids of indexed files skipped by the last load because they were unchanged
+        self.unchanged = set()
+        # Ids of files left out of the index: failed now, or unchanged since they failed
+        self.failed = set()
 
-    def load_subject_documents(self, subject_id: int, professor_id: int) -> List[Document]:
-        """Load documents from Google Drive"""
+    def load_subject_documents(self, subject_id: int, professor_id: int,
+                               progress: Optional[ProgressCallback] = None,
+                               previous_files: Optional[Dict[str, Dict[str, str]]] = None) -> List["Document"]:
+        """
+        Load documents from Google Drive
+
+        Files matching previous_files (a build manifest's file list) are not
+        downloaded; their ids are left in self.unchanged, or in self.failed if
+        they failed then. A failed file is only retried once it changes.
+        """
         db = next(get_db())
         try:
             # Get subject
@@ -37,13 +89,19 @@ class SubjectDocumentLoader:
             if not subject.drive_folder_id:
                 raise Exception("Subject is not Drive-enabled")
 
-            return self._load_drive_documents(subject, professor_id)
+            return self._load_drive_documents(subject, professor_id, progress, previous_files)
                 
         finally:
             db.close()
 
-    def _load_drive_documents(self, subject: Subject, professor_id: int) -> List[Document]:
+    def _load_drive_documents(self, subject: Subject, professor_id: int,
+                              progress: Optional[ProgressCallback] = None,
+                              previous_files: Optional[Dict[str, Dict[str, str]]] = None) -> List["Document"]:
         """Load documents from Google Drive"""
+        from langchain.document_loaders import UnstructuredFileLoader
+
+        report = progress or (lambda stage, done, total: None)
+
         documents = []
         db = next(get_db())
         
@@ -58,20 +116,41 @@ class SubjectDocumentLoader:
                 raise Exception("No active Drive connection")
 
             # Initialize Drive service
-            google_auth = GoogleDriveAuth()
-            credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-            drive_service = GoogleDriveService(credentials)
+            drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
             
-            # Get all files in folder
-            files, _ = drive_service.list_folder_files(subject.drive_folder_id)
+            # Get all files in folder from the metadata mirror
+            drive_mirror.ensure_fresh(db, professor_id, drive_service, drive_creds.drive_folder_id)
+            files = [
+                {
+                    'id': row.id,
+                    'name': row.name,
+                    'md5Checksum': row.md5_checksum,
+                    'modifiedTime': row.modified_time
+                }
+                for row in drive_mirror.list_all(db, subject.drive_folder_id)
+            ]
+            previous_files = previous_files or {}
+            skipped = {file['id'] for file in files if same_file(previous_files.get(file['id']), file)}
+            self.failed = {file_id for file_id in skipped if previous_files[file_id].get('failed')}
+            self.unchanged = skipped - self.failed
+            self.files = {
+                file['id']: _file_entry(file, failed=file['id'] in self.failed)
+                for file in files if file['id'] in skipped
+            }
+            files = [file for file in files if file['id'] not in skipped]
             
             # Create temporary directory for downloaded files
+            downloaded = parsed = 0
+            report("download", 0, len(files))
+            report("parse", 0, len(files))
             with tempfile.TemporaryDirectory() as temp_dir:
                 for file in files:
                     try:
                         # Download file to temp directory
                         temp_path = os.path.join(temp_dir, file['name'])
                         drive_service.download_file(file['id'], temp_path)
+                        downloaded += 1
+                        report("download", downloaded, len(files))
                         
                         # Load document using UnstructuredFileLoader
                         loader = UnstructuredFileLoader(temp_path)
@@ -81,15 +160,24 @@ class SubjectDocumentLoader:
                         for doc in docs:
                             doc.metadata.update({
                                 "source": file['name'],
-                                "drive_file_id": file['id']
+                                "drive_file_id": file['id'],
+                                "drive_md5": file['md5Checksum'],
+                                "drive_modified_time": file['modifiedTime']
                             })
                         
                         documents.extend(docs)
+                        parsed += 1
+                        report("parse", parsed, len(files))
+                        self.files[file['id']] = _file_entry(file)
                     except Exception as e:
-                        print(f"Error processing file {file['name']}: {str(e)}")
+                        logger.error("Error processing file %s: %s", file['name'], e)
+                        self.failed.add(file['id'])
+                        self.files[file['id']] = _file_entry(file, failed=True)
                         continue
             
-            return self.text_splitter.split_documents(documents)
+            chunks = self.text_splitter.split_documents(documents)
+            report("split", len(chunks), len(chunks))
+            return chunks
             
         finally:
             db.close()
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""
+faq_clusters.py
+Groups a subject's pending FAQ questions by meaning so one answer can close
+many of them. Each new pending question is embedded once and joins the
+cluster with the most similar centroid (a single matrix-vector product), or
+starts a new cluster. Answered and deleted questions leave their clusters.
+Assignment runs in the background after student questions are flushed, and
+catches up synchronously when clusters are listed.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+import numpy as np
+from src.config import settings
+from src.models import FAQCluster, FAQEmbedding, FAQEntry, SessionLocal
+from src.logging_config import get_logger
+
+logger = get_logger("faq")
+
+
+def _to_bytes(vector: np.ndarray) -> bytes:
+    return vector.astype(np.float32).tobytes()
+
+
+def _from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float32)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _embed(texts: List[str]) -> np.ndarray:
+    """Unit-length embeddings from the shared embedding model, one row per text"""
+    from src.vector_store import get_embeddings
+    return _normalize(np.asarray(get_embeddings().embed_documents(texts), dtype=np.float32))
+
+
+def _recompute(db, cluster: FAQCluster):
+    """Reset a cluster's centroid and size from its remaining members, deleting it if empty"""
+    vectors = [_from_bytes(vector) for (vector,) in
+               db.query(FAQEmbedding.vector).filter_by(cluster_id=cluster.id)]
+    if not vectors:
+        db.delete(cluster)
+        return
+    cluster.size = len(vectors)
+    cluster.centroid = _to_bytes(_normalize(np.mean(vectors, axis=0)))
+
+
+def prune(db, subject_id: int) -> int:
+    """
+    Drop embeddings of questions that were answered or deleted
+
+    Returns:
+        int: Number of questions removed from clusters
+    """
+    stale = db.query(FAQEmbedding).outerjoin(FAQEntry, FAQEntry.id == FAQEmbedding.entry_id).filter(
+        FAQEmbedding.subject_id == subject_id,
+        (FAQEntry.id.is_(None)) | (FAQEntry.status != 'pending')
+    ).all()
+    _drop(db, stale)
+    return len(stale)
+
+
+def _drop(db, embeddings: List[FAQEmbedding]):
+    """Delete embeddings and shrink (or delete) the clusters they belonged to"""
+    if not embeddings:
+        return
+    cluster_ids = {embedding.cluster_id for embedding in embeddings}
+    for embedding in embeddings:
+        db.delete(embedding)
+    db.flush()
+    for cluster in db.query(FAQCluster).filter(FAQCluster.id.in_(cluster_ids)):
+        _recompute(db, cluster)
+
+
+def forget(db, entry_ids: List[int]):
+    """
+    Drop the embeddings of entries about to be deleted or whose question changed
+
+    Deleted ids can be reused by the next new question, and a reworded
+    question needs a fresh embedding; assign_pending embeds it again.
+    """
+    if entry_ids:
+        _drop(db, db.query(FAQEmbedding).filter(FAQEmbedding.entry_id.in_(entry_ids)).all())
+
+
+def assign_pending(db, subject_id: int) -> int:
+    """
+    Cluster pending questions that have no embedding yet, then prune stale ones
+
+    Returns:
+        int: Number of questions newly assigned
+    """
+    pruned = prune(db, subject_id)
+    entries = db.query(FAQEntry).outerjoin(FAQEmbedding, FAQEmbedding.entry_id == FAQEntry.id).filter(
+        FAQEntry.subject_id == subject_id,
+        FAQEntry.status == 'pending',
+        FAQEmbedding.entry_id.is_(None)
+    ).order_by(FAQEntry.number).all()
+    if not entries:
+        if pruned:
+            db.commit()
+        return 0
+
+    vectors = _embed([entry.question for entry in entries])
+    clusters = db.query(FAQCluster).filter_by(subject_id=subject_id).all()
+    centroids = np.array([_from_bytes(cluster.centroid) for cluster in clusters], dtype=np.float32) \
+        .reshape(len(clusters), vectors.shape[1])
+
+    for entry, vector in zip(entries, vectors):
+        best = -1
+        if len(clusters):
+            similarities = centroids @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < settings.FAQ_CLUSTER_THRESHOLD:
+                best = -1
+
+        if best < 0:
+            cluster = FAQCluster(subject_id=subject_id, centroid=_to_bytes(vector), size=1)
+            db.add(cluster)
+            db.flush()
+            clusters.append(cluster)
+            centroids = np.vstack([centroids, vector[None, :]])
+        else:
+            # Running mean of the members, kept unit length for cosine similarity
+            cluster = clusters[best]
+            centroid = _normalize(centroids[best] * cluster.size + vector)
+            cluster.size += 1
+            cluster.centroid = _to_bytes(centroid)
+            centroids[best] = centroid
+
+        db.add(FAQEmbedding(
+            entry_id=entry.id,
+            subject_id=subject_id,
+            cluster_id=cluster.id,
+            vector=_to_bytes(vector)
+        ))
+
+    db.commit()
+    return len(entries)
+
+
+def list_clusters(db, subject_id: int) -> List[Dict[str, Any]]:
+    """Clusters of pending questions, largest first, each with its member questions"""
+    rows = db.query(FAQEmbedding.cluster_id, FAQEntry).join(
+        FAQEntry, FAQEntry.id == FAQEmbedding.entry_id
+    ).filter(
+        FAQEmbedding.subject_id == subject_id,
+        FAQEntry.status == 'pending'
+    ).order_by(FAQEntry.number).all()
+
+    members: Dict[int, List[FAQEntry]] = {}
+    for cluster_id, entry in rows:
+        members.setdefault(cluster_id, []).append(entry)
+
+    clusters = [{
+        "id": cluster_id,
+        "size": len(entries),
+        "question": entries[0].question,
+        "questions": [{
+            "number": entry.number,
+            "question": entry.question,
+            "date_asked": entry.date_asked
+        } for entry in entries]
+    } for cluster_id, entries in members.items()]
+    return sorted(clusters, key=lambda cluster: cluster["size"], reverse=True)
+
+
+def cluster_entries(db, subject_id: int, cluster_id: int) -> List[FAQEntry]:
+    """Pending questions of one cluster"""
+    return db.query(FAQEntry).join(FAQEmbedding, FAQEmbedding.entry_id == FAQEntry.id).filter(
+        FAQEmbedding.subject_id == subject_id,
+        FAQEmbedding.cluster_id == cluster_id,
+        FAQEntry.status == 'pending'
+    ).order_by(FAQEntry.number).all()
+
+
+class ClusterWorker:
+    """Single background worker assigning new questions, at most one queued run per subject"""
+
+    def __init__(self):
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="faq-clusters")
+
+    def schedule(self, subject_id: int):
+        with self._lock:
+            if subject_id in self._queued:
+                return
+            self._queued.add(subject_id)
+        self._executor.submit(self._run, subject_id)
+
+    def _run(self, subject_id: int):
+        with self._lock:
+            self._queued.discard(subject_id)
+        db = SessionLocal()
+        try:
+            assign_pending(db, subject_id)
+        except Exception as e:
+            db.rollback()
+            logger.error("Error clustering FAQ questions of subject %s: %s", subject_id, e)
+        finally:
+            db.close()
+
+
+cluster_worker = ClusterWorker()
@@ -0,0 +1,59 @@
+"""
+faq_csv.py
+Streaming codec for faq.csv, built on the csv module.
+Records are read and written one row at a time, so handling the
+five-column FAQ file needs neither pandas nor the whole file as a table.
+"""
+
+import csv
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+
+HEADERS = ['number', 'question', 'answer', 'date_asked', 'date_answered']
+
+
+def _number(value: Optional[str]) -> Optional[int]:
+    """Question number as an int; accepts the '3.0' pandas used to write"""
+    try:
+        return int(float(value or ''))
+    except (ValueError, OverflowError):
+        return None
+
+
+def read_records(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse faq.csv rows lazily
+
+    Args:
+        lines: Any iterable of CSV lines, e.g. an open file or io.StringIO
+
+    Yields:
+        dict: number (None if missing), question, answer, date_asked and
+        date_answered, with blank cells as None; rows without a question are skipped
+    """
+    for row in csv.DictReader(lines):
+        question = (row.get('question') or '').strip()
+        if not question:
+            continue
+        yield {
+            'number': _number(row.get('number')),
+            'question': question,
+            'answer': (row.get('answer') or '').strip() or None,
+            'date_asked': row.get('date_asked') or None,
+            'date_answered': row.get('date_answered') or None
+        }
+
+
+def write_records(stream: TextIO, records: Iterable[Dict[str, Any]]) -> int:
+    """
+    Write a header and records to a text stream
+
+    Returns:
+        int: Number of records written
+    """
+    writer = csv.DictWriter(stream, fieldnames=HEADERS, lineterminator='\n', extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+    return count
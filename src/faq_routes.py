@@ -1,93 +1,121 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from src.models import Subject, GoogleDriveCredentials, get_db
-from src.google_drive.drive_service import GoogleDriveService
-from src.google_drive.auth import GoogleDriveAuth
+from src.google_drive.service_cache import get_drive_service
 from src.decorators import professor_required
-import pandas as pd
-from io import StringIO
-import csv
-from datetime import datetime
+from src import faq_store, faq_clusters
+from sqlalchemy.exc import IntegrityError
+from src.config import settings
+from src.logging_config import get_logger
+
+logger = get_logger("faq")
 
 faq_bp = Blueprint('faq', __name__, url_prefix='/professor/faq')
 
+def _load_subject_faqs(db, subject_id):
+    """
+    Verify ownership and make sure the subject's FAQ rows are in the database
+
+    Returns:
+        tuple: (subject, None) or (None, error response)
+    """
+    subject = db.query(Subject).filter_by(
+        id=subject_id,
+        professor_id=current_user.id
+    ).first()
+
+    if not subject or not subject.faq_file_id:
+        return None, (jsonify({"error": "Subject or FAQ file not found"}), 404)
+
+    drive_creds = db.query(GoogleDriveCredentials).filter_by(
+        professor_id=current_user.id,
+        is_active=True
+    ).first()
+
+    if not drive_creds:
+        return None, (jsonify({"error": "Drive not connected"}), 403)
+
+    # Drive is only called to import faq.csv on first use, and to check it
+    # for edits made in Drive at most once per FAQ_REVISION_CHECK_TTL
+    drive_service_factory = lambda: get_drive_service(drive_creds.professor_id, drive_creds.token_info)
+    if not faq_store.is_imported(db, subject.id):
+        faq_store.ensure_imported(db, subject, drive_service_factory)
+    else:
+        try:
+            faq_store.refresh_from_drive(db, subject, drive_service_factory)
+        except Exception as e:
+            # Serve the local rows rather than fail the view
+            db.rollback()
+            logger.warning("Could not check faq.csv of subject %s for Drive edits: %s", subject.id, e)
+
+    # Show student questions still waiting for the background flusher
+    faq_store.drain_submissions(db, subject.id)
+
+    return subject, None
+
+def _listing_args():
+    """
+    Pagination, sorting and search parameters of FAQ listings
+
+    Returns:
+        tuple: (keyword arguments for faq_store.query_entries, None) or (None, error response)
+    """
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        page_size = min(settings.FAQ_MAX_PAGE_SIZE,
+                        max(1, int(request.args.get('page_size', settings.FAQ_PAGE_SIZE))))
+    except ValueError:
+        return None, (jsonify({"error": "page and page_size must be integers"}), 400)
+    sort = request.args.get('sort', 'newest')
+    if sort not in faq_store.SORT_ORDERS:
+        return None, (jsonify({"error": f"sort must be one of {', '.join(faq_store.SORT_ORDERS)}"}), 400)
+    return {
+        "page": page,
+        "page_size": page_size,
+        "sort": sort,
+        "search": request.args.get('search', '').strip()
+    }, None
+
 @faq_bp.route('/subject/<int:subject_id>/questions', methods=['GET'])
 @login_required
 @professor_required
 def get_subject_faqs(subject_id):
-    """Get all FAQs for a subject, including pending questions"""
+    """
+    Get one page of a subject's pending and answered FAQs
+
+    Query parameters: page, page_size, status ('pending' or 'answered', both
+    by default), sort ('newest', 'oldest' or 'recently_answered') and search.
+    Each status is paginated separately; totals count all matches.
+    """
+    listing, error = _listing_args()
+    if error:
+        return error
+    status = request.args.get('status')
+    if status not in (None, 'pending', 'answered'):
+        return jsonify({"error": "status must be 'pending' or 'answered'"}), 400
+    page_size = listing['page_size']
+
     db = next(get_db())
     try:
-        # Verify subject ownership
-        subject = db.query(Subject).filter_by(
-            id=subject_id,
-            professor_id=current_user.id
-        ).first()
-
-        if not subject or not subject.faq_file_id:
-            return jsonify({"error": "Subject or FAQ file not found"}), 404
-
-        # Get Drive credentials and service
-        drive_creds = db.query(GoogleDriveCredentials).filter_by(
-            professor_id=current_user.id,
-            is_active=True
-        ).first()
-
-        if not drive_creds:
-            return jsonify({"error": "Drive not connected"}), 403
-
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
-
-        try:
-            # Download and read FAQ file
-            faq_content = drive_service.download_file(subject.faq_file_id)
-            
-            # If the file is empty or new, initialize with headers
-            if not faq_content.strip():
-                faq_content = "number,question,answer,date_asked,date_answered\n"
-            
-            # Read CSV content
-            df = pd.read_csv(StringIO(faq_content))
-            
-            # Replace NaN values with None
-            df = df.replace({pd.NA: None, pd.NaT: None, float('nan'): None})
-            
-            # Convert DataFrame to records and handle None values
-            def clean_record(record):
-                return {
-                    key: (None if pd.isna(value) else value)
-                    for key, value in record.items()
-                }
-            
-            # Process pending and answered questions
-            pending_mask = df['answer'].isna()
-            pending_questions = [
-                clean_record(record) 
-                for record in df[pending_mask].to_dict('records')
-            ]
-            answered_questions = [
-                clean_record(record) 
-                for record in df[~pending_mask].to_dict('records')
-            ]
-
-            return jsonify({
-                "pending_questions": pending_questions,
-                "answered_questions": answered_questions
-            })
-            
-        except Exception as e:
-            print(f"Error processing FAQ file: {str(e)}")
-            # Initialize empty FAQ file if there's an error
-            empty_data = {
-                "pending_questions": [],
-                "answered_questions": []
-            }
-            return jsonify(empty_data)
+        subject, error = _load_subject_faqs(db, subject_id)
+        if error:
+            return error
+
+        result = {"page": listing['page'], "page_size": page_size}
+        for listed_status in ('pending', 'answered'):
+            entries, total = [], 0
+            if status in (None, listed_status):
+                entries, total = faq_store.query_entries(db, subject.id, status=listed_status, **listing)
+            result[f"{listed_status}_questions"] = [faq_store.entry_to_dict(entry) for entry in entries]
+            result[f"{listed_status}_total"] = total
+        result["total_pages"] = max(
+            (result["pending_total"] + page_size - 1) // page_size,
+            (result["answered_total"] + page_size - 1) // page_size
+        )
+        return jsonify(result)
 
     except Exception as e:
-        print(f"Error getting FAQs: {str(e)}")
+        logger.error("Error getting FAQs: %s", e)
         return jsonify({"error": str(e)}), 500
     finally:
         db.close()
@@ -103,56 +131,24 @@ def update_faq(subject_id, question_number):
 
     db = next(get_db())
     try:
-        # Verify subject ownership
-        subject = db.query(Subject).filter_by(
-            id=subject_id,
-            professor_id=current_user.id
-        ).first()
-
-        if not subject or not subject.faq_file_id:
-            return jsonify({"error": "Subject or FAQ file not found"}), 404
-
-        # Get Drive credentials and service
-        drive_creds = db.query(GoogleDriveCredentials).filter_by(
-            professor_id=current_user.id,
-            is_active=True
-        ).first()
-
-        if not drive_creds:
-            return jsonify({"error": "Drive not connected"}), 403
-
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
-
-        # Download current FAQ file
-        faq_content = drive_service.download_file(subject.faq_file_id)
-        df = pd.read_csv(StringIO(faq_content))
-
-        # Find and update the specific question
-        mask = df['number'] == question_number
-        if not any(mask):
-            return jsonify({"error": "Question not found"}), 404
+        subject, error = _load_subject_faqs(db, subject_id)
+        if error:
+            return error
 
-        # Update the row
-        if 'question' in data:
-            df.loc[mask, 'question'] = data['question']
-        if 'answer' in data:
-            df.loc[mask, 'answer'] = data['answer']
-            df.loc[mask, 'date_answered'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        entry = faq_store.get_entry(db, subject.id, question_number)
+        if not entry:
+            return jsonify({"error": "Question not found"}), 404
 
-        # Save back to CSV
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False)
-        drive_service.update_file(subject.faq_file_id, csv_buffer.getvalue())
+        faq_store.update_entry(db, entry, question=data.get('question'), answer=data.get('answer'))
 
         return jsonify({
             "message": "FAQ updated successfully",
-            "question": df[mask].to_dict('records')[0]
+            "question": faq_store.entry_to_dict(entry)
         })
 
     except Exception as e:
-        print(f"Error updating FAQ: {str(e)}")
+        db.rollback()
+        logger.error("Error updating FAQ: %s", e)
         return jsonify({"error": "Failed to update FAQ"}), 500
     finally:
         db.close()
@@ -164,52 +160,23 @@ def delete_faq(subject_id, question_number):
     """Delete a FAQ question"""
     db = next(get_db())
     try:
-        # Verify subject ownership
-        subject = db.query(Subject).filter_by(
-            id=subject_id,
-            professor_id=current_user.id
-        ).first()
-
-        if not subject or not subject.faq_file_id:
-            return jsonify({"error": "Subject or FAQ file not found"}), 404
-
-        # Get Drive credentials and service
-        drive_creds = db.query(GoogleDriveCredentials).filter_by(
-            professor_id=current_user.id,
-            is_active=True
-        ).first()
-
-        if not drive_creds:
-            return jsonify({"error": "Drive not connected"}), 403
-
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
-
-        # Download current FAQ file
-        faq_content = drive_service.download_file(subject.faq_file_id)
-        df = pd.read_csv(StringIO(faq_content))
-
-        # Find and delete the specific question
-        mask = df['number'] == question_number
-        if not any(mask):
-            return jsonify({"error": "Question not found"}), 404
+        subject, error = _load_subject_faqs(db, subject_id)
+        if error:
+            return error
 
-        # Remove the row and reindex remaining questions
-        df = df[~mask].copy()
-        df['number'] = range(1, len(df) + 1)
+        entry = faq_store.get_entry(db, subject.id, question_number)
+        if not entry:
+            return jsonify({"error": "Question not found"}), 404
 
-        # Save back to CSV
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False)
-        drive_service.update_file(subject.faq_file_id, csv_buffer.getvalue())
+        faq_store.delete_entry(db, entry)
 
         return jsonify({
             "message": "FAQ deleted successfully"
         })
 
     except Exception as e:
-        print(f"Error deleting FAQ: {str(e)}")
+        db.rollback()
+        logger.error("Error deleting FAQ: %s", e)
         return jsonify({"error": "Failed to delete FAQ"}), 500
     finally:
         db.close()
@@ -218,45 +185,28 @@ def delete_faq(subject_id, question_number):
 @login_required
 @professor_required
 def get_pending_questions(subject_id):
-    """Get only pending questions for a subject"""
+    """Get one page of pending questions for a subject; takes the same parameters as get_subject_faqs"""
+    listing, error = _listing_args()
+    if error:
+        return error
+
     db = next(get_db())
     try:
-        # Verify subject ownership
-        subject = db.query(Subject).filter_by(
-            id=subject_id,
-            professor_id=current_user.id
-        ).first()
-
-        if not subject or not subject.faq_file_id:
-            return jsonify({"error": "Subject or FAQ file not found"}), 404
+        subject, error = _load_subject_faqs(db, subject_id)
+        if error:
+            return error
 
-        # Get Drive credentials and service
-        drive_creds = db.query(GoogleDriveCredentials).filter_by(
-            professor_id=current_user.id,
-            is_active=True
-        ).first()
-
-        if not drive_creds:
-            return jsonify({"error": "Drive not connected"}), 403
-
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
-
-        # Download and read FAQ file
-        faq_content = drive_service.download_file(subject.faq_file_id)
-        df = pd.read_csv(StringIO(faq_content))
-
-        # Get only pending questions
-        pending_questions = df[df['answer'].isna()].to_dict('records')
+        entries, total = faq_store.query_entries(db, subject.id, status='pending', **listing)
 
         return jsonify({
-            "pending_questions": pending_questions,
-            "count": len(pending_questions)
+            "pending_questions": [faq_store.entry_to_dict(entry) for entry in entries],
+            "count": total,
+            "page": listing['page'],
+            "page_size": listing['page_size']
         })
 
     except Exception as e:
-        print(f"Error getting pending questions: {str(e)}")
+        logger.error("Error getting pending questions: %s", e)
         return jsonify({"error": "Failed to get pending questions"}), 500
     finally:
         db.close()
@@ -272,66 +222,90 @@ def answer_question(subject_id):
 
     db = next(get_db())
     try:
-        # Verify subject ownership
-        subject = db.query(Subject).filter_by(
-            id=subject_id,
-            professor_id=current_user.id
-        ).first()
-
-        if not subject or not subject.faq_file_id:
-            return jsonify({"error": "Subject or FAQ file not found"}), 404
-
-        # Get Drive credentials and service
-        drive_creds = db.query(GoogleDriveCredentials).filter_by(
-            professor_id=current_user.id,
-            is_active=True
-        ).first()
-
-        if not drive_creds:
-            return jsonify({"error": "Drive not connected"}), 403
-
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
-
-        # Download current FAQ file
-        faq_content = drive_service.download_file(subject.faq_file_id)
-        df = pd.read_csv(StringIO(faq_content))
-
-        # Find and update the specific question
-        question_number = int(data['question_number'])
-        mask = df['number'] == question_number
-        if not any(mask):
+        subject, error = _load_subject_faqs(db, subject_id)
+        if error:
+            return error
+
+        entry = faq_store.get_entry(db, subject.id, int(data['question_number']))
+        if not entry:
             return jsonify({"error": "Question not found"}), 404
 
-        # Update the answer and timestamp
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        df.loc[mask, 'answer'] = data['answer']
-        df.loc[mask, 'date_answered'] = current_time
-
-        # Save back to CSV
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_content = csv_buffer.getvalue()
-        
-        # Update the file in Drive
-        drive_service.update_file(subject.faq_file_id, csv_content)
-
-        # Return the updated question data
-        updated_question = df[mask].to_dict('records')[0]
-        # Clean any NaN values
-        updated_question = {
-            k: (None if pd.isna(v) else v) 
-            for k, v in updated_question.items()
-        }
+        faq_store.update_entry(db, entry, answer=data['answer'])
 
         return jsonify({
             "message": "Question answered successfully",
-            "question": updated_question
+            "question": faq_store.entry_to_dict(entry)
         })
 
     except Exception as e:
-        print(f"Error answering question: {str(e)}")
+        db.rollback()
+        logger.error("Error answering question: %s", e)
         return jsonify({"error": f"Failed to submit answer: {str(e)}"}), 500
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@faq_bp.route('/subject/<int:subject_id>/questions/clusters', methods=['GET'])
+@login_required
+@professor_required
+def get_question_clusters(subject_id):
+    """Pending questions grouped by similarity, largest group first"""
+    db = next(get_db())
+    try:
+        subject, error = _load_subject_faqs(db, subject_id)
+        if error:
+            return error
+
+        try:
+            # Catch up with questions the background worker has not reached yet
+            faq_clusters.assign_pending(db, subject.id)
+        except IntegrityError:
+            # The background worker assigned them concurrently
+            db.rollback()
+
+        clusters = faq_clusters.list_clusters(db, subject.id)
+        return jsonify({
+            "clusters": clusters,
+            "count": len(clusters),
+            "pending_count": sum(cluster["size"] for cluster in clusters)
+        })
+
+    except Exception as e:
+        db.rollback()
+        logger.error("Error getting question clusters: %s", e)
+        return jsonify({"error": "Failed to get question clusters"}), 500
+    finally:
+        db.close()
+
+@faq_bp.route('/subject/<int:subject_id>/questions/clusters/<int:cluster_id>/answer', methods=['POST'])
+@login_required
+@professor_required
+def answer_cluster(subject_id, cluster_id):
+    """Answer every pending question of a cluster at once"""
+    data = request.get_json()
+    if not data or not data.get('answer'):
+        return jsonify({"error": "Answer required"}), 400
+
+    db = next(get_db())
+    try:
+        subject, error = _load_subject_faqs(db, subject_id)
+        if error:
+            return error
+
+        entries = faq_clusters.cluster_entries(db, subject.id, cluster_id)
+        if not entries:
+            return jsonify({"error": "Cluster not found"}), 404
+
+        faq_store.answer_entries(db, entries, data['answer'])
+        faq_clusters.cluster_worker.schedule(subject.id)
+
+        return jsonify({
+            "message": f"Answered {len(entries)} questions",
+            "questions": [faq_store.entry_to_dict(entry) for entry in entries]
+        })
+
+    except Exception as e:
+        db.rollback()
+        logger.error("Error answering question cluster: %s", e)
+        return jsonify({"error": "Failed to answer cluster"}), 500
+    finally:
+        db.close()
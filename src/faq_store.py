@@ -0,0 +1,509 @@
+"""
+faq_store.py
+Subject FAQs kept in the faq_entries table as the source of truth.
+A subject's faq.csv is imported once, on first use. Every write bumps the
+subject's version and schedules a debounced background export that rewrites
+faq.csv in Drive, so many edits cost a single upload.
+Student questions land in the faq_submissions inbox without touching Drive;
+the exporter numbers them into faq_entries before each export.
+Edits made to faq.csv directly in Drive are detected from its revision
+metadata and merged in, both on FAQ views and right before each export.
+"""
+
+import hashlib
+import io
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from src import faq_csv, faq_clusters
+from src.config import settings
+from src.models import (
+    FAQEntry, FAQFileRevision, FAQSubmission, FAQSyncState, GoogleDriveCredentials, SessionLocal, Subject
+)
+from src.logging_config import get_logger
+
+logger = get_logger("faq")
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def now_string() -> str:
+    return datetime.now().strftime(DATE_FORMAT)
+
+
+def entry_to_dict(entry: FAQEntry) -> Dict[str, Any]:
+    """FAQ row in the shape of a faq.csv record"""
+    return {
+        'number': entry.number,
+        'question': entry.question,
+        'answer': entry.answer,
+        'date_asked': entry.date_asked,
+        'date_answered': entry.date_answered
+    }
+
+
+def _status(answer: Optional[str]) -> str:
+    return 'answered' if answer else 'pending'
+
+
+def parse_csv(content: str) -> List[Dict[str, Any]]:
+    """Records of a faq.csv file; rows without a usable number are numbered after the rest"""
+    records = list(faq_csv.read_records(io.StringIO(content or '')))
+
+    # Keep existing numbers, resolving duplicates and gaps left by hand edits
+    used = set()
+    next_number = max([r['number'] for r in records if r['number']] or [0]) + 1
+    for record in sorted(records, key=lambda r: (r['number'] is None, r['number'] or 0)):
+        if record['number'] is None or record['number'] in used:
+            record['number'] = next_number
+            next_number += 1
+        used.add(record['number'])
+    return records
+
+
+def render_csv(db, subject_id: int) -> str:
+    """faq.csv content for a subject, newest question first"""
+    buffer = io.StringIO()
+    entries = db.query(FAQEntry).filter_by(subject_id=subject_id) \
+        .order_by(FAQEntry.number.desc()).yield_per(500)
+    faq_csv.write_records(buffer, (entry_to_dict(entry) for entry in entries))
+    return buffer.getvalue()
+
+
+def is_imported(db, subject_id: int) -> bool:
+    return db.get(FAQSyncState, subject_id) is not None
+
+
+def ensure_imported(db, subject: Subject, drive_service_factory: Callable[[], Any]):
+    """
+    Load the subject's faq.csv into faq_entries the first time it is used
+
+    drive_service_factory is only called when an import is actually needed.
+    Concurrent imports are resolved by the sync state's primary key: the
+    losing transaction, entries included, is rolled back.
+    """
+    if is_imported(db, subject.id):
+        return
+
+    content = ''
+    if subject.faq_file_id:
+        drive_service = drive_service_factory()
+        # Revision first: an edit landing during the download is seen as a change later
+        revision = drive_service.get_file_revision(subject.faq_file_id)
+        content = drive_service.download_file(subject.faq_file_id) or ''
+        _record_revision(db, subject, revision)
+
+    for record in parse_csv(content):
+        db.add(FAQEntry(subject_id=subject.id, status=_status(record['answer']), **record))
+    db.add(FAQSyncState(subject_id=subject.id, version=0, exported_version=0, imported_at=datetime.utcnow()))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+
+class RevisionChecks:
+    """When each faq.csv was last confirmed unchanged in Drive, so views within the TTL skip the check"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def is_fresh(self, faq_file_id: str) -> bool:
+        with self._lock:
+            checked = self._checked.get(faq_file_id)
+            return checked is not None and time.monotonic() - checked < self.ttl
+
+    def mark(self, faq_file_id: str):
+        with self._lock:
+            self._checked[faq_file_id] = time.monotonic()
+
+
+revision_checks = RevisionChecks(ttl=settings.FAQ_REVISION_CHECK_TTL)
+
+
+def _content_md5(content: str) -> str:
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+
+def _record_revision(db, subject: Subject, revision: Dict[str, Any]):
+    """Remember the faq.csv revision our rows correspond to (committed by the caller)"""
+    known = db.get(FAQFileRevision, subject.id)
+    if known is None:
+        known = FAQFileRevision(subject_id=subject.id)
+        db.add(known)
+    known.faq_file_id = subject.faq_file_id
+    known.version = revision.get('version')
+    known.md5_checksum = revision.get('md5Checksum')
+    known.head_revision_id = revision.get('headRevisionId')
+    known.recorded_at = datetime.utcnow()
+
+
+def _changed_in_drive(db, subject: Subject, revision: Dict[str, Any]) -> bool:
+    """Whether faq.csv holds content this app neither imported nor exported"""
+    known = db.get(FAQFileRevision, subject.id)
+    if known and known.faq_file_id == subject.faq_file_id:
+        if revision.get('headRevisionId') and known.head_revision_id:
+            return revision['headRevisionId'] != known.head_revision_id
+        if revision.get('version') and known.version:
+            return revision['version'] != known.version
+    # Nothing recorded yet: unchanged only if Drive holds exactly what we would export
+    return revision.get('md5Checksum') != _content_md5(render_csv(db, subject.id))
+
+
+def merge_external(db, subject_id: int, records: List[Dict[str, Any]]):
+    """
+    Fold faq.csv records edited in Drive into faq_entries
+
+    With nothing unexported locally, Drive is authoritative and the rows are
+    made to match it. Otherwise local rows win, Drive-only questions are
+    appended and answers given only in Drive are kept; the merged result is
+    marked for export.
+    """
+    state = db.get(FAQSyncState, subject_id)
+    entries = {entry.number: entry for entry in db.query(FAQEntry).filter_by(subject_id=subject_id)}
+
+    if state.version <= state.exported_version:
+        numbers = {record['number']: record for record in records}
+        faq_clusters.forget(db, [
+            entry.id for number, entry in entries.items()
+            if number not in numbers or numbers[number]['question'] != entry.question
+        ])
+        for number, entry in entries.items():
+            if number not in numbers:
+                db.delete(entry)
+        db.flush()
+        for record in records:
+            entry = entries.get(record['number'])
+            if entry is None:
+                db.add(FAQEntry(subject_id=subject_id, status=_status(record['answer']), **record))
+            else:
+                entry.question = record['question']
+                entry.answer = record['answer']
+                entry.status = _status(record['answer'])
+                entry.date_asked = record['date_asked']
+                entry.date_answered = record['date_answered']
+        return
+
+    by_question = {entry.question: entry for entry in entries.values()}
+    next_number = max(entries, default=0) + 1
+    for record in records:
+        entry = entries.get(record['number'])
+        if entry is None or entry.question != record['question']:
+            entry = by_question.get(record['question'])
+        if entry is None:
+            record = dict(record, number=next_number)
+            next_number += 1
+            db.add(FAQEntry(subject_id=subject_id, status=_status(record['answer']), **record))
+        elif record['answer'] and not entry.answer:
+            entry.answer = record['answer']
+            entry.status = 'answered'
+            entry.date_answered = record['date_answered'] or now_string()
+    _mark_dirty(db, subject_id)
+
+
+def sync_from_drive(db, subject: Subject, drive_service) -> bool:
+    """
+    Merge faq.csv into faq_entries if it was edited in Drive
+
+    Costs one metadata call when unchanged, plus a download when changed.
+
+    Returns:
+        bool: True if Drive changes were merged
+    """
+    revision = drive_service.get_file_revision(subject.faq_file_id)
+    changed = _changed_in_drive(db, subject, revision)
+    if changed:
+        logger.info("faq.csv of subject %s was edited in Drive, merging", subject.id)
+        content = drive_service.download_file(subject.faq_file_id) or ''
+        merge_external(db, subject.id, parse_csv(content))
+    _record_revision(db, subject, revision)
+    db.commit()
+    revision_checks.mark(subject.faq_file_id)
+    return changed
+
+
+def refresh_from_drive(db, subject: Subject, drive_service_factory: Callable[[], Any]) -> bool:
+    """sync_from_drive, skipped while the last check is younger than FAQ_REVISION_CHECK_TTL"""
+    if not subject.faq_file_id or revision_checks.is_fresh(subject.faq_file_id):
+        return False
+    changed = sync_from_drive(db, subject, drive_service_factory())
+    if changed:
+        faq_exporter.schedule(subject.id)
+    return changed
+
+
+def _mark_dirty(db, subject_id: int):
+    """Bump the subject's FAQ version inside the caller's transaction"""
+    db.query(FAQSyncState).filter_by(subject_id=subject_id).update(
+        {FAQSyncState.version: FAQSyncState.version + 1},
+        synchronize_session=False
+    )
+
+
+def _commit_write(db, subject_id: int):
+    _mark_dirty(db, subject_id)
+    db.commit()
+    faq_exporter.schedule(subject_id)
+
+
+SORT_ORDERS = {
+    'newest': lambda: FAQEntry.number.desc(),
+    'oldest': lambda: FAQEntry.number.asc(),
+    'recently_answered': lambda: FAQEntry.date_answered.desc()
+}
+
+
+def query_entries(db, subject_id: int, status: Optional[str] = None, search: str = '',
+                  sort: str = 'newest', page: int = 1, page_size: int = 50) -> Tuple[List[FAQEntry], int]:
+    """
+    One page of a subject's FAQ rows with the total number of matches
+
+    Filtering on subject and status and ordering by number use the
+    (subject_id, status, number) index; search matches question or answer text.
+
+    Returns:
+        tuple: (entries, total)
+    """
+    query = db.query(FAQEntry).filter(FAQEntry.subject_id == subject_id)
+    if status:
+        query = query.filter(FAQEntry.status == status)
+    if search:
+        query = query.filter(
+            FAQEntry.question.contains(search, autoescape=True) |
+            FAQEntry.answer.contains(search, autoescape=True)
+        )
+
+    total = query.with_entities(func.count(FAQEntry.id)).scalar()
+    order = SORT_ORDERS.get(sort, SORT_ORDERS['newest'])()
+    entries = query.order_by(order, FAQEntry.number.desc()) \
+        .offset((page - 1) * page_size).limit(page_size).all()
+    return entries, total
+
+
+def get_entry(db, subject_id: int, number: int) -> Optional[FAQEntry]:
+    return db.query(FAQEntry).filter_by(subject_id=subject_id, number=number).first()
+
+
+def submit_question(db, subject_id: int, question: str) -> FAQSubmission:
+    """
+    Queue a student question durably, without Drive or the FAQ import
+
+    The flusher numbers queued questions into faq_entries and writes them to
+    faq.csv together, once per FAQ_FEEDBACK_FLUSH_INTERVAL.
+    """
+    submission = FAQSubmission(subject_id=subject_id, question=question, date_asked=now_string())
+    db.add(submission)
+    db.commit()
+    faq_exporter.schedule(subject_id, delay=settings.FAQ_FEEDBACK_FLUSH_INTERVAL)
+    return submission
+
+
+def drain_submissions(db, subject_id: int) -> int:
+    """
+    Move a subject's queued questions into faq_entries, in submission order
+
+    Each submission is claimed by deleting it, so concurrent drains never
+    number a question twice; numbers are taken after the claim, while this
+    transaction holds the database write lock.
+
+    Returns:
+        int: Number of questions added
+    """
+    submissions = db.query(FAQSubmission).filter_by(subject_id=subject_id).order_by(FAQSubmission.id).all()
+    if not submissions:
+        return 0
+
+    claimed = [
+        (submission.question, submission.date_asked) for submission in submissions
+        if db.query(FAQSubmission).filter_by(id=submission.id).delete(synchronize_session=False)
+    ]
+    if not claimed:
+        db.rollback()
+        return 0
+
+    number = db.query(func.max(FAQEntry.number)).filter_by(subject_id=subject_id).scalar() or 0
+    for question, date_asked in claimed:
+        number += 1
+        db.add(FAQEntry(
+            subject_id=subject_id,
+            number=number,
+            question=question,
+            status='pending',
+            date_asked=date_asked
+        ))
+    _mark_dirty(db, subject_id)
+    db.commit()
+    return len(claimed)
+
+
+def update_entry(db, entry: FAQEntry, question: Optional[str] = None,
+                 answer: Optional[str] = None) -> FAQEntry:
+    """Change a question's text and/or answer; answering stamps date_answered"""
+    if question is not None:
+        if question != entry.question:
+            faq_clusters.forget(db, [entry.id])
+        entry.question = question
+    if answer is not None:
+        entry.answer = answer
+        entry.status = _status(answer)
+        entry.date_answered = now_string()
+    _commit_write(db, entry.subject_id)
+    return entry
+
+
+def answer_entries(db, entries: List[FAQEntry], answer: str) -> List[FAQEntry]:
+    """Give several questions the same answer in one transaction and one faq.csv export"""
+    if not entries:
+        return entries
+    answered_at = now_string()
+    for entry in entries:
+        entry.answer = answer
+        entry.status = _status(answer)
+        entry.date_answered = answered_at
+    _commit_write(db, entries[0].subject_id)
+    return entries
+
+
+def delete_entry(db, entry: FAQEntry):
+    """Delete a question and close the gap in the numbering"""
+    subject_id, number = entry.subject_id, entry.number
+    faq_clusters.forget(db, [entry.id])
+    db.delete(entry)
+    db.flush()
+    # Shift in ascending order so the unique (subject, number) constraint holds row by row
+    for later in db.query(FAQEntry).filter(
+        FAQEntry.subject_id == subject_id,
+        FAQEntry.number > number
+    ).order_by(FAQEntry.number).all():
+        later.number -= 1
+        db.flush()
+    _commit_write(db, subject_id)
+
+
+class FAQExporter:
+    """
+    Background writer of faq.csv snapshots
+
+    schedule() is debounced per subject: writes within FAQ_EXPORT_DELAY of
+    the first one are coalesced into one export of the latest version.
+    Unexported versions found in the database at start-up are exported too.
+    """
+
+    def __init__(self, delay: float, retry_delay: float):
+        self.delay = delay
+        self.retry_delay = retry_delay
+        self._due: Dict[int, float] = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        """Start the writer thread and queue subjects with unexported changes (idempotent)"""
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="faq-exporter", daemon=True)
+            self._thread.start()
+
+        db = SessionLocal()
+        try:
+            pending = {subject_id for (subject_id,) in db.query(FAQSyncState.subject_id).filter(
+                FAQSyncState.version > FAQSyncState.exported_version
+            )}
+            pending.update(subject_id for (subject_id,) in db.query(FAQSubmission.subject_id).distinct())
+        finally:
+            db.close()
+        for subject_id in pending:
+            self.schedule(subject_id, delay=0)
+
+    def schedule(self, subject_id: int, delay: Optional[float] = None):
+        self.start()
+        due = time.monotonic() + (self.delay if delay is None else delay)
+        with self._condition:
+            # Keep an earlier deadline so a steady stream of edits cannot postpone the export forever
+            if subject_id not in self._due or due < self._due[subject_id]:
+                self._due[subject_id] = due
+                self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._due:
+                    self._condition.wait()
+                now = time.monotonic()
+                ready = [subject_id for subject_id, due in self._due.items() if due <= now]
+                if not ready:
+                    self._condition.wait(min(self._due.values()) - now)
+                    continue
+                for subject_id in ready:
+                    del self._due[subject_id]
+
+            for subject_id in ready:
+                try:
+                    self.export(subject_id)
+                except Exception as e:
+                    logger.error("Error exporting FAQ of subject %s: %s", subject_id, e)
+                    self.schedule(subject_id, delay=self.retry_delay)
+
+    def export(self, subject_id: int) -> bool:
+        """
+        Number queued questions and write the subject's current FAQ version to faq.csv
+
+        Returns:
+            bool: True if a new version was uploaded
+        """
+        from src.google_drive.service_cache import get_drive_service
+
+        db = SessionLocal()
+        try:
+            subject = db.get(Subject, subject_id)
+            if not subject or not subject.faq_file_id:
+                return False
+
+            drive_creds = db.query(GoogleDriveCredentials).filter_by(
+                professor_id=subject.professor_id,
+                is_active=True
+            ).first()
+            if not drive_creds:
+                logger.warning("Drive not connected, FAQ of subject %s not exported", subject_id)
+                return False
+            drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
+
+            ensure_imported(db, subject, lambda: drive_service)
+            if drain_submissions(db, subject_id):
+                faq_clusters.cluster_worker.schedule(subject_id)
+
+            state = db.get(FAQSyncState, subject_id)
+            if state.exported_version >= state.version:
+                return False
+
+            # Drive has no conditional update, so check right before writing
+            # and merge an edit made in Drive instead of overwriting it
+            sync_from_drive(db, subject, drive_service)
+            db.refresh(state)
+
+            version = state.version
+            content = render_csv(db, subject_id)
+            revision = drive_service.update_file(subject.faq_file_id, content)
+            _record_revision(db, subject, revision)
+            revision_checks.mark(subject.faq_file_id)
+
+            # Never move exported_version backwards past a concurrent export
+            db.query(FAQSyncState).filter(
+                FAQSyncState.subject_id == subject_id,
+                FAQSyncState.exported_version < version
+            ).update({
+                FAQSyncState.exported_version: version,
+                FAQSyncState.exported_at: datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+
+faq_exporter = FAQExporter(delay=settings.FAQ_EXPORT_DELAY, retry_delay=settings.FAQ_EXPORT_RETRY)
@@ -8,6 +8,10 @@ from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
 from flask import url_for, current_app
 import json
+from datetime import datetime
+from src.logging_config import get_logger
+
+logger = get_logger("drive")
 
 
 class GoogleDriveAuth:
@@ -37,7 +41,7 @@ class GoogleDriveAuth:
         """Generate authorization URL for Google OAuth"""
         """Generate authorization URL for Google OAuth"""
         redirect_uri = url_for('professor.oauth2callback', _external=True)
-        print("Redirect URI:", redirect_uri)  # Add this line
+        logger.debug("Redirect URI: %s", redirect_uri)
         flow = self.create_auth_flow(
         redirect_uri=redirect_uri
             )
@@ -48,30 +52,63 @@ class GoogleDriveAuth:
         )
         return authorization_url, state
 
-    def get_credentials_from_token(self, token_info):
-        """Create credentials object from stored token info"""
+    def get_credentials_from_token(self, token_info, on_refresh=None):
+        """
+        Create credentials object from stored token info
+        
+        Args:
+            token_info: Stored token dict
+            on_refresh: Optional callback(credentials) run after each token refresh
+        """
         if not token_info:
             return None
+
+        expiry = None
+        if token_info.get('expiry'):
+            # google-auth compares expiry against naive UTC datetimes
+            expiry = datetime.fromisoformat(token_info['expiry']).replace(tzinfo=None)
             
-        return Credentials(
+        return RefreshNotifyingCredentials(
             token=token_info.get('token'),
             refresh_token=token_info.get('refresh_token'),
             token_uri=token_info.get('token_uri'),
             client_id=token_info.get('client_id'),
             client_secret=token_info.get('client_secret'),
-            scopes=token_info.get('scopes')
+            scopes=token_info.get('scopes'),
+            expiry=expiry,
+            on_refresh=on_refresh
         )
 
     def process_oauth2_callback(self, flow, code):
         """Process OAuth2 callback and return token info"""
         flow.fetch_token(code=code)
-        credentials = flow.credentials
-
-        return {
-            'token': credentials.token,
-            'refresh_token': credentials.refresh_token,
-            'token_uri': credentials.token_uri,
-            'client_id': credentials.client_id,
-            'client_secret': credentials.client_secret,
-            'scopes': credentials.scopes
-        }
\ No newline at end of file
+        return credentials_to_token_info(flow.credentials)
+
+
+class RefreshNotifyingCredentials(Credentials):
+    """OAuth2 credentials that report refreshed tokens so they can be persisted"""
+
+    def __init__(self, *args, on_refresh=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._on_refresh = on_refresh
+
+    def refresh(self, request):
+        super().refresh(request)
+        if self._on_refresh:
+            try:
+                self._on_refresh(self)
+            except Exception as e:
+                logger.error("Error persisting refreshed token: %s", e)
+
+
+def credentials_to_token_info(credentials):
+    """Serialize credentials to the dict stored in GoogleDriveCredentials.token_info"""
+    return {
+        'token': credentials.token,
+        'refresh_token': credentials.refresh_token,
+        'token_uri': credentials.token_uri,
+        'client_id': credentials.client_id,
+        'client_secret': credentials.client_secret,
+        'scopes': credentials.scopes,
+        'expiry': credentials.expiry.isoformat() if credentials.expiry else None
+    }
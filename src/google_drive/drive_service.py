@@ -1,22 +1,140 @@
 # src/google_drive/drive_service.py
 
-from googleapiclient.discovery import build
+import httplib2
+import google_auth_httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.http import MediaIoBaseUpload, MediaFileUpload
 from googleapiclient.errors import HttpError
 from datetime import datetime
 import io
 import json
+import threading
+import time
 import mimetypes
+from contextlib import contextmanager
 from typing import Tuple, List, Dict, Any, Optional
 from googleapiclient.http import MediaIoBaseDownload
+from src.config import settings
+from src.logging_config import get_logger
+from src.google_drive.rate_limit import (
+    call_with_backoff, is_retryable, backoff_delay, rate_limiter, throttled_total, retries_total
+)
+
+logger = get_logger("drive")
+
+_discovery_document = None
+
+
+def _drive_discovery_document() -> Dict[str, Any]:
+    """Drive v3 discovery document bundled with the client, parsed once per process"""
+    global _discovery_document
+    if _discovery_document is None:
+        _discovery_document = json.loads(get_static_doc('drive', 'v3'))
+    return _discovery_document
+
+
+class PageOutOfRange(Exception):
+    """Requested listing page lies past the last page of the folder"""
+
+
+class FolderMetadataCache:
+    """
+    Process-wide cache of folder file counts and page cursors
+    
+    Entries expire after DRIVE_FOLDER_CACHE_TTL seconds and are invalidated
+    when this process uploads, deletes or renames files in the folder.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._counts: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self._page_tokens: Dict[Tuple[str, str, int], Tuple[float, Dict[int, str]]] = {}
+        self._lock = threading.Lock()
+
+    def get_count(self, folder_id: str, search_term: str = '') -> Optional[int]:
+        with self._lock:
+            entry = self._counts.get((folder_id, search_term))
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+            return None
+
+    def set_count(self, folder_id: str, search_term: str, count: int):
+        with self._lock:
+            self._counts[(folder_id, search_term)] = (time.monotonic(), count)
+
+    def get_page_tokens(self, folder_id: str, search_term: str, page_size: int) -> Dict[int, str]:
+        """Known cursors for a listing, keyed by page number"""
+        with self._lock:
+            key = (folder_id, search_term, page_size)
+            entry = self._page_tokens.get(key)
+            if not entry or time.monotonic() - entry[0] >= self.ttl:
+                entry = (time.monotonic(), {})
+                self._page_tokens[key] = entry
+            return entry[1]
+
+    def invalidate(self, folder_id: str):
+        with self._lock:
+            for key in [key for key in self._counts if key[0] == folder_id]:
+                del self._counts[key]
+            for key in [key for key in self._page_tokens if key[0] == folder_id]:
+                del self._page_tokens[key]
+
+
+folder_cache = FolderMetadataCache(ttl=settings.DRIVE_FOLDER_CACHE_TTL)
+
+
+class TransportPool:
+    """
+    Authorized HTTP transports of one professor, checked out for each call
+
+    httplib2 transports are not thread-safe, so a call borrows one for its
+    duration and returns it. Idle transports, and their keep-alive
+    connections, are reused by whichever thread calls next; at most `size`
+    are kept, extra ones made under load are dropped on return.
+    """
+
+    def __init__(self, credentials, size: int):
+        self.credentials = credentials
+        self.size = size
+        self._idle: List[google_auth_httplib2.AuthorizedHttp] = []
+        self._lock = threading.Lock()
+
+    def new_transport(self) -> google_auth_httplib2.AuthorizedHttp:
+        return google_auth_httplib2.AuthorizedHttp(
+            self.credentials,
+            http=httplib2.Http(timeout=settings.DRIVE_HTTP_TIMEOUT)
+        )
+
+    @contextmanager
+    def checkout(self):
+        with self._lock:
+            http = self._idle.pop() if self._idle else None
+        if http is None:
+            http = self.new_transport()
+        try:
+            yield http
+        finally:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(http)
+
 
 class GoogleDriveService:
     """Service class for Google Drive operations"""
     
-    def __init__(self, credentials):
+    def __init__(self, credentials, professor_id: Optional[int] = None,
+                 transports: Optional[TransportPool] = None):
         """Initialize the Drive service with credentials"""
         self.credentials = credentials
-        self.service = build('drive', 'v3', credentials=credentials)
+        # Calls count against this professor's client-side rate limit
+        self.professor_id = professor_id
+        # Every call runs on a transport checked out of this pool, so one
+        # service can be shared by all of a professor's request threads
+        self.transports = transports or TransportPool(credentials, settings.DRIVE_TRANSPORT_POOL_SIZE)
+        self.service = build_from_document(
+            _drive_discovery_document(), http=self.transports.new_transport()
+        )
 
     def create_subject_folder(self, root_folder_id: str, subject_name: str) -> Optional[str]:
         """
@@ -36,21 +154,21 @@ class GoogleDriveService:
                 'parents': [root_folder_id]
             }
             
-            folder = self.service.files().create(
-                body=folder_metadata,
-                fields='id',
-                supportsAllDrives=True
-            ).execute()
+            folder = self._create(folder_metadata, fields='id')
             
             return folder.get('id')
             
         except HttpError as error:
-            print(f'Error creating subject folder: {error}')
+            logger.error('Error creating subject folder: %s', error)
             return None
 
     def upload_file(self, file, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Upload a file to Drive
+        Upload a file to Drive with a chunked resumable upload
+        
+        The file is streamed in DRIVE_UPLOAD_CHUNK_SIZE chunks rather than read
+        into memory. Each chunk is rate limited and retried on throttling or
+        transient errors, resuming from the offset Drive confirmed.
         
         Args:
             file: File object from request
@@ -60,28 +178,37 @@ class GoogleDriveService:
             dict: Uploaded file information
         """
         try:
-            # Create file stream
-            file_stream = io.BytesIO(file.read())
+            # Werkzeug spools uploads to a temporary file; stream from it directly
+            file_stream = getattr(file, 'stream', file)
+            file_stream.seek(0)
             
-            # Create media upload object
             media = MediaIoBaseUpload(
                 file_stream,
                 mimetype=metadata.get('mimeType', 'application/octet-stream'),
+                chunksize=settings.DRIVE_UPLOAD_CHUNK_SIZE,
                 resumable=True
             )
             
-            # Upload file
-            file = self.service.files().create(
-                body=metadata,
+            # A pre-generated id keeps a retried session start from creating a second file
+            request = self.service.files().create(
+                body=dict(metadata, id=self._new_id()),
                 media_body=media,
-                fields='id, name, mimeType, size, modifiedTime',
+                fields='id, name, parents, mimeType, size, md5Checksum, modifiedTime',
                 supportsAllDrives=True
-            ).execute()
+            )
             
-            return file
+            # After a failed chunk the client asks Drive for the confirmed
+            # offset, so a retry resumes rather than restarts the upload
+            response = None
+            while response is None:
+                _, response = self._call(lambda http: request.next_chunk(http=http))
+            
+            for parent_id in metadata.get('parents', []):
+                folder_cache.invalidate(parent_id)
+            return response
             
         except HttpError as error:
-            print(f'Error uploading file: {error}')
+            logger.error('Error uploading file: %s', error)
             raise
         
     def delete_folder(self, folder_id: str) -> bool:
@@ -95,88 +222,383 @@ class GoogleDriveService:
             bool: True if successful
         """
         try:
-            # First, recursively delete all contents
-            files = self.list_folder_files(folder_id)[0]  # Get first element of tuple (files list)
-            
-            # Delete all files in the folder
-            for file in files:
-                try:
-                    self.delete_file(file['id'])
-                except Exception as e:
-                    print(f"Error deleting file {file['name']}: {str(e)}")
+            # First delete the contents, up to BATCH_LIMIT files per request
+            files = self.list_all_folder_files(folder_id)
+            names = {file['id']: file['name'] for file in files}
+            results = self.batch_delete(list(names), folder_id=folder_id)
+            for file_id, result in results.items():
+                if not result['success']:
+                    logger.error("Error deleting file %s: %s", names[file_id], result['error'])
             
             # Finally delete the folder itself
-            self.service.files().delete(
+            self._execute(self.service.files().delete(
                 fileId=folder_id,
                 supportsAllDrives=True
-            ).execute()
+            ))
             
+            folder_cache.invalidate(folder_id)
             return True
             
         except HttpError as error:
-            print(f'Error deleting folder: {error}')
+            logger.error('Error deleting folder: %s', error)
             raise
 
+    BATCH_LIMIT = 100
+
+    def _execute(self, request):
+        """Execute an API request under the rate limiter, with backoff on throttling"""
+        return self._call(lambda http: request.execute(http=http))
+
+    def _call(self, call, cost: float = 1.0):
+        """
+        Rate-limited, retried version of any single Drive call, e.g. a media chunk
+
+        call receives the transport checked out for the attempt.
+        """
+        def attempt():
+            with self.transports.checkout() as http:
+                return call(http)
+        return call_with_backoff(attempt, self.professor_id, cost)
+
+    def _new_id(self) -> str:
+        """Pre-generated file id; a second create with it fails with 409 instead of duplicating the file"""
+        return self._execute(self.service.files().generateIds(count=1, space='drive'))['ids'][0]
+
+    def _create(self, body: Dict[str, Any], fields: str, media_body=None) -> Dict[str, Any]:
+        """
+        Create a file or folder under a pre-generated id, so retrying the create is safe
+
+        If an attempt that failed on our side (timeout, 5xx) was applied by
+        Drive, the retry gets 409 and the file it created is returned.
+        """
+        body = dict(body, id=self._new_id())
+        try:
+            return self._execute(self.service.files().create(
+                body=body,
+                media_body=media_body,
+                fields=fields,
+                supportsAllDrives=True
+            ))
+        except HttpError as error:
+            if error.resp.status != 409:
+                raise
+            return self._execute(self.service.files().get(
+                fileId=body['id'],
+                fields=fields,
+                supportsAllDrives=True
+            ))
+
+    def _execute_batch(self, requests: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Run API requests through Drive's batch endpoint
+        
+        Items rejected by rate limits or transient errors are retried in a
+        later batch after backoff, up to DRIVE_MAX_RETRIES rounds.
+        
+        Args:
+            requests: Request key (usually a file ID) -> unexecuted API request
+            
+        Returns:
+            dict: Request key -> {'success', 'result'} or {'success', 'error', 'status'}
+        """
+        results = {}
+        retry_ids = set()
+        attempt = 0
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = {'success': True, 'result': response}
+                return
+            if isinstance(exception, HttpError) and is_retryable(exception) \
+                    and attempt < settings.DRIVE_MAX_RETRIES:
+                retry_ids.add(request_id)
+                throttled_total.inc(status=exception.resp.status)
+                return
+            status = getattr(getattr(exception, 'resp', None), 'status', None)
+            results[request_id] = {'success': False, 'error': str(exception), 'status': status}
+
+        pending = list(requests.items())
+        while pending:
+            retry_ids.clear()
+            for start in range(0, len(pending), self.BATCH_LIMIT):
+                chunk = pending[start:start + self.BATCH_LIMIT]
+                batch = self.service.new_batch_http_request(callback=callback)
+                for request_id, request in chunk:
+                    batch.add(request, request_id=request_id)
+                try:
+                    self._call(lambda http: batch.execute(http=http), cost=len(chunk))
+                except HttpError as error:
+                    # The whole batch was rejected; report it against each of its items
+                    logger.error('Error executing batch request: %s', error)
+                    for request_id, _ in chunk:
+                        results.setdefault(request_id, {
+                            'success': False, 'error': str(error), 'status': error.resp.status
+                        })
+
+            pending = [(request_id, request) for request_id, request in pending if request_id in retry_ids]
+            if pending:
+                rate_limiter.on_throttle(self.professor_id)
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                retries_total.inc(len(pending))
+        return results
+
+    def batch_delete(self, file_ids: List[str], folder_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Delete several files with batched requests
+        
+        Args:
+            file_ids: Drive file IDs
+            folder_id: Parent folder, if known, to invalidate its cached count
+            
+        Returns:
+            dict: File ID -> per-item result, see _execute_batch
+        """
+        results = self._execute_batch({
+            file_id: self.service.files().delete(fileId=file_id, supportsAllDrives=True)
+            for file_id in file_ids
+        })
+        if folder_id and file_ids:
+            folder_cache.invalidate(folder_id)
+        return results
+
+    def batch_rename(self, new_names: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Rename several files with batched requests
+        
+        Args:
+            new_names: Drive file ID -> new name
+            
+        Returns:
+            dict: File ID -> per-item result holding the updated file metadata
+        """
+        results = self._execute_batch({
+            file_id: self.service.files().update(
+                fileId=file_id,
+                body={'name': new_name},
+                fields='id, name, parents, mimeType, size, md5Checksum, modifiedTime',
+                supportsAllDrives=True
+            )
+            for file_id, new_name in new_names.items()
+        })
+        for result in results.values():
+            if result['success']:
+                for parent_id in result['result'].get('parents', []):
+                    folder_cache.invalidate(parent_id)
+        return results
+
+    def batch_get_metadata(
+        self,
+        file_ids: List[str],
+        fields: str = 'id, name, mimeType, size, modifiedTime, webViewLink, thumbnailLink, parents'
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch metadata of several files with batched requests
+        
+        Args:
+            file_ids: Drive file IDs
+            fields: Partial response fields, as for get_file_info
+            
+        Returns:
+            dict: File ID -> per-item result holding the file metadata
+        """
+        return self._execute_batch({
+            file_id: self.service.files().get(fileId=file_id, fields=fields, supportsAllDrives=True)
+            for file_id in file_ids
+        })
+
+    def _folder_query(self, folder_id: str, search_term: str = '') -> str:
+        query = f"'{folder_id}' in parents and trashed = false"
+        if search_term:
+            escaped = search_term.replace('\\', '\\\\').replace("'", "\\'")
+            query += f" and name contains '{escaped}'"
+        return query
+
+    def _process_file(self, file: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': file.get('id'),
+            'name': file.get('name'),
+            'mimeType': file.get('mimeType'),
+            'size': int(file.get('size', 0)),
+            'modifiedTime': file.get('modifiedTime'),
+            'thumbnailLink': file.get('thumbnailLink'),
+            'isSystemFile': file.get('name') == 'faq.csv'
+        }
+
     def list_folder_files(
         self, 
         folder_id: str, 
         search_term: str = '', 
-        page: int = 1, 
-        page_size: int = 10
-    ) -> Tuple[List[Dict[str, Any]], int]:
-        """List files in a folder with pagination and search"""
-        try:
-            # Build query
-            query = f"'{folder_id}' in parents and trashed = false"
-            if search_term:
-                query += f" and name contains '{search_term}'"
-            
-            # Get total count
-            total_files = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id)',
-                supportsAllDrives=True
-            ).execute()
-            total_count = len(total_files.get('files', []))
+        page_size: int = 10,
+        page_token: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        List one page of files in a folder
+        
+        Args:
+            folder_id: Drive folder ID
+            search_term: Optional name filter
+            page_size: Files per page
+            page_token: Cursor returned for the previous page, None for the first
             
-            # Get paginated results
-            skip = (page - 1) * page_size
-            results = self.service.files().list(
-                q=query,
+        Returns:
+            tuple: (files, nextPageToken or None on the last page)
+        """
+        try:
+            results = self._execute(self.service.files().list(
+                q=self._folder_query(folder_id, search_term),
                 spaces='drive',
-                fields='files(id, name, mimeType, size, modifiedTime, thumbnailLink)',
+                fields='nextPageToken, files(id, name, mimeType, size, modifiedTime, thumbnailLink)',
                 orderBy='modifiedTime desc',
                 pageSize=page_size,
-                pageToken=None if page == 1 else self._get_page_token(skip),
+                pageToken=page_token,
                 supportsAllDrives=True
-            ).execute()
-            
-            files = results.get('files', [])
-            
-            # Process files
-            processed_files = []
-            for file in files:
-                is_faq = file.get('name') == 'faq.csv'
-                processed_files.append({
-                    'id': file.get('id'),
-                    'name': file.get('name'),
-                    'mimeType': file.get('mimeType'),
-                    'size': int(file.get('size', 0)),
-                    'modifiedTime': file.get('modifiedTime'),
-                    'thumbnailLink': file.get('thumbnailLink'),
-                    'isSystemFile': is_faq  # Add this flag
-                })
-            
-            return processed_files, total_count
+            ))
+            
+            files = [self._process_file(file) for file in results.get('files', [])]
+            return files, results.get('nextPageToken')
             
         except HttpError as error:
-            print(f'Error listing files: {error}')
+            logger.error('Error listing files: %s', error)
             raise
 
+    def list_all_folder_files(self, folder_id: str) -> List[Dict[str, Any]]:
+        """List every file in a folder, following cursors"""
+        files = []
+        page_token = None
+        while True:
+            page, page_token = self.list_folder_files(folder_id, page_size=1000, page_token=page_token)
+            files.extend(page)
+            if not page_token:
+                return files
 
+    def count_folder_files(self, folder_id: str, search_term: str = '') -> int:
+        """Number of files in a folder, served from the folder cache when fresh"""
+        count = folder_cache.get_count(folder_id, search_term)
+        if count is not None:
+            return count
 
+        try:
+            count = 0
+            page_token = None
+            while True:
+                results = self._execute(self.service.files().list(
+                    q=self._folder_query(folder_id, search_term),
+                    spaces='drive',
+                    fields='nextPageToken, files(id)',
+                    pageSize=1000,
+                    pageToken=page_token,
+                    supportsAllDrives=True
+                ))
+                count += len(results.get('files', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+        except HttpError as error:
+            logger.error('Error counting files: %s', error)
+            raise
+
+        folder_cache.set_count(folder_id, search_term, count)
+        return count
+
+    def count_files_in_folders(self, folder_ids: List[str], chunk_size: int = 50) -> Dict[str, int]:
+        """
+        File counts for several folders in as few listings as possible
+        
+        Folders missing from the folder cache are counted together with one
+        "'a' in parents or 'b' in parents ..." query per chunk, so a dashboard
+        with many subjects costs one paged listing instead of one per folder.
+        
+        Returns:
+            dict: folder ID -> number of files
+        """
+        counts = {}
+        missing = []
+        for folder_id in dict.fromkeys(folder_ids):
+            count = folder_cache.get_count(folder_id)
+            if count is None:
+                missing.append(folder_id)
+            else:
+                counts[folder_id] = count
+
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            chunk_counts = dict.fromkeys(chunk, 0)
+            parents = " or ".join(f"'{folder_id}' in parents" for folder_id in chunk)
+            try:
+                page_token = None
+                while True:
+                    results = self._execute(self.service.files().list(
+                        q=f"({parents}) and trashed = false",
+                        spaces='drive',
+                        fields='nextPageToken, files(parents)',
+                        pageSize=1000,
+                        pageToken=page_token,
+                        supportsAllDrives=True
+                    ))
+                    for file in results.get('files', []):
+                        for parent_id in file.get('parents', []):
+                            if parent_id in chunk_counts:
+                                chunk_counts[parent_id] += 1
+                    page_token = results.get('nextPageToken')
+                    if not page_token:
+                        break
+            except HttpError as error:
+                logger.error('Error counting files: %s', error)
+                raise
+
+            for folder_id, count in chunk_counts.items():
+                folder_cache.set_count(folder_id, '', count)
+            counts.update(chunk_counts)
+
+        return counts
+
+    def get_page_token(self, folder_id: str, search_term: str, page: int, page_size: int) -> Optional[str]:
+        """
+        Cursor for a page number, using cached cursors from earlier pages
+        
+        Walks forward from the nearest known page with id-only listings only
+        when a page is requested out of order.
 
+        Raises:
+            PageOutOfRange: If the folder has fewer pages
+        """
+        if page <= 1:
+            return None
+
+        tokens = folder_cache.get_page_tokens(folder_id, search_term, page_size)
+        if page in tokens:
+            return tokens[page]
+
+        known = [p for p in tokens if p < page]
+        current = max(known) if known else 1
+        page_token = tokens.get(current)
+        try:
+            while current < page:
+                results = self._execute(self.service.files().list(
+                    q=self._folder_query(folder_id, search_term),
+                    spaces='drive',
+                    fields='nextPageToken',
+                    orderBy='modifiedTime desc',
+                    pageSize=page_size,
+                    pageToken=page_token,
+                    supportsAllDrives=True
+                ))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    raise PageOutOfRange(page)
+                current += 1
+                tokens[current] = page_token
+        except HttpError as error:
+            logger.error('Error resolving page token: %s', error)
+            raise
+        return page_token
+
+    def remember_page_token(self, folder_id: str, search_term: str, page: int,
+                            page_size: int, page_token: Optional[str]):
+        """Cache the cursor of a page so the next page costs a single call"""
+        if page_token:
+            folder_cache.get_page_tokens(folder_id, search_term, page_size)[page] = page_token
 
     def get_file_info(self, file_id: str) -> Dict[str, Any]:
         """
@@ -189,16 +611,16 @@ class GoogleDriveService:
             dict: File information
         """
         try:
-            file = self.service.files().get(
+            file = self._execute(self.service.files().get(
                 fileId=file_id,
-                fields='id, name, mimeType, size, modifiedTime, webViewLink, thumbnailLink',
+                fields='id, name, mimeType, size, modifiedTime, webViewLink, thumbnailLink, parents',
                 supportsAllDrives=True
-            ).execute()
+            ))
             
             return file
             
         except HttpError as error:
-            print(f'Error getting file info: {error}')
+            logger.error('Error getting file info: %s', error)
             raise
 
     def get_preview_url(self, file_id: str) -> str:
@@ -212,100 +634,135 @@ class GoogleDriveService:
             str: Preview URL
         """
         try:
-            file = self.service.files().get(
+            file = self._execute(self.service.files().get(
                 fileId=file_id,
                 fields='webViewLink',
                 supportsAllDrives=True
-            ).execute()
+            ))
             
             return file.get('webViewLink', '')
             
         except HttpError as error:
-            print(f'Error getting preview URL: {error}')
+            logger.error('Error getting preview URL: %s', error)
             raise
 
-    def delete_file(self, file_id: str) -> bool:
+    def delete_file(self, file_id: str, folder_id: Optional[str] = None) -> bool:
         """
         Delete a file from Drive
         
         Args:
             file_id: Drive file ID
+            folder_id: Parent folder, if known, to invalidate its cached count
             
         Returns:
             bool: True if successful
         """
         try:
-            self.service.files().delete(
+            self._execute(self.service.files().delete(
                 fileId=file_id,
                 supportsAllDrives=True
-            ).execute()
+            ))
+            if folder_id:
+                folder_cache.invalidate(folder_id)
             return True
             
         except HttpError as error:
-            print(f'Error deleting file: {error}')
+            logger.error('Error deleting file: %s', error)
             raise
 
-    def sync_folder(self, folder_id: str) -> bool:
+    MIRROR_FIELDS = 'id, name, parents, mimeType, size, md5Checksum, modifiedTime, trashed'
+
+    def list_folder_tree(self, root_folder_id: str) -> List[Dict[str, Any]]:
         """
-        Sync folder contents (refresh metadata)
+        List metadata of every item below a folder, breadth first
         
         Args:
-            folder_id: Drive folder ID
+            root_folder_id: Folder to start from (not included)
             
         Returns:
-            bool: True if successful
+            list: Raw Drive file resources with MIRROR_FIELDS
         """
+        items = []
+        pending = [root_folder_id]
         try:
-            # List all files to refresh metadata
-            self.service.files().list(
-                q=f"'{folder_id}' in parents",
-                spaces='drive',
-                fields='files(id, name, mimeType, size, modifiedTime)',
-                supportsAllDrives=True
-            ).execute()
-            
-            return True
+            while pending:
+                folder_id = pending.pop(0)
+                page_token = None
+                while True:
+                    results = self._execute(self.service.files().list(
+                        q=f"'{folder_id}' in parents and trashed = false",
+                        spaces='drive',
+                        fields=f'nextPageToken, files({self.MIRROR_FIELDS})',
+                        pageSize=1000,
+                        pageToken=page_token,
+                        supportsAllDrives=True
+                    ))
+                    for item in results.get('files', []):
+                        items.append(item)
+                        if item.get('mimeType') == 'application/vnd.google-apps.folder':
+                            pending.append(item['id'])
+                    page_token = results.get('nextPageToken')
+                    if not page_token:
+                        break
+            return items
             
         except HttpError as error:
-            print(f'Error syncing folder: {error}')
+            logger.error('Error listing folder tree: %s', error)
             raise
 
-    def verify_connection(self) -> bool:
+    def get_start_page_token(self) -> str:
+        """Changes API cursor for 'now'"""
+        try:
+            result = self._execute(self.service.changes().getStartPageToken(supportsAllDrives=True))
+            return result.get('startPageToken')
+        except HttpError as error:
+            logger.error('Error getting start page token: %s', error)
+            raise
+
+    def list_changes(self, page_token: str) -> Tuple[List[Dict[str, Any]], str]:
         """
-        Verify Drive connection is working
+        Fetch all changes since a cursor
         
+        Args:
+            page_token: Stored start page token
+            
         Returns:
-            bool: True if connected
+            tuple: (changes, new start page token to store)
         """
+        changes = []
         try:
-            self.service.files().list(pageSize=1).execute()
-            return True
-        except HttpError:
-            return False
+            while True:
+                results = self._execute(self.service.changes().list(
+                    pageToken=page_token,
+                    spaces='drive',
+                    pageSize=1000,
+                    includeRemoved=True,
+                    supportsAllDrives=True,
+                    includeItemsFromAllDrives=True,
+                    fields=f'nextPageToken, newStartPageToken, '
+                           f'changes(fileId, removed, file({self.MIRROR_FIELDS}))'
+                ))
+                changes.extend(results.get('changes', []))
+                if results.get('newStartPageToken'):
+                    return changes, results['newStartPageToken']
+                page_token = results.get('nextPageToken')
+                
+        except HttpError as error:
+            logger.error('Error listing changes: %s', error)
+            raise
 
-    def _get_page_token(self, skip: int) -> Optional[str]:
+    def verify_connection(self) -> bool:
         """
-        Get page token for pagination
+        Verify Drive connection is working
         
-        Args:
-            skip: Number of items to skip
-            
         Returns:
-            str: Page token
+            bool: True if connected
         """
-        if skip == 0:
-            return None
-            
         try:
-            result = self.service.files().list(
-                pageSize=skip,
-                fields='nextPageToken'
-            ).execute()
-            
-            return result.get('nextPageToken')
-            
+            self._execute(self.service.files().list(pageSize=1))
+            return True
         except HttpError:
-            return None
+            return False
 
     def check_file_permissions(self, file_id: str) -> bool:
         """
@@ -318,11 +775,11 @@ class GoogleDriveService:
             bool: True if has access
         """
         try:
-            self.service.files().get(
+            self._execute(self.service.files().get(
                 fileId=file_id,
                 fields='id',
                 supportsAllDrives=True
-            ).execute()
+            ))
             return True
         except HttpError:
             return False
@@ -342,25 +799,49 @@ class GoogleDriveService:
                 fh = io.FileIO(destination_path, mode='wb')
                 downloader = MediaIoBaseDownload(fh, request)
                 
+                def next_chunk(http):
+                    # The downloader sends each chunk on its request's transport
+                    request.http = http
+                    return downloader.next_chunk()
+
                 done = False
                 while done is False:
-                    status, done = downloader.next_chunk()
+                    status, done = self._call(next_chunk)
                 
                 fh.close()
                 return destination_path
             else:
                 # If no destination, return content directly
-                file_content = request.execute()
+                file_content = self._execute(request)
                 if isinstance(file_content, bytes):
                     return file_content.decode('utf-8')
                 return file_content
                 
         except Exception as e:
-            print(f"Error downloading file: {str(e)}")
+            logger.error("Error downloading file: %s", e)
+            raise
+
+    REVISION_FIELDS = 'id, version, md5Checksum, headRevisionId, modifiedTime'
+
+    def get_file_revision(self, file_id: str) -> Dict[str, Any]:
+        """
+        Revision metadata of a file, a cheap way to tell whether its content changed
+        
+        Returns:
+            dict: id, version, md5Checksum, headRevisionId and modifiedTime
+        """
+        try:
+            return self._execute(self.service.files().get(
+                fileId=file_id,
+                fields=self.REVISION_FIELDS,
+                supportsAllDrives=True
+            ))
+        except HttpError as error:
+            logger.error('Error getting file revision: %s', error)
             raise
 
     def update_file(self, file_id, content):
-        """Update a file's content"""
+        """Update a file's content, returning its new revision metadata"""
         try:
             # Convert string content to bytes if necessary
             if isinstance(content, str):
@@ -374,13 +855,14 @@ class GoogleDriveService:
             media = MediaIoBaseUpload(fh, mimetype='text/csv', resumable=True)
             
             # Update the file
-            self.service.files().update(
+            return self._execute(self.service.files().update(
                 fileId=file_id,
-                media_body=media
-            ).execute()
+                media_body=media,
+                fields=self.REVISION_FIELDS
+            ))
             
         except Exception as e:
-            print(f"Error updating file: {str(e)}")
+            logger.error("Error updating file: %s", e)
             raise
     
     def create_root_folder(self, professor_email: str) -> str:
@@ -391,16 +873,12 @@ class GoogleDriveService:
                 'mimeType': 'application/vnd.google-apps.folder'
             }
             
-            folder = self.service.files().create(
-                body=folder_metadata,
-                fields='id',
-                supportsAllDrives=True
-            ).execute()
+            folder = self._create(folder_metadata, fields='id')
             
             return folder.get('id')
             
         except HttpError as error:
-            print(f'Error creating root folder: {error}')
+            logger.error('Error creating root folder: %s', error)
             return None
         
     def update_folder_name(self, folder_id: str, new_name: str) -> bool:
@@ -408,31 +886,34 @@ class GoogleDriveService:
         try:
             file_metadata = {'name': new_name}
             
-            self.service.files().update(
+            self._execute(self.service.files().update(
                 fileId=folder_id,
                 body=file_metadata,
                 fields='id, name',
                 supportsAllDrives=True
-            ).execute()
+            ))
             
             return True
             
         except HttpError as error:
-            print(f'Error updating folder name: {error}')
+            logger.error('Error updating folder name: %s', error)
             raise
     
     def rename_file(self, file_id, new_name):
         """Rename a file in Google Drive"""
         try:
             file_metadata = {'name': new_name}
-            updated_file = self.service.files().update(
+            updated_file = self._execute(self.service.files().update(
                 fileId=file_id,
                 body=file_metadata,
-                fields='id, name, mimeType, modifiedTime'
-            ).execute()
+                fields='id, name, parents, mimeType, size, md5Checksum, modifiedTime'
+            ))
+            # Name filters may now match differently
+            for parent_id in updated_file.get('parents', []):
+                folder_cache.invalidate(parent_id)
             return updated_file
         except Exception as e:
-            print(f"Error renaming file in Drive: {str(e)}")
+            logger.error("Error renaming file in Drive: %s", e)
             raise
         
     def create_faq_file(self, folder_id: str) -> str:
@@ -458,72 +939,11 @@ class GoogleDriveService:
                 resumable=True
             )
             
-            file = self.service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id',
-                supportsAllDrives=True
-            ).execute()
+            file = self._create(file_metadata, fields='id', media_body=media)
             
+            folder_cache.invalidate(folder_id)
             return file.get('id')
             
         except HttpError as error:
-            print(f'Error creating FAQ file: {error}')
+            logger.error('Error creating FAQ file: %s', error)
             raise
-
-    def update_faq_file(self, file_id: str, new_question: str):
-        """Prepend a new question to the FAQ file"""
-        try:
-            # Download current content
-            request = self.service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while done is False:
-                status, done = downloader.next_chunk()
-                
-            # Get current content and decode
-            content = fh.getvalue().decode('utf-8')
-            
-            # Split into lines
-            lines = content.split('\n')
-            headers = lines[0]
-            existing_entries = lines[1:] if len(lines) > 1 else []
-            
-            # Get next number
-            next_number = 1
-            if existing_entries and existing_entries[0].strip():
-                try:
-                    next_number = int(existing_entries[0].split(',')[0]) + 1
-                except (IndexError, ValueError):
-                    pass
-            
-            # Create new entry
-            from datetime import datetime
-            current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            new_entry = f'{next_number},{new_question},,{current_date},'
-            
-            # Combine content
-            new_content = headers + '\n' + new_entry + '\n' + '\n'.join(filter(None, existing_entries))
-            
-            # Upload updated content
-            file_stream = io.BytesIO(new_content.encode('utf-8'))
-            media = MediaIoBaseUpload(
-                file_stream,
-                mimetype='text/csv',
-                resumable=True
-            )
-            
-            self.service.files().update(
-                fileId=file_id,
-                media_body=media,
-                supportsAllDrives=True
-            ).execute()
-            
-        except HttpError as error:
-            print(f'Error updating FAQ file: {error}')
-            raise
-            
-            
-        
-                
\ No newline at end of file
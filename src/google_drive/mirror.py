@@ -0,0 +1,176 @@
+"""google_drive/mirror
+Local mirror of a professor's Drive metadata in the app database.
+The first sync lists the professor's root folder tree; later syncs apply the
+delta from the Changes API using the stored start page token. Listings, counts
+and previews read the mirror instead of calling Drive.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func
+from src.config import settings
+from src.models import DriveFile, DriveSyncState
+from src.logging_config import get_logger
+
+logger = get_logger("drive")
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+def _apply_file(db, professor_id: int, item: Dict[str, Any]):
+    """Insert or update one mirrored row from a Drive file resource"""
+    parents = item.get('parents') or [None]
+    row = db.get(DriveFile, item['id'])
+    if row is None:
+        row = DriveFile(id=item['id'], professor_id=professor_id)
+        db.add(row)
+    row.name = item.get('name')
+    row.parent_id = parents[0]
+    row.mime_type = item.get('mimeType')
+    row.size = int(item.get('size', 0))
+    row.md5_checksum = item.get('md5Checksum')
+    row.modified_time = item.get('modifiedTime')
+
+
+def _remove_file(db, file_id: str):
+    db.query(DriveFile).filter(DriveFile.id == file_id).delete(synchronize_session=False)
+
+
+def file_to_dict(row: DriveFile) -> Dict[str, Any]:
+    """Mirrored row in the shape returned by GoogleDriveService.list_folder_files"""
+    return {
+        'id': row.id,
+        'name': row.name,
+        'mimeType': row.mime_type,
+        'size': row.size or 0,
+        'modifiedTime': row.modified_time,
+        'thumbnailLink': None,
+        'isSystemFile': row.name == 'faq.csv'
+    }
+
+
+def sync(db, professor_id: int, drive_service, root_folder_id: str) -> DriveSyncState:
+    """Bring the mirror up to date: full listing the first time, then Changes API deltas"""
+    state = db.get(DriveSyncState, professor_id)
+
+    if state is None or not state.start_page_token:
+        # Take the cursor first so changes made during the listing are replayed next time
+        start_page_token = drive_service.get_start_page_token()
+        items = drive_service.list_folder_tree(root_folder_id)
+
+        seen = {item['id'] for item in items}
+        for item in items:
+            _apply_file(db, professor_id, item)
+        stale = db.query(DriveFile.id).filter(DriveFile.professor_id == professor_id).all()
+        for (file_id,) in stale:
+            if file_id not in seen:
+                _remove_file(db, file_id)
+
+        if state is None:
+            state = DriveSyncState(professor_id=professor_id)
+            db.add(state)
+        state.start_page_token = start_page_token
+    else:
+        changes, new_token = drive_service.list_changes(state.start_page_token)
+        known_folders = {root_folder_id} | {
+            file_id for (file_id,) in db.query(DriveFile.id).filter(
+                DriveFile.professor_id == professor_id,
+                DriveFile.mime_type == FOLDER_MIME_TYPE
+            )
+        }
+        for change in changes:
+            item = change.get('file')
+            if change.get('removed') or not item or item.get('trashed'):
+                _remove_file(db, change['fileId'])
+                continue
+            parents = item.get('parents') or []
+            if any(parent in known_folders for parent in parents):
+                _apply_file(db, professor_id, item)
+                if item.get('mimeType') == FOLDER_MIME_TYPE:
+                    known_folders.add(item['id'])
+            else:
+                # Moved out of the professor's tree
+                _remove_file(db, item['id'])
+        state.start_page_token = new_token
+
+    state.last_synced = datetime.utcnow()
+    db.commit()
+    return state
+
+
+def ensure_fresh(db, professor_id: int, drive_service, root_folder_id: str,
+                 max_age: Optional[int] = None) -> DriveSyncState:
+    """Sync only if the mirror is older than max_age seconds"""
+    if max_age is None:
+        max_age = settings.DRIVE_MIRROR_MAX_AGE
+    state = db.get(DriveSyncState, professor_id)
+    if state and state.start_page_token and state.last_synced and \
+            datetime.utcnow() - state.last_synced < timedelta(seconds=max_age):
+        return state
+    return sync(db, professor_id, drive_service, root_folder_id)
+
+
+def is_synced(db, professor_id: int) -> bool:
+    state = db.get(DriveSyncState, professor_id)
+    return bool(state and state.start_page_token)
+
+
+def record_file(db, professor_id: int, item: Dict[str, Any]):
+    """Mirror a file this app just created or renamed, ahead of the next delta"""
+    _apply_file(db, professor_id, item)
+    db.commit()
+
+
+def forget_file(db, file_id: str):
+    """Drop a file this app just deleted, ahead of the next delta"""
+    _remove_file(db, file_id)
+    db.commit()
+
+
+def forget_folder(db, folder_id: str):
+    """Drop a deleted folder and its files"""
+    db.query(DriveFile).filter(
+        (DriveFile.parent_id == folder_id) | (DriveFile.id == folder_id)
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def get_file(db, file_id: str) -> Optional[DriveFile]:
+    return db.get(DriveFile, file_id)
+
+
+def list_folder(db, folder_id: str, search_term: str = '', page: int = 1,
+                page_size: int = 10) -> Tuple[List[Dict[str, Any]], int]:
+    """One page of a folder's files, newest first, with the total count"""
+    query = db.query(DriveFile).filter(
+        DriveFile.parent_id == folder_id,
+        DriveFile.mime_type != FOLDER_MIME_TYPE
+    )
+    if search_term:
+        query = query.filter(DriveFile.name.contains(search_term, autoescape=True))
+
+    total = query.with_entities(func.count(DriveFile.id)).scalar()
+    rows = query.order_by(DriveFile.modified_time.desc()) \
+        .offset((page - 1) * page_size).limit(page_size).all()
+    return [file_to_dict(row) for row in rows], total
+
+
+def count_by_folder(db, folder_ids: List[str]) -> Dict[str, int]:
+    """File counts for several mirrored folders in one grouped query"""
+    if not folder_ids:
+        return {}
+    rows = db.query(DriveFile.parent_id, func.count(DriveFile.id)).filter(
+        DriveFile.parent_id.in_(folder_ids),
+        DriveFile.mime_type != FOLDER_MIME_TYPE
+    ).group_by(DriveFile.parent_id).all()
+    counts = dict.fromkeys(folder_ids, 0)
+    counts.update(dict(rows))
+    return counts
+
+
+def list_all(db, folder_id: str) -> List[DriveFile]:
+    """Every mirrored file in a folder"""
+    return db.query(DriveFile).filter(
+        DriveFile.parent_id == folder_id,
+        DriveFile.mime_type != FOLDER_MIME_TYPE
+    ).all()
@@ -0,0 +1,205 @@
+"""google_drive/rate_limit
+Client-side throttling for Drive API calls.
+Every call takes a token from the professor's bucket and from the bucket shared
+by the whole project. When Drive pushes back with 403 rateLimitExceeded, 429 or
+a 5xx, both rates are halved and the call is retried with jittered exponential
+backoff (honoring Retry-After). Successful calls then raise the rates again.
+"""
+
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, TypeVar
+from googleapiclient.errors import HttpError
+from src.config import settings
+from src.metrics import registry
+from src.logging_config import get_logger
+
+logger = get_logger("drive")
+
+T = TypeVar("T")
+
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+throttled_total = registry.counter(
+    "drive_throttled_total", "Drive calls rejected by Drive's rate limits or failing transiently", ["status"]
+)
+retries_total = registry.counter(
+    "drive_retries_total", "Drive calls retried after backoff"
+)
+limiter_wait_seconds = registry.histogram(
+    "drive_limiter_wait_seconds", "Time Drive calls waited for a client-side rate limit token"
+)
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose refill rate adapts to throttling
+
+    The rate is halved on every throttle (down to min_rate) and grows back
+    additively on success (up to max_rate).
+    """
+
+    def __init__(self, max_rate: float, min_rate: float, burst: float):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self.capacity = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens, returning how long the caller must wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def on_success(self):
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+
+class DriveRateLimiter:
+    """Per-professor buckets plus one bucket for the whole project"""
+
+    def __init__(self):
+        self.project = AdaptiveTokenBucket(
+            settings.DRIVE_PROJECT_RATE, settings.DRIVE_MIN_RATE, settings.DRIVE_PROJECT_RATE
+        )
+        self._users: Dict[int, AdaptiveTokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _user(self, professor_id: Optional[int]) -> Optional[AdaptiveTokenBucket]:
+        if professor_id is None:
+            return None
+        with self._lock:
+            bucket = self._users.get(professor_id)
+            if bucket is None:
+                bucket = AdaptiveTokenBucket(
+                    settings.DRIVE_USER_RATE, settings.DRIVE_MIN_RATE, settings.DRIVE_USER_RATE
+                )
+                self._users[professor_id] = bucket
+            return bucket
+
+    def _buckets(self, professor_id: Optional[int]):
+        user = self._user(professor_id)
+        return [self.project, user] if user else [self.project]
+
+    def acquire(self, professor_id: Optional[int], tokens: float = 1.0):
+        """Block until both the professor's and the project's buckets allow the call"""
+        wait = max(bucket.reserve(tokens) for bucket in self._buckets(professor_id))
+        limiter_wait_seconds.observe(wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_throttle(self, professor_id: Optional[int]):
+        for bucket in self._buckets(professor_id):
+            bucket.on_throttle()
+
+    def on_success(self, professor_id: Optional[int]):
+        for bucket in self._buckets(professor_id):
+            bucket.on_success()
+
+
+rate_limiter = DriveRateLimiter()
+
+
+def _error_reason(error: HttpError) -> Optional[str]:
+    try:
+        return json.loads(error.content)['error']['errors'][0]['reason']
+    except Exception:
+        return None
+
+
+def is_retryable(error: HttpError) -> bool:
+    """Rate-limit rejections and transient server errors"""
+    status = error.resp.status
+    if status == 429 or status >= 500:
+        return True
+    return status == 403 and _error_reason(error) in RATE_LIMIT_REASONS
+
+
+def retry_after(error: HttpError) -> Optional[float]:
+    """Seconds from a Retry-After header, given as seconds or an HTTP date"""
+    value = error.resp.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except Exception:
+        return None
+
+
+def backoff_delay(attempt: int, error: Optional[HttpError] = None) -> float:
+    """Full-jitter exponential delay, never shorter than the server's Retry-After"""
+    cap = min(settings.DRIVE_BACKOFF_MAX, settings.DRIVE_BACKOFF_BASE * (2 ** attempt))
+    delay = random.uniform(0, cap)
+    server_delay = retry_after(error) if error is not None else None
+    return max(delay, server_delay) if server_delay is not None else delay
+
+
+def call_with_backoff(call: Callable[[], T], professor_id: Optional[int] = None, cost: float = 1.0) -> T:
+    """
+    Run a Drive call under the rate limiter, retrying throttled and transient failures
+
+    Args:
+        call: Zero-argument function making one Drive request
+        professor_id: Professor whose quota the call counts against, if known
+        cost: Tokens to take, e.g. the number of calls in a batch
+
+    Returns:
+        The call's result
+    """
+    attempt = 0
+    while True:
+        rate_limiter.acquire(professor_id, cost)
+        try:
+            result = call()
+        except HttpError as error:
+            if not is_retryable(error) or attempt >= settings.DRIVE_MAX_RETRIES:
+                raise
+            status = error.resp.status
+            throttled_total.inc(status=status)
+            if status in (403, 429):
+                rate_limiter.on_throttle(professor_id)
+            delay = backoff_delay(attempt, error)
+            # `error` is unbound once the except block ends
+            last_error = error
+        except (TimeoutError, ConnectionError) as error:
+            if attempt >= settings.DRIVE_MAX_RETRIES:
+                raise
+            throttled_total.inc(status="network")
+            delay = backoff_delay(attempt)
+            last_error = error
+        else:
+            rate_limiter.on_success(professor_id)
+            return result
+
+        attempt += 1
+        retries_total.inc()
+        logger.warning("Drive call failed (%s), retry %d in %.1fs", last_error, attempt, delay)
+        time.sleep(delay)
@@ -0,0 +1,143 @@
+"""google_drive/service_cache
+Per-professor cache of built GoogleDriveService objects.
+Avoids rebuilding the API client and its HTTP transports on every request.
+One service per professor is shared by all request threads: each call checks
+a transport out of the service's small pool, as httplib2 transports are not
+thread-safe. Credentials are refreshed ahead of expiry in the background and
+written back to the database when refreshed.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from google.auth.transport.requests import Request
+from src.config import settings
+from src.google_drive.auth import GoogleDriveAuth
+from src.google_drive.drive_service import GoogleDriveService
+from src.google_drive.token_store import persist_refreshed_token
+from src.logging_config import get_logger
+
+logger = get_logger("drive")
+
+
+def _fingerprint(token_info: Dict) -> str:
+    """Identity of a connection; changes when the professor reconnects Drive"""
+    identity = {
+        'refresh_token': token_info.get('refresh_token'),
+        'client_id': token_info.get('client_id'),
+        'scopes': sorted(token_info.get('scopes') or [])
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class DriveServiceCache:
+    """Bounded LRU of Drive services with idle expiry"""
+
+    def __init__(self, max_size: int, idle_ttl: float):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def get(self, professor_id: int, token_info: Dict) -> Optional[GoogleDriveService]:
+        """Return a cached service for this professor, building one if needed"""
+        if not token_info:
+            return None
+
+        self._start_refresher()
+        fingerprint = _fingerprint(token_info)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(professor_id)
+            if entry and entry['fingerprint'] == fingerprint and now - entry['last_used'] < self.idle_ttl:
+                entry['last_used'] = now
+                self._entries.move_to_end(professor_id)
+                return entry['service']
+
+        credentials = GoogleDriveAuth().get_credentials_from_token(
+            token_info,
+            on_refresh=lambda refreshed: persist_refreshed_token(professor_id, refreshed)
+        )
+        service = GoogleDriveService(credentials, professor_id=professor_id)
+
+        with self._lock:
+            entry = self._entries.get(professor_id)
+            if entry and entry['fingerprint'] == fingerprint:
+                # Another thread built one first; share it
+                service = entry['service']
+            else:
+                self._entries[professor_id] = {
+                    'service': service,
+                    'fingerprint': fingerprint,
+                    'last_used': now
+                }
+            self._entries[professor_id]['last_used'] = now
+            self._entries.move_to_end(professor_id)
+            self._evict(now)
+        return service
+
+    def invalidate(self, professor_id: int):
+        """Drop the cached service of a professor, e.g. after disconnecting Drive"""
+        with self._lock:
+            self._entries.pop(professor_id, None)
+
+    def _evict(self, now: float):
+        for key in [key for key, entry in self._entries.items()
+                    if now - entry['last_used'] >= self.idle_ttl]:
+            del self._entries[key]
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _start_refresher(self):
+        if self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="drive-token-refresher", daemon=True
+                )
+                self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(settings.DRIVE_TOKEN_REFRESH_INTERVAL)
+            try:
+                self.refresh_expiring()
+            except Exception as e:
+                logger.error("Error refreshing Drive tokens: %s", e)
+
+    def refresh_expiring(self):
+        """Refresh cached credentials that expire within DRIVE_TOKEN_REFRESH_MARGIN"""
+        with self._lock:
+            # Idle entries are otherwise only evicted by get(); don't keep refreshing them forever
+            self._evict(time.monotonic())
+            candidates = [(pid, entry['service'].credentials) for pid, entry in self._entries.items()]
+
+        deadline = datetime.utcnow() + timedelta(seconds=settings.DRIVE_TOKEN_REFRESH_MARGIN)
+        for professor_id, credentials in candidates:
+            if not credentials.refresh_token:
+                continue
+            if credentials.expiry is not None and credentials.expiry > deadline:
+                continue
+            try:
+                # The credentials' refresh hook persists the new token
+                credentials.refresh(Request())
+            except Exception as e:
+                logger.error("Error refreshing Drive token for professor %s: %s", professor_id, e)
+
+
+drive_service_cache = DriveServiceCache(
+    max_size=settings.DRIVE_SERVICE_CACHE_SIZE,
+    idle_ttl=settings.DRIVE_SERVICE_IDLE_TTL
+)
+
+
+def get_drive_service(professor_id: int, token_info: Dict) -> Optional[GoogleDriveService]:
+    """Cached Drive service for a professor's stored token info"""
+    return drive_service_cache.get(professor_id, token_info)
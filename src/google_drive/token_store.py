@@ -0,0 +1,40 @@
+"""google_drive/token_store
+Writes refreshed OAuth tokens back to GoogleDriveCredentials.token_info.
+"""
+
+from src.models import GoogleDriveCredentials, SessionLocal
+from src.google_drive.auth import credentials_to_token_info
+from src.logging_config import get_logger
+
+logger = get_logger("drive")
+
+
+def persist_refreshed_token(professor_id: int, credentials) -> bool:
+    """
+    Store a refreshed access token and its expiry
+
+    The whole token_info is replaced in one UPDATE, and only if the stored
+    refresh token still matches, so a concurrent reconnect is never overwritten.
+
+    Returns:
+        bool: True if the stored token was updated
+    """
+    db = SessionLocal()
+    try:
+        # Compared in the WHERE clause: after a reconnect (new refresh token) no row matches
+        updated = db.query(GoogleDriveCredentials).filter(
+            GoogleDriveCredentials.professor_id == professor_id,
+            GoogleDriveCredentials.is_active.is_(True),
+            GoogleDriveCredentials.token_info['refresh_token'].as_string() == credentials.refresh_token
+        ).update(
+            {GoogleDriveCredentials.token_info: credentials_to_token_info(credentials)},
+            synchronize_session=False
+        )
+        db.commit()
+        return updated == 1
+    except Exception as e:
+        db.rollback()
+        logger.error("Error persisting token for professor %s: %s", professor_id, e)
+        return False
+    finally:
+        db.close()
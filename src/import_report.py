@@ -0,0 +1,91 @@
+"""
+import_report.py
+Start-up import cost report.
+Imports a module in a fresh interpreter with -X importtime and breaks the
+time down by module and by top-level package.
+
+    python -m src.import_report            # report for app.py
+    python -m src.import_report --module src.chat_bot --top 40
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, NamedTuple
+
+LINE_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """Timings from -X importtime stderr output, in the order modules finished importing"""
+    timings = []
+    for line in output.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            timings.append(ImportTiming(module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return timings
+
+
+def measure(module: str) -> List[ImportTiming]:
+    """Import a module in a child interpreter and collect its import timings"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        # Import errors are printed after the timings; show them but still report
+        print(result.stderr.splitlines()[-1] if result.stderr else "import failed", file=sys.stderr)
+    return parse_importtime(result.stderr)
+
+
+def by_package(timings: List[ImportTiming]) -> Dict[str, int]:
+    """Self time summed per top-level package, in microseconds"""
+    totals: Dict[str, int] = defaultdict(int)
+    for timing in timings:
+        totals[timing.module.split(".")[0]] += timing.self_us
+    return dict(totals)
+
+
+def format_report(timings: List[ImportTiming], top: int) -> str:
+    total_us = sum(timing.self_us for timing in timings)
+    lines = [f"Total import time: {total_us / 1e6:.2f}s across {len(timings)} modules", ""]
+
+    lines.append(f"Top {top} modules by cumulative time:")
+    lines.append(f"{'cumulative':>12} {'self':>10}  module")
+    for timing in sorted(timings, key=lambda t: t.cumulative_us, reverse=True)[:top]:
+        lines.append(f"{timing.cumulative_us / 1e3:>10.1f}ms {timing.self_us / 1e3:>8.1f}ms  {timing.module}")
+
+    lines.append("")
+    lines.append(f"Top {top} packages by total self time:")
+    lines.append(f"{'time':>12} {'share':>7}  package")
+    for package, self_us in sorted(by_package(timings).items(), key=lambda item: item[1], reverse=True)[:top]:
+        share = self_us / total_us * 100 if total_us else 0.0
+        lines.append(f"{self_us / 1e3:>10.1f}ms {share:>6.1f}%  {package}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Break down start-up import time by module")
+    parser.add_argument("--module", default="app", help="module to import, e.g. app or src.professor")
+    parser.add_argument("--top", type=int, default=25, help="rows per table")
+    args = parser.parse_args()
+
+    timings = measure(args.module)
+    if not timings:
+        print("No import timings collected", file=sys.stderr)
+        sys.exit(1)
+    print(format_report(timings, args.top))
+
+
+if __name__ == "__main__":
+    main()
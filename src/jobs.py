@@ -0,0 +1,378 @@
+"""
+jobs.py
+Local job queue for knowledge base builds.
+Jobs are rows in kb_jobs. Worker processes claim the highest-priority, oldest
+queued job with a guarded UPDATE, so each job runs once however many workers
+poll. A subject has at most one queued job (requests while one is queued get
+that job back) and never two running builds: a job queued while its subject's
+build runs waits for it, then picks up what changed in the meantime.
+Progress is written back per stage and served by the status endpoint.
+Builds run in one designated process, which also runs the off-peak
+scheduler (src/kb_scheduler.py); web processes only queue jobs, unless
+JOB_WORKERS starts workers from each of them.
+
+    python -m src.jobs                 # JOB_RUNNER_WORKERS workers and the scheduler
+    python -m src.jobs --workers 4
+"""
+
+import argparse
+import atexit
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from src.config import settings
+from src.models import KBJob, SessionLocal
+from src.logging_config import configure_logging, get_logger
+
+logger = get_logger("jobs")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def job_to_dict(job: KBJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "subject_id": job.subject_id,
+        "status": job.status,
+        "stage": job.stage,
+        "trigger": job.trigger,
+        "full_rebuild": job.full_rebuild,
+        "progress": job.progress or {},
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.strftime('%Y-%m-%d %H:%M:%S') if job.created_at else None,
+        "started_at": job.started_at.strftime('%Y-%m-%d %H:%M:%S') if job.started_at else None,
+        "finished_at": job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None
+    }
+
+
+def _queued_job(db, subject_id: int) -> Optional[KBJob]:
+    return db.query(KBJob).filter_by(subject_id=subject_id, status='queued').first()
+
+
+def enqueue(db, subject_id: int, professor_id: int, priority: int = 0,
+            trigger: str = 'manual', full_rebuild: bool = False) -> Tuple[KBJob, bool]:
+    """
+    Queue a knowledge base build, reusing the subject's queued build if there is one
+
+    A reused job keeps the higher of the two priorities and becomes a full
+    rebuild if either request asked for one.
+
+    Returns:
+        tuple: (job, created) where created is False for a deduplicated request
+    """
+    job = _queued_job(db, subject_id)
+    if job is None:
+        job = KBJob(
+            id=uuid.uuid4().hex,
+            subject_id=subject_id,
+            professor_id=professor_id,
+            status='queued',
+            priority=priority,
+            trigger=trigger,
+            full_rebuild=full_rebuild,
+            progress={}
+        )
+        db.add(job)
+        try:
+            db.commit()
+            return job, True
+        except IntegrityError:
+            # Another request queued the same subject first
+            db.rollback()
+            job = _queued_job(db, subject_id)
+            if job is None:
+                raise
+
+    if priority > job.priority or (full_rebuild and not job.full_rebuild):
+        job.priority = max(priority, job.priority)
+        job.full_rebuild = job.full_rebuild or full_rebuild
+        db.commit()
+    return job, False
+
+
+def get_job(db, job_id: str) -> Optional[KBJob]:
+    return db.query(KBJob).filter_by(id=job_id).first()
+
+
+def latest_job(db, subject_id: int) -> Optional[KBJob]:
+    return db.query(KBJob).filter_by(subject_id=subject_id).order_by(KBJob.created_at.desc()).first()
+
+
+def fail_stale(db) -> int:
+    """
+    Fail running jobs whose worker stopped sending heartbeats (crashed or killed)
+
+    Returns:
+        int: Number of jobs failed
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_STALE_AFTER)
+    count = db.query(KBJob).filter(
+        KBJob.status == 'running',
+        KBJob.heartbeat_at < cutoff
+    ).update({
+        KBJob.status: 'failed',
+        KBJob.error: 'Worker stopped responding',
+        KBJob.finished_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    if count:
+        logger.warning("Failed %d stale knowledge base jobs", count)
+    return count
+
+
+def claim_next(db, worker: str) -> Optional[str]:
+    """
+    Mark the next runnable job as running for this worker
+
+    Skips subjects whose build is already running. The UPDATE only matches a
+    job that is still queued, so two workers cannot claim the same one.
+
+    Returns:
+        str: The claimed job id, or None if nothing is runnable
+    """
+    running = db.query(KBJob.subject_id).filter(KBJob.status == 'running')
+    candidates = db.query(KBJob.id).filter(
+        KBJob.status == 'queued',
+        ~KBJob.subject_id.in_(running)
+    ).order_by(KBJob.priority.desc(), KBJob.created_at).limit(5).all()
+
+    now = datetime.utcnow()
+    for (job_id,) in candidates:
+        claimed = db.query(KBJob).filter(
+            KBJob.id == job_id,
+            KBJob.status == 'queued'
+        ).update({
+            KBJob.status: 'running',
+            KBJob.worker: worker,
+            KBJob.started_at: now,
+            KBJob.heartbeat_at: now
+        }, synchronize_session=False)
+        db.commit()
+        if claimed:
+            return job_id
+    return None
+
+
+class ProgressReporter:
+    """progress(stage, done, total) callback writing to the job row, at most every JOB_PROGRESS_INTERVAL"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.stage: Optional[str] = None
+        self.progress: Dict[str, Dict[str, int]] = {}
+        self._written = 0.0
+
+    def __call__(self, stage: str, done: int, total: int):
+        self.stage = stage
+        self.progress[stage] = {"done": done, "total": total}
+        now = time.monotonic()
+        if done >= total or now - self._written >= settings.JOB_PROGRESS_INTERVAL:
+            self._written = now
+            self.flush()
+
+    def flush(self):
+        db = SessionLocal()
+        try:
+            db.query(KBJob).filter_by(id=self.job_id).update({
+                KBJob.stage: self.stage,
+                KBJob.progress: dict(self.progress),
+                KBJob.heartbeat_at: datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Could not record progress of job %s: %s", self.job_id, e)
+        finally:
+            db.close()
+
+
+def _heartbeat(job_id: str, stop: threading.Event):
+    """Keep a long stage (one large file, one embedding batch) from looking stale"""
+    while not stop.wait(settings.JOB_STALE_AFTER / 3):
+        db = SessionLocal()
+        try:
+            db.query(KBJob).filter_by(id=job_id).update(
+                {KBJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Could not record heartbeat of job %s: %s", job_id, e)
+        finally:
+            db.close()
+
+
+def _finish(job_id: str, **values):
+    db = SessionLocal()
+    try:
+        values['finished_at'] = datetime.utcnow()
+        db.query(KBJob).filter_by(id=job_id).update(
+            {getattr(KBJob, key): value for key, value in values.items()}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_job(job_id: str):
+    """Build the knowledge base of a claimed job and record the outcome"""
+    from src.kb_builder import build_knowledge_base
+
+    db = SessionLocal()
+    try:
+        job = get_job(db, job_id)
+        if job is None:
+            return
+        subject_id, professor_id, full_rebuild = job.subject_id, job.professor_id, job.full_rebuild
+    finally:
+        db.close()
+
+    reporter = ProgressReporter(job_id)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, stop), name="job-heartbeat", daemon=True)
+    heartbeat.start()
+    started = time.monotonic()
+    try:
+        result = build_knowledge_base(subject_id, professor_id, reporter, full_rebuild=full_rebuild)
+    except Exception as e:
+        logger.error("Knowledge base job %s for subject %s failed: %s", job_id, subject_id, e)
+        _finish(job_id, status='failed', error=str(e), stage=reporter.stage, progress=dict(reporter.progress))
+    else:
+        result["seconds"] = round(time.monotonic() - started, 1)
+        logger.info("Knowledge base job %s for subject %s done in %.1fs", job_id, subject_id, result["seconds"])
+        _finish(job_id, status='succeeded', result=result, stage=reporter.stage, progress=dict(reporter.progress))
+    finally:
+        stop.set()
+
+
+def worker_main(name: str):
+    """Worker loop: claim, build, repeat; sleep when the queue is empty"""
+    configure_logging()
+    logger.info("Job worker %s started", name)
+    while True:
+        db = SessionLocal()
+        try:
+            job_id = claim_next(db, name)
+        except Exception as e:
+            db.rollback()
+            logger.error("Job worker %s could not claim a job: %s", name, e)
+            job_id = None
+        finally:
+            db.close()
+
+        if job_id is None:
+            time.sleep(settings.JOB_POLL_INTERVAL)
+            continue
+        run_job(job_id)
+
+
+class JobWorkers:
+    """
+    Pool of worker processes, restarted if one dies
+
+    Workers are fresh interpreters running `python -m src.jobs --worker NAME`,
+    so they inherit neither the web process's threads and DB connections nor
+    its module-level start-up code.
+    """
+
+    def __init__(self, count: int, threads: Optional[int] = None):
+        self.count = count
+        self.threads = threads  # Math library threads per worker; None leaves the defaults
+        self._processes: List[subprocess.Popen] = []
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def start(self):
+        """Start missing workers and replace dead ones; also fails jobs a dead worker left running"""
+        if self.count <= 0:
+            return
+        with self._lock:
+            db = SessionLocal()
+            try:
+                fail_stale(db)
+            finally:
+                db.close()
+            self._processes = [process for process in self._processes if process.poll() is None]
+            env = dict(os.environ)
+            if self.threads:
+                # Keep torch/BLAS from starting one thread per core in every worker
+                for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+                    env[variable] = str(self.threads)
+            while len(self._processes) < self.count:
+                name = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+                self._processes.append(subprocess.Popen(
+                    [sys.executable, "-m", "src.jobs", "--worker", name],
+                    cwd=PROJECT_ROOT,
+                    env=env
+                ))
+                self._names.append(name)
+
+    def stop(self):
+        """Terminate the workers and fail the jobs they were running"""
+        with self._lock:
+            for process in self._processes:
+                if process.poll() is None:
+                    process.terminate()
+            for process in self._processes:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            self._processes = []
+            names, self._names = self._names, []
+        if not names:
+            return
+
+        db = SessionLocal()
+        try:
+            db.query(KBJob).filter(
+                KBJob.status == 'running',
+                KBJob.worker.in_(names)
+            ).update({
+                KBJob.status: 'failed',
+                KBJob.error: 'Worker stopped',
+                KBJob.finished_at: datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+job_workers = JobWorkers(settings.JOB_WORKERS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run knowledge base job workers")
+    parser.add_argument("--workers", type=int, default=settings.JOB_RUNNER_WORKERS, help="worker processes")
+    parser.add_argument("--worker", metavar="NAME", help=argparse.SUPPRESS)  # Single worker loop
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args.worker)
+        return
+
+    configure_logging()
+    from src.kb_scheduler import kb_scheduler
+
+    workers = JobWorkers(args.workers)
+    workers.start()
+    kb_scheduler.start()
+    logger.info("Running %d job workers", args.workers)
+    try:
+        while True:
+            time.sleep(settings.JOB_STALE_AFTER / 3)
+            workers.start()
+    except KeyboardInterrupt:
+        workers.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+kb_builder.py
+Builds a subject's knowledge base: sync the Drive mirror, download and parse
+the subject's files, split them into chunks, embed the chunks and save the
+FAISS index. Run by the job workers in src/jobs.py; progress is reported per
+stage through a progress(stage, done, total) callback.
+When the published index was built with the current settings, only files
+whose md5/modifiedTime differ from its manifest are downloaded and embedded.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from src.models import Subject, GoogleDriveCredentials, SessionLocal, SubjectActivity
+from src.google_drive.service_cache import get_drive_service
+from src.google_drive import mirror as drive_mirror
+from src.document_loader import ProgressCallback, SubjectDocumentLoader, same_file, same_files
+from src.vector_store import VectorStore, has_index, index_fingerprint, read_manifest
+from src.logging_config import get_logger
+
+logger = get_logger("kb")
+
+STAGES = ("sync", "download", "parse", "split", "embed", "save")
+
+
+class BuildError(Exception):
+    """Build cannot run, e.g. the subject is gone or Drive is disconnected"""
+
+
+def buildable_subjects(db, professor_id: Optional[int] = None) -> List[Subject]:
+    """Drive-enabled subjects of connected professors, most recently queried first"""
+    query = db.query(Subject).join(
+        GoogleDriveCredentials, GoogleDriveCredentials.professor_id == Subject.professor_id
+    ).outerjoin(
+        SubjectActivity, SubjectActivity.subject_id == Subject.id
+    ).filter(
+        GoogleDriveCredentials.is_active.is_(True),
+        Subject.drive_folder_id.isnot(None)
+    )
+    if professor_id is not None:
+        query = query.filter(Subject.professor_id == professor_id)
+    return query.order_by(
+        SubjectActivity.last_queried_at.is_(None),
+        SubjectActivity.last_queried_at.desc(),
+        Subject.id
+    ).all()
+
+
+def reusable_manifest(professor_id: int, subject_id: int) -> Optional[Dict[str, Any]]:
+    """Manifest of the published index if it was built with the current settings"""
+    manifest = read_manifest(professor_id, subject_id)
+    if manifest is None or manifest.get("fingerprint") != index_fingerprint():
+        return None
+    return manifest
+
+
+def is_stale(db, subject: Subject) -> bool:
+    """
+    Whether the subject's folder changed since its index was built
+
+    Compares the Drive mirror (which the caller keeps fresh) with the file
+    list of the published manifest, by file id and version. Files that failed
+    to load count as built until they change. Indexes without a usable
+    manifest count as stale; subjects without an index do not.
+    """
+    if not has_index(subject.professor_id, subject.id):
+        return False
+    manifest = reusable_manifest(subject.professor_id, subject.id)
+    if manifest is None:
+        return True
+
+    previous = manifest.get("files", {})
+    current = {
+        row.id: {'md5Checksum': row.md5_checksum, 'modifiedTime': row.modified_time}
+        for row in drive_mirror.list_all(db, subject.drive_folder_id)
+    }
+    if current.keys() != previous.keys():
+        return True
+    return not all(same_file(previous[file_id], file) for file_id, file in current.items())
+
+
+def build_knowledge_base(subject_id: int, professor_id: int,
+                         progress: Optional[ProgressCallback] = None,
+                         full_rebuild: bool = False) -> Dict[str, Any]:
+    """
+    Sync files and create/update the knowledge base of a subject
+
+    Returns:
+        dict: document_count (chunks embedded), file_count, files_reused, files_failed and incremental
+    """
+    report = progress or (lambda stage, done, total: None)
+    db = SessionLocal()
+    try:
+        subject = db.query(Subject).filter_by(id=subject_id, professor_id=professor_id).first()
+        if not subject:
+            raise BuildError("Subject not found")
+
+        drive_creds = db.query(GoogleDriveCredentials).filter_by(
+            professor_id=professor_id,
+            is_active=True
+        ).first()
+        if not drive_creds:
+            raise BuildError("Drive not connected")
+
+        # Apply pending Drive changes to the metadata mirror first
+        report("sync", 0, 1)
+        drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
+        drive_mirror.sync(db, professor_id, drive_service, drive_creds.drive_folder_id)
+        drive_creds.last_synced = datetime.utcnow()
+        db.commit()
+        report("sync", 1, 1)
+    finally:
+        db.close()
+
+    manifest = None if full_rebuild else reusable_manifest(professor_id, subject_id)
+    loader = SubjectDocumentLoader()
+    documents = loader.load_subject_documents(
+        subject_id=subject_id,
+        professor_id=professor_id,
+        progress=report,
+        previous_files=manifest["files"] if manifest else None
+    )
+    result = {
+        "document_count": len(documents),
+        "file_count": len(loader.files),
+        "files_reused": len(loader.unchanged),
+        "files_failed": len(loader.failed),
+        "incremental": manifest is not None
+    }
+
+    vector_store = VectorStore()
+    if manifest is not None:
+        if same_files(manifest["files"], loader.files):
+            logger.info("Knowledge base of subject %s is up to date", subject_id)
+            return result
+        if not documents and not loader.unchanged:
+            raise BuildError("No documents could be loaded")
+        updated = vector_store.update_from_documents(
+            documents,
+            professor_id=professor_id,
+            subject_id=subject_id,
+            keep_file_ids=loader.unchanged,
+            progress=report,
+            files=loader.files
+        )
+        if updated is None:
+            raise BuildError("Knowledge base was deleted during the update")
+        report("save", 1, 1)
+        logger.info("Updated knowledge base of subject %s: %d new chunks, %d files reused",
+                    subject_id, len(documents), len(loader.unchanged))
+        return result
+
+    if not documents:
+        raise BuildError("No documents could be loaded")
+
+    vector_store.create_from_documents(
+        documents,
+        professor_id=professor_id,
+        subject_id=subject_id,
+        progress=report,
+        files=loader.files
+    )
+    report("save", 1, 1)
+
+    logger.info("Built knowledge base of subject %s from %d chunks", subject_id, len(documents))
+    return result
@@ -0,0 +1,153 @@
+"""
+kb_scheduler.py
+Keeps knowledge bases fresh without the dashboard button.
+Every KB_SCHEDULE_INTERVAL seconds inside the off-peak window
+(KB_SCHEDULE_WINDOW, local hours), each connected professor's Drive mirror
+is brought up to date with a Changes API delta, and subjects whose files
+differ (md5/modifiedTime) from their last build's manifest are queued as
+incremental knowledge base jobs. At most KB_SCHEDULE_CONCURRENCY scheduled
+jobs are queued or running at once, and at most KB_SCHEDULE_MAX_PER_HOUR are
+queued per hour. The scheduler thread runs in the job runner
+(`python -m src.jobs`), so there is one however many web processes serve.
+
+    python -m src.kb_scheduler             # one check, e.g. from cron (skipped outside the window)
+    python -m src.kb_scheduler --now       # one check now, ignoring the window
+"""
+
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from src.config import settings
+from src.models import GoogleDriveCredentials, KBJob, SessionLocal
+from src.google_drive.service_cache import get_drive_service
+from src.google_drive import mirror as drive_mirror
+from src.kb_builder import buildable_subjects, is_stale
+from src.logging_config import configure_logging, get_logger
+from src import jobs
+
+logger = get_logger("kb")
+
+# Below dashboard (0) and bulk rebuild (negative rank) priorities
+SCHEDULED_PRIORITY = -1_000_000
+
+
+def in_window(now: Optional[datetime] = None, window: Optional[str] = None) -> bool:
+    """Whether the local hour falls in an "H-H" window, end exclusive; "22-6" wraps midnight"""
+    hour = (now or datetime.now()).hour
+    start, end = (int(part) for part in (window or settings.KB_SCHEDULE_WINDOW).split("-"))
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def _budget(db) -> int:
+    """Scheduled jobs that may be queued now under the concurrency and hourly limits"""
+    active = db.query(KBJob).filter(
+        KBJob.trigger == 'scheduled',
+        KBJob.status.in_(('queued', 'running'))
+    ).count()
+    recent = db.query(KBJob).filter(
+        KBJob.trigger == 'scheduled',
+        KBJob.created_at >= datetime.utcnow() - timedelta(hours=1)
+    ).count()
+    return min(settings.KB_SCHEDULE_CONCURRENCY - active, settings.KB_SCHEDULE_MAX_PER_HOUR - recent)
+
+
+def check(db) -> int:
+    """
+    Queue incremental builds for subjects whose folders changed since their last build
+
+    Returns:
+        int: Number of jobs queued
+    """
+    budget = _budget(db)
+    if budget <= 0:
+        return 0
+
+    busy = {subject_id for (subject_id,) in db.query(KBJob.subject_id).filter(
+        KBJob.status.in_(('queued', 'running'))
+    )}
+    refreshed = set()
+    queued = 0
+    for subject in buildable_subjects(db):
+        if queued >= budget:
+            break
+        if subject.id in busy:
+            continue
+
+        if subject.professor_id not in refreshed:
+            refreshed.add(subject.professor_id)
+            drive_creds = db.query(GoogleDriveCredentials).filter_by(
+                professor_id=subject.professor_id,
+                is_active=True
+            ).first()
+            try:
+                drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
+                drive_mirror.ensure_fresh(db, subject.professor_id, drive_service, drive_creds.drive_folder_id)
+            except Exception as e:
+                db.rollback()
+                logger.error("Could not refresh Drive mirror of professor %s: %s", subject.professor_id, e)
+
+        if is_stale(db, subject):
+            jobs.enqueue(db, subject.id, subject.professor_id, priority=SCHEDULED_PRIORITY, trigger='scheduled')
+            queued += 1
+            logger.info("Queued scheduled update of subject %s", subject.id)
+    return queued
+
+
+class KBScheduler:
+    """Background thread running check() every KB_SCHEDULE_INTERVAL inside the off-peak window"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the scheduler thread (idempotent); does nothing if KB_SCHEDULER_ENABLED is off"""
+        if not settings.KB_SCHEDULER_ENABLED:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="kb-scheduler", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not in_window():
+                continue
+            db = SessionLocal()
+            try:
+                check(db)
+            except Exception as e:
+                db.rollback()
+                logger.error("Error checking knowledge bases for changes: %s", e)
+            finally:
+                db.close()
+
+
+kb_scheduler = KBScheduler(settings.KB_SCHEDULE_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue updates of knowledge bases whose Drive folders changed")
+    parser.add_argument("--now", action="store_true", help="check even outside the off-peak window")
+    args = parser.parse_args()
+
+    configure_logging()
+    if not args.now and not in_window():
+        print(f"Outside the off-peak window {settings.KB_SCHEDULE_WINDOW}; nothing queued")
+        return
+
+    db = SessionLocal()
+    try:
+        print(f"Queued {check(db)} knowledge base updates")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
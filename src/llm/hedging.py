@@ -0,0 +1,140 @@
+"""
+llm/hedging.py
+Hedged completions for LLM tail latency.
+If the primary model has not streamed a first token within LLM_HEDGE_AFTER_MS,
+the same prompt is sent to LLM_FALLBACK_MODEL; the first to answer wins and the
+other request is cancelled.
+"""
+
+import queue
+import threading
+import time
+from typing import Iterator, Optional
+from src.llm.providers import CancelToken, LLMProvider
+from src.metrics import registry
+
+request_seconds = registry.histogram(
+    "llm_request_seconds", "Full LLM completion latency", ["model"]
+)
+first_token_seconds = registry.histogram(
+    "llm_time_to_first_token_seconds", "LLM time to first streamed token", ["model"]
+)
+hedges_total = registry.counter(
+    "llm_hedged_requests_total", "Hedge requests sent to the fallback model", ["model"]
+)
+wins_total = registry.counter(
+    "llm_hedge_wins_total", "Hedged completions won, by model", ["model"]
+)
+errors_total = registry.counter(
+    "llm_errors_total", "Failed LLM requests", ["model"]
+)
+
+
+class _Attempt(threading.Thread):
+    """One streamed completion, reporting progress on a shared event queue"""
+
+    def __init__(self, provider: LLMProvider, prompt: str, model: str, events: queue.Queue):
+        super().__init__(daemon=True)
+        self.provider = provider
+        self.prompt = prompt
+        self.model = model
+        self.events = events
+        self.cancel = CancelToken()
+        self.chunks = []
+
+    def run(self):
+        started = time.perf_counter()
+        first = True
+        try:
+            for chunk in self.provider.stream(self.prompt, self.model, self.cancel):
+                if first:
+                    first_token_seconds.observe(time.perf_counter() - started, model=self.model)
+                    self.events.put(("first", self, None))
+                    first = False
+                self.chunks.append(chunk)
+            if self.cancel.is_set():
+                return
+            if first:
+                # Empty completion still counts as an answer
+                self.events.put(("first", self, None))
+            request_seconds.observe(time.perf_counter() - started, model=self.model)
+            self.events.put(("done", self, None))
+        except Exception as e:
+            if not self.cancel.is_set():
+                errors_total.inc(model=self.model)
+                self.events.put(("error", self, e))
+
+
+class HedgedProvider(LLMProvider):
+    """Wraps a provider with optional hedging and per-model latency metrics"""
+
+    def __init__(self, provider: LLMProvider, fallback_model: Optional[str] = None,
+                 hedge_after_ms: int = 0):
+        super().__init__(provider.default_model)
+        self.provider = provider
+        self.name = provider.name
+        self.fallback_model = fallback_model
+        self.hedge_after_ms = hedge_after_ms
+
+    def stream(self, prompt: str, model: Optional[str] = None,
+               cancel: Optional[CancelToken] = None) -> Iterator[str]:
+        return self.provider.stream(prompt, model, cancel)
+
+    def complete(self, prompt: str, model: Optional[str] = None) -> str:
+        primary = model or self.provider.default_model
+        if not self.fallback_model or self.hedge_after_ms <= 0:
+            started = time.perf_counter()
+            try:
+                response = self.provider.complete(prompt, primary)
+            except Exception:
+                errors_total.inc(model=primary)
+                raise
+            request_seconds.observe(time.perf_counter() - started, model=primary)
+            return response
+        return self._hedged_complete(prompt, primary)
+
+    def _hedged_complete(self, prompt: str, primary: str) -> str:
+        events = queue.Queue()
+        attempts = [_Attempt(self.provider, prompt, primary, events)]
+        attempts[0].start()
+        deadline = time.monotonic() + self.hedge_after_ms / 1000.0
+        failed = 0
+        winner = None
+
+        def start_hedge():
+            hedges_total.inc(model=self.fallback_model)
+            attempt = _Attempt(self.provider, prompt, self.fallback_model, events)
+            attempts.append(attempt)
+            attempt.start()
+
+        while winner is None:
+            timeout = max(0.0, deadline - time.monotonic()) if len(attempts) == 1 else None
+            try:
+                kind, attempt, error = events.get(timeout=timeout)
+            except queue.Empty:
+                start_hedge()
+                continue
+
+            if kind == "first":
+                winner = attempt
+            elif kind == "error":
+                failed += 1
+                if len(attempts) == 1:
+                    start_hedge()
+                elif failed == len(attempts):
+                    raise error
+
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel.cancel()
+        wins_total.inc(model=winner.model)
+
+        # Drain until the winner finishes; losers' events are ignored
+        while True:
+            kind, attempt, error = events.get()
+            if attempt is not winner:
+                continue
+            if kind == "done":
+                return "".join(winner.chunks)
+            if kind == "error":
+                raise error
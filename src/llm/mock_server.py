@@ -0,0 +1,107 @@
+"""
+llm/mock_server.py
+Local OpenAI-compatible chat completions server for load tests.
+Latency is drawn from a configurable distribution; streaming responses are
+sent as server-sent events like OpenRouter's.
+
+Usage:
+    python -m src.llm.mock_server --port 8089 --latency lognormal --mean-ms 800
+"""
+
+import argparse
+import json
+import random
+import time
+import uuid
+from flask import Flask, Response, jsonify, request
+
+app = Flask(__name__)
+
+config = {
+    "latency": "constant",  # constant | uniform | lognormal
+    "mean_ms": 500.0,
+    "spread": 0.5,  # uniform: +/- fraction of mean, lognormal: sigma
+    "tokens": 120,
+    "token_ms": 5.0
+}
+
+MOCK_WORDS = ("the lecture notes explain this concept with an example from the course "
+              "material and the key idea is covered in the slides").split()
+
+
+def sample_latency() -> float:
+    """Time to first token in seconds"""
+    mean = config["mean_ms"] / 1000.0
+    if config["latency"] == "uniform":
+        return max(0.0, random.uniform(mean * (1 - config["spread"]), mean * (1 + config["spread"])))
+    if config["latency"] == "lognormal":
+        sigma = config["spread"]
+        # Pick mu so the distribution mean equals mean_ms
+        mu = -sigma ** 2 / 2
+        return mean * random.lognormvariate(mu, sigma)
+    return mean
+
+
+def mock_tokens():
+    return [MOCK_WORDS[i % len(MOCK_WORDS)] + " " for i in range(config["tokens"])]
+
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    data = request.get_json() or {}
+    model = data.get("model", "mock-model")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    first_token_delay = sample_latency()
+
+    if not data.get("stream"):
+        time.sleep(first_token_delay + config["tokens"] * config["token_ms"] / 1000.0)
+        return jsonify({
+            "id": completion_id,
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(mock_tokens()).strip()},
+                "finish_reason": "stop"
+            }]
+        })
+
+    def generate():
+        time.sleep(first_token_delay)
+        for token in mock_tokens():
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            time.sleep(config["token_ms"] / 1000.0)
+        yield "data: [DONE]\n\n"
+
+    return Response(generate(), mimetype='text/event-stream')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", choices=["constant", "uniform", "lognormal"], default="constant")
+    parser.add_argument("--mean-ms", type=float, default=500.0, help="Mean time to first token")
+    parser.add_argument("--spread", type=float, default=0.5, help="Uniform fraction or lognormal sigma")
+    parser.add_argument("--tokens", type=int, default=120, help="Tokens per completion")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="Delay between streamed tokens")
+    args = parser.parse_args()
+
+    config.update({
+        "latency": args.latency,
+        "mean_ms": args.mean_ms,
+        "spread": args.spread,
+        "tokens": args.tokens,
+        "token_ms": args.token_ms
+    })
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+llm/providers.py
+LLM provider interface and OpenAI-compatible implementations.
+OpenRouter is the production provider; the mock provider talks to the local
+server in src/llm/mock_server.py for offline load tests.
+"""
+
+import json
+import threading
+from abc import ABC, abstractmethod
+import requests
+from typing import Iterator, Optional
+from src.config import settings
+from src.logging_config import get_logger
+
+logger = get_logger("chat")
+
+
+class CancelToken:
+    """Cancellation flag that also runs callbacks, e.g. closing an open response"""
+
+    def __init__(self):
+        self._cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def is_set(self) -> bool:
+        return self._cancelled
+
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+class LLMProvider(ABC):
+    """Interface for chat completion providers"""
+
+    name = "base"
+
+    def __init__(self, default_model: str):
+        self.default_model = default_model
+
+    @abstractmethod
+    def complete(self, prompt: str, model: Optional[str] = None) -> str:
+        """Return the full completion for a single user prompt"""
+
+    @abstractmethod
+    def stream(self, prompt: str, model: Optional[str] = None,
+               cancel: Optional[CancelToken] = None) -> Iterator[str]:
+        """Yield completion text chunks as they arrive"""
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Provider for any OpenAI-compatible /chat/completions endpoint"""
+
+    name = "openai-compatible"
+
+    def __init__(self, base_url: str, api_key: str, default_model: str,
+                 temperature: float = 0.7, timeout: float = 60):
+        super().__init__(default_model)
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.temperature = temperature
+        self.timeout = timeout
+        # Reuse connections across requests
+        self.session = requests.Session()
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _payload(self, prompt: str, model: Optional[str], stream: bool):
+        return {
+            "model": model or self.default_model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+            "stream": stream
+        }
+
+    def complete(self, prompt: str, model: Optional[str] = None) -> str:
+        response = self.session.post(
+            f"{self.base_url}/chat/completions",
+            headers=self._headers(),
+            data=json.dumps(self._payload(prompt, model, stream=False)),
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    def stream(self, prompt: str, model: Optional[str] = None,
+               cancel: Optional[CancelToken] = None) -> Iterator[str]:
+        response = self.session.post(
+            f"{self.base_url}/chat/completions",
+            headers=self._headers(),
+            data=json.dumps(self._payload(prompt, model, stream=True)),
+            timeout=self.timeout,
+            stream=True
+        )
+        if cancel is not None:
+            # Closing drops the connection, which also cancels the request upstream
+            cancel.on_cancel(response.close)
+        try:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if cancel is not None and cancel.is_set():
+                    return
+                if not line or not line.startswith("data:"):
+                    # Blank keep-alives and ": OPENROUTER PROCESSING" comments
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                delta = json.loads(data)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+        finally:
+            response.close()
+
+
+class OpenRouterProvider(OpenAICompatibleProvider):
+    name = "openrouter"
+
+    def __init__(self):
+        if not settings.OPENROUTER_API_KEY:
+            raise ValueError("OPENROUTER_API_KEY is required when LLM_PROVIDER is openrouter")
+        super().__init__(
+            base_url=settings.OPENROUTER_URL,
+            api_key=settings.OPENROUTER_API_KEY,
+            default_model=settings.LLM_MODEL,
+            timeout=settings.LLM_TIMEOUT
+        )
+
+
+class MockProvider(OpenAICompatibleProvider):
+    name = "mock"
+
+    def __init__(self):
+        super().__init__(
+            base_url=settings.MOCK_LLM_URL,
+            api_key="",
+            default_model=settings.LLM_MODEL,
+            timeout=settings.LLM_TIMEOUT
+        )
+
+
+PROVIDERS = {
+    "openrouter": OpenRouterProvider,
+    "mock": MockProvider
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def check_configuration() -> bool:
+    """Log why the selected provider cannot be built; the first LLM call then fails with the same error"""
+    if settings.LLM_PROVIDER not in PROVIDERS:
+        logger.error("Unknown LLM provider %s; chat requests will fail", settings.LLM_PROVIDER)
+        return False
+    if settings.LLM_PROVIDER == "openrouter" and not settings.OPENROUTER_API_KEY:
+        logger.error("OPENROUTER_API_KEY is not set; chat requests will fail until it is")
+        return False
+    return True
+
+
+def get_provider() -> LLMProvider:
+    """Return the process-wide provider selected by settings.LLM_PROVIDER"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if settings.LLM_PROVIDER not in PROVIDERS:
+                    raise ValueError(f"Unknown LLM provider: {settings.LLM_PROVIDER}")
+                from src.llm.hedging import HedgedProvider
+                _provider = HedgedProvider(
+                    PROVIDERS[settings.LLM_PROVIDER](),
+                    fallback_model=settings.LLM_FALLBACK_MODEL,
+                    hedge_after_ms=settings.LLM_HEDGE_AFTER_MS
+                )
+    return _provider
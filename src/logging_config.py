@@ -0,0 +1,70 @@
+"""
+logging_config.py
+Application logging: records are handed to a queue and written by a background
+listener thread, so request threads never block on stdout or log shipping.
+Per-category sampling rates thin out high-volume info/debug records.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+from src.config import settings
+
+ROOT_LOGGER = "course_qa"
+
+_listener = None
+
+
+class SamplingFilter(logging.Filter):
+    """Drop a share of sub-warning records per category; warnings and errors always pass"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        category = record.name.split(".", 2)[1] if record.name.count(".") else record.name
+        rate = self.rates.get(category, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+def configure_logging():
+    """Attach the queue handler and start the listener (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s"
+    ))
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(settings.LOG_LEVEL)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(category: str) -> logging.Logger:
+    """Logger for a category such as 'chat', 'faq', 'drive' or 'professor'"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+
+def log_prompt(logger: logging.Logger, subject_name: str, prompt: str):
+    """Log a full prompt only at debug level or for a sampled share of requests"""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Generated prompt for %s: %s", subject_name, prompt)
+    elif random.random() < settings.PROMPT_LOG_SAMPLE_RATE:
+        logger.info("Sampled prompt for %s: %s", subject_name, prompt)
@@ -1,15 +1,22 @@
 """
 Database models and session management
 Core tables: Users, Subjects, SubjectFiles, SubjectEnrollment
+Drive tables: GoogleDriveCredentials, DriveFile (metadata mirror), DriveSyncState
+FAQ tables: FAQEntry (source of truth for faq.csv), FAQSyncState, FAQSubmission (student inbox),
+FAQFileRevision (last faq.csv revision seen in Drive), FAQCluster and FAQEmbedding
+(pending questions grouped by similarity)
+Job tables: KBJob (knowledge base builds run by the job workers), SubjectActivity
+(when students last queried a subject, to order bulk rebuilds)
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Table, Boolean, DateTime
+from sqlalchemy import create_engine, event, Column, Integer, String, Text, ForeignKey, Table, Boolean, DateTime, Index, UniqueConstraint, LargeBinary, text
 from sqlalchemy.orm import declarative_base, relationship, scoped_session, sessionmaker
 from passlib.hash import bcrypt
 from sqlalchemy.orm import validates
 from flask_login import UserMixin  # Added UserMixin
 from datetime import datetime
 from sqlalchemy.types import JSON
+from src.config import settings
 
 
 
@@ -106,6 +113,14 @@ class Subject(Base):
     # Relationships
     professor = relationship('User', back_populates='created_subjects')
     students = relationship('User', secondary=subject_enrollment, back_populates='enrolled_subjects')
+    faq_entries = relationship('FAQEntry', cascade='all, delete-orphan', passive_deletes=True)
+    faq_sync_state = relationship('FAQSyncState', cascade='all, delete-orphan', passive_deletes=True, uselist=False)
+    faq_submissions = relationship('FAQSubmission', cascade='all, delete-orphan', passive_deletes=True)
+    faq_file_revision = relationship('FAQFileRevision', cascade='all, delete-orphan', passive_deletes=True, uselist=False)
+    faq_clusters = relationship('FAQCluster', cascade='all, delete-orphan', passive_deletes=True)
+    faq_embeddings = relationship('FAQEmbedding', cascade='all, delete-orphan', passive_deletes=True)
+    kb_jobs = relationship('KBJob', cascade='all, delete-orphan', passive_deletes=True)
+    activity = relationship('SubjectActivity', cascade='all, delete-orphan', passive_deletes=True, uselist=False)
 
     @property
     def is_drive_enabled(self):
@@ -118,8 +133,7 @@ class Subject(Base):
         if not drive_service:
             return 0
         try:
-            files, _ = drive_service.list_folder_files(self.drive_folder_id)
-            return len(files)
+            return drive_service.count_folder_files(self.drive_folder_id)
         except:
             return 0
     
@@ -137,11 +151,152 @@ class GoogleDriveCredentials(Base):
     is_active = Column(Boolean, default=True)
     # Relationship
     professor = relationship('User', back_populates='google_drive')
+
+
+class DriveFile(Base):
+    """Local mirror of Drive file metadata, kept current through the Changes API"""
+    __tablename__ = 'drive_files'
+
+    id = Column(String(100), primary_key=True)  # Drive file ID
+    professor_id = Column(Integer, ForeignKey('users.id'), index=True, nullable=False)
+    name = Column(String(255))
+    parent_id = Column(String(100), index=True)
+    mime_type = Column(String(100))
+    size = Column(Integer, default=0)
+    md5_checksum = Column(String(32))
+    modified_time = Column(String(40))  # RFC 3339 as returned by Drive; sorts as text
+
+
+class DriveSyncState(Base):
+    """Changes API cursor per professor"""
+    __tablename__ = 'drive_sync_state'
+
+    professor_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    start_page_token = Column(String(100))
+    last_synced = Column(DateTime)
+
+
+class FAQEntry(Base):
+    """One FAQ question of a subject; exported to the subject's faq.csv in Drive"""
+    __tablename__ = 'faq_entries'
+    __table_args__ = (
+        UniqueConstraint('subject_id', 'number', name='uq_faq_entries_subject_number'),
+        Index('ix_faq_entries_subject_status_number', 'subject_id', 'status', 'number'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete='CASCADE'), nullable=False)
+    number = Column(Integer, nullable=False)
+    question = Column(Text, nullable=False)
+    answer = Column(Text)
+    status = Column(String(20), nullable=False, default='pending')  # 'pending' or 'answered'
+    date_asked = Column(String(19))  # '%Y-%m-%d %H:%M:%S', as in the CSV
+    date_answered = Column(String(19))
+
+
+class FAQSyncState(Base):
+    """Import and export bookkeeping between a subject's FAQ rows and its faq.csv"""
+    __tablename__ = 'faq_sync_state'
+
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete='CASCADE'), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)  # Bumped by every FAQ write
+    exported_version = Column(Integer, nullable=False, default=0)  # Last version written to Drive
+    imported_at = Column(DateTime)
+    exported_at = Column(DateTime)
+
+
+class FAQSubmission(Base):
+    """Student question waiting to be numbered into faq_entries by the FAQ flusher"""
+    __tablename__ = 'faq_submissions'
+
+    id = Column(Integer, primary_key=True)
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete='CASCADE'), index=True, nullable=False)
+    question = Column(Text, nullable=False)
+    date_asked = Column(String(19))
+
+
+class FAQFileRevision(Base):
+    """Drive revision of faq.csv last imported or exported, to detect edits made in Drive"""
+    __tablename__ = 'faq_file_revisions'
+
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete='CASCADE'), primary_key=True)
+    faq_file_id = Column(String(100))
+    version = Column(String(40))  # Drive returns the version as a decimal string
+    md5_checksum = Column(String(32))
+    head_revision_id = Column(String(100))
+    recorded_at = Column(DateTime)
+
+
+class FAQCluster(Base):
+    """Group of similar pending questions of a subject, answered together"""
+    __tablename__ = 'faq_clusters'
+
+    id = Column(Integer, primary_key=True)
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete='CASCADE'), index=True, nullable=False)
+    centroid = Column(LargeBinary, nullable=False)  # Unit-length float32 mean of member embeddings
+    size = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class FAQEmbedding(Base):
+    """Embedding of a pending question and the cluster it was assigned to"""
+    __tablename__ = 'faq_embeddings'
+
+    entry_id = Column(Integer, ForeignKey('faq_entries.id', ondelete='CASCADE'), primary_key=True)
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete='CASCADE'), index=True, nullable=False)
+    cluster_id = Column(Integer, ForeignKey('faq_clusters.id', ondelete='CASCADE'), index=True, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # Unit-length float32
+
+
+class KBJob(Base):
+    """Knowledge base build queued for the job workers (src/jobs.py)"""
+    __tablename__ = 'kb_jobs'
+    __table_args__ = (
+        Index('ix_kb_jobs_status_priority', 'status', 'priority', 'created_at'),
+        # At most one queued build per subject; later requests reuse it
+        Index('uq_kb_jobs_queued_subject', 'subject_id', unique=True, sqlite_where=text("status = 'queued'")),
+    )
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete='CASCADE'), index=True, nullable=False)
+    professor_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    priority = Column(Integer, nullable=False, default=0)  # Higher runs first
+    trigger = Column(String(20), nullable=False, default='manual')  # manual, bulk (rebuild_indexes.py), scheduled
+    full_rebuild = Column(Boolean, nullable=False, default=False)  # Re-embed every file, not only changed ones
+    stage = Column(String(20))
+    progress = Column(JSON)  # {stage: {"done": n, "total": n}}
+    result = Column(JSON)
+    error = Column(Text)
+    worker = Column(String(64))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # Refreshed while running; stale running jobs are failed
+    finished_at = Column(DateTime)
+
+
+class SubjectActivity(Base):
+    """Chat usage of a subject, recorded in batches by src/subject_activity.py"""
+    __tablename__ = 'subject_activity'
+
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete='CASCADE'), primary_key=True)
+    last_queried_at = Column(DateTime, index=True)
+    query_count = Column(Integer, nullable=False, default=0)
     
     
     
 # Database configuration
-engine = create_engine('sqlite:///university.db')
+engine = create_engine(settings.DATABASE_URL)
+
+
+@event.listens_for(engine, "connect")
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    """SQLite ignores foreign keys, and so ON DELETE CASCADE, unless enabled per connection"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base.metadata.create_all(bind=engine)
 
@@ -7,8 +7,15 @@ from functools import wraps
 from sqlalchemy.orm import joinedload
 from datetime import datetime
 from src.google_drive.auth import GoogleDriveAuth
-from src.google_drive.drive_service import GoogleDriveService
+from src.google_drive.drive_service import GoogleDriveService, PageOutOfRange
+from src.google_drive.service_cache import get_drive_service, drive_service_cache
+from src.google_drive import mirror as drive_mirror
 from src.decorators import professor_required
+from src.logging_config import get_logger
+from src.config import settings
+from concurrent.futures import ThreadPoolExecutor
+
+logger = get_logger("professor")
 
 professor_bp = Blueprint('professor', __name__, url_prefix='/professor')
 def professor_required(f):
@@ -77,6 +84,25 @@ def create_subject():
     finally:
         db.close()
 
+def _subject_file_counts(db, subjects, drive_creds, drive_service):
+    """
+    File counts for all of a professor's subject folders at once
+
+    Uses a grouped query over the Drive mirror once it has been synced,
+    otherwise one batched Drive listing across all folders.
+    """
+    folder_ids = [subject.drive_folder_id for subject in subjects if subject.drive_folder_id]
+    if not folder_ids or not drive_service:
+        return {}
+    try:
+        if drive_mirror.is_synced(db, drive_creds.professor_id):
+            drive_mirror.ensure_fresh(db, drive_creds.professor_id, drive_service, drive_creds.drive_folder_id)
+            return drive_mirror.count_by_folder(db, folder_ids)
+        return drive_service.count_files_in_folders(folder_ids)
+    except Exception as e:
+        logger.error("Error counting subject files: %s", e)
+        return {}
+
 @professor_bp.route('/subjects', methods=['GET'])
 @login_required
 @professor_required
@@ -94,15 +120,15 @@ def get_professor_subjects():
         ).first()
         
         if drive_creds:
-            google_auth = GoogleDriveAuth()
-            credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-            drive_service = GoogleDriveService(credentials)
+            drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
+
+        file_counts = _subject_file_counts(db, subjects, drive_creds, drive_service)
 
         return jsonify({
             "subjects": [{
                 "id": subject.id,
                 "name": subject.name,
-                "file_count": subject.get_file_count(drive_service),
+                "file_count": file_counts.get(subject.drive_folder_id, 0),
                 "drive_folder_id": subject.drive_folder_id,
                 "drive_enabled": subject.is_drive_enabled
             } for subject in subjects]
@@ -117,14 +143,14 @@ def get_professor_subjects():
 
 """professor.py"""
 # Add these imports
-from src.vector_store import VectorStore
-from src.document_loader import SubjectDocumentLoader
+from src import vector_store as kb_index
+from src import jobs
 
 @professor_bp.route('/subjects/<int:subject_id>/knowledge-base', methods=['POST'])
 @login_required
 @professor_required
 def create_subject_knowledge_base(subject_id):
-    """Sync files and create/update knowledge base for a subject"""
+    """Queue a sync and knowledge base build for a subject; poll the returned job for progress"""
     db = next(get_db())
     try:
         # Verify subject belongs to professor
@@ -145,57 +171,63 @@ def create_subject_knowledge_base(subject_id):
         if not drive_creds:
             return jsonify({"error": "Drive not connected"}), 403
 
-        # Initialize Drive service and sync files
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
-        
-        # Sync files first
-        drive_service.sync_folder(subject.drive_folder_id)
-        
-        # Update last synced time
-        drive_creds.last_synced = datetime.utcnow()
-        db.commit()
+        job, created = jobs.enqueue(db, subject_id, current_user.id)
+        jobs.job_workers.start()
 
-        # Load documents
-        document_loader = SubjectDocumentLoader()
-        documents = document_loader.load_subject_documents(
-            subject_id=subject_id,
-            professor_id=current_user.id
-        )
-        
-        if not documents:
-            return jsonify({"error": "No documents could be loaded"}), 400
-
-        # Create vector store
-        vector_store = VectorStore()
-        vector_store.create_from_documents(
-            documents,
-            professor_id=current_user.id,
-            subject_id=subject_id
-        )
-
-        return jsonify({
-            "message": "Files synced and knowledge base updated successfully",
-            "document_count": len(documents)
+        response = jobs.job_to_dict(job)
+        response.update({
+            "message": "Knowledge base update queued" if created else "Knowledge base update already queued",
+            "deduplicated": not created,
+            "status_url": url_for('professor.get_knowledge_base_job', subject_id=subject_id, job_id=job.id)
         })
+        return jsonify(response), 202
 
     except Exception as e:
-        print(f"Error updating knowledge base: {str(e)}")
+        db.rollback()
+        logger.error("Error queuing knowledge base update: %s", e)
         return jsonify({"error": f"Failed to update: {str(e)}"}), 500
     finally:
         db.close()
+
+
+@professor_bp.route('/subjects/<int:subject_id>/knowledge-base/jobs/<job_id>', methods=['GET'])
+@login_required
+@professor_required
+def get_knowledge_base_job(subject_id, job_id):
+    """Status and per-stage progress of a knowledge base build"""
+    db = next(get_db())
+    try:
+        job = jobs.get_job(db, job_id)
+        if not job or job.subject_id != subject_id or job.professor_id != current_user.id:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(jobs.job_to_dict(job))
+    finally:
+        db.close()
+
+
+@professor_bp.route('/subjects/<int:subject_id>/knowledge-base/jobs/latest', methods=['GET'])
+@login_required
+@professor_required
+def get_latest_knowledge_base_job(subject_id):
+    """Most recent knowledge base build of a subject, e.g. to resume polling after a reload"""
+    db = next(get_db())
+    try:
+        subject = db.query(Subject).filter_by(id=subject_id, professor_id=current_user.id).first()
+        if not subject:
+            return jsonify({"error": "Subject not found"}), 404
+        job = jobs.latest_job(db, subject_id)
+        if not job:
+            return jsonify({"error": "No knowledge base builds yet"}), 404
+        return jsonify(jobs.job_to_dict(job))
+    finally:
+        db.close()
 @professor_bp.route('/subjects/<int:subject_id>/knowledge-base', methods=['GET'])
 @login_required
 @professor_required
 def check_knowledge_base_status(subject_id):
     """Check if knowledge base exists for a subject"""
     try:
-        vector_store = VectorStore()
-        exists = vector_store.load_subject_vector_store(
-            professor_id=current_user.id,
-            subject_id=subject_id
-        ) is not None
+        exists = kb_index.has_index(current_user.id, subject_id)
 
         return jsonify({
             "exists": exists,
@@ -221,22 +253,13 @@ def get_subject_status(subject_id):
         if not subject:
             return jsonify({"error": "Subject not found"}), 404
 
-        # Check knowledge base status
-        vector_store = VectorStore()
-        kb_exists = vector_store.load_subject_vector_store(
-            professor_id=current_user.id,
-            subject_id=subject_id
-        ) is not None
-
-        # Get KB path to check last modified time
-        kb_path = vector_store._get_vector_store_path(
-            professor_id=current_user.id,
-            subject_id=subject_id
-        )
+        # Check knowledge base status and when its current version was published
+        kb_exists = kb_index.has_index(current_user.id, subject_id)
+        published = kb_index.published_at(current_user.id, subject_id)
         
         last_updated = None
-        if os.path.exists(kb_path):
-            last_updated = datetime.fromtimestamp(os.path.getmtime(kb_path)).strftime('%Y-%m-%d %H:%M:%S')
+        if published is not None:
+            last_updated = datetime.fromtimestamp(published).strftime('%Y-%m-%d %H:%M:%S')
 
         return jsonify({
             "id": subject.id,
@@ -345,6 +368,8 @@ def oauth2callback():
                 db.add(google_creds)
             
             db.commit()
+            # Drop clients built from the previous connection
+            drive_service_cache.invalidate(current_user.id)
             
             # Return success HTML that closes the popup and refreshes the parent
             return """
@@ -356,13 +381,13 @@ def oauth2callback():
             
         except Exception as e:
             db.rollback()
-            print(f"Database error in oauth2callback: {str(e)}")
+            logger.error("Database error in oauth2callback: %s", e)
             return jsonify({'error': str(e)}), 500
         finally:
             db.close()
 
     except Exception as e:
-        print(f"Error in oauth2callback: {str(e)}")
+        logger.error("Error in oauth2callback: %s", e)
         return jsonify({'error': str(e)}), 500
     
     
@@ -418,9 +443,7 @@ def create_drive_subject():
         db.flush()  # Get subject ID without committing
         
         # Create Drive folder
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
+        drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
         
         folder_id = drive_service.create_subject_folder(
             drive_creds.drive_folder_id,
@@ -438,7 +461,7 @@ def create_drive_subject():
             faq_file_id = drive_service.create_faq_file(folder_id)
             new_subject.faq_file_id = faq_file_id  # Add this field to your Subject model
         except Exception as e:
-            print(f"Error creating FAQ file: {e}")
+            logger.error("Error creating FAQ file: %s", e)
             # Continue even if FAQ file creation fails
             
         # Update subject with folder info
@@ -481,11 +504,10 @@ def get_drive_subjects():
         drive_service = None
         
         if drive_creds:
-            google_auth = GoogleDriveAuth()
-            credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-            drive_service = GoogleDriveService(credentials)
+            drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
 
         subjects = db.query(Subject).filter_by(professor_id=current_user.id).all()
+        file_counts = _subject_file_counts(db, subjects, drive_creds, drive_service)
         
         return jsonify({
             "drive_connected": drive_connected,
@@ -493,7 +515,7 @@ def get_drive_subjects():
                 "id": subject.id,
                 "name": subject.name,
                 "drive_folder_id": subject.drive_folder_id,
-                "file_count": subject.get_file_count(drive_service),
+                "file_count": file_counts.get(subject.drive_folder_id, 0),
                 "drive_enabled": subject.is_drive_enabled
             } for subject in subjects]
         })
@@ -524,28 +546,20 @@ def delete_drive_subject(subject_id):
             
             if drive_creds:
                 # Delete Drive folder
-                google_auth = GoogleDriveAuth()
-                credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-                drive_service = GoogleDriveService(credentials)
+                drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
                 
                 try:
                     drive_service.delete_folder(subject.drive_folder_id)
+                    drive_mirror.forget_folder(db, subject.drive_folder_id)
                 except Exception as e:
-                    print(f"Error deleting Drive folder: {str(e)}")
+                    logger.error("Error deleting Drive folder: %s", e)
                     # Continue with deletion even if Drive folder deletion fails
             
             # Delete vector store if it exists
-            vector_store = VectorStore()
-            vector_store_path = vector_store._get_vector_store_path(
-                professor_id=current_user.id,
-                subject_id=subject_id
-            )
-            if os.path.exists(vector_store_path):
-                try:
-                    import shutil
-                    shutil.rmtree(vector_store_path)
-                except Exception as e:
-                    print(f"Error deleting vector store: {str(e)}")
+            try:
+                kb_index.delete_subject_index(current_user.id, subject_id)
+            except Exception as e:
+                logger.error("Error deleting vector store: %s", e)
     
         # Delete subject from database
         db.delete(subject)
@@ -555,7 +569,7 @@ def delete_drive_subject(subject_id):
         
     except Exception as e:
         db.rollback()
-        print(f"Error in delete_drive_subject: {str(e)}")
+        logger.error("Error in delete_drive_subject: %s", e)
         return jsonify({"error": "Failed to delete subject"}), 500
     finally:
         db.close()
@@ -578,6 +592,43 @@ MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _upload_size(file):
+    """Size of an uploaded file from its spooled stream, without reading it"""
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+def _upload_error(file):
+    """Validation error message for an uploaded file, or None if it is acceptable"""
+    if not file or not file.filename:
+        return "No file selected"
+    if not allowed_file(file.filename):
+        return "File type not allowed"
+    if _upload_size(file) > MAX_FILE_SIZE:
+        return "File size exceeds limit"
+    return None
+
+def _file_metadata(file, folder_id):
+    filename = secure_filename(file.filename)
+    return {
+        'name': filename,
+        'parents': [folder_id],
+        'mimeType': mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    }
+
+# Shared pool so concurrent multi-file uploads stay within UPLOAD_CONCURRENCY
+_upload_executor = ThreadPoolExecutor(
+    max_workers=settings.UPLOAD_CONCURRENCY,
+    thread_name_prefix="drive-upload"
+)
+
+def _upload_in_worker(professor_id, token_info, file, metadata):
+    # The professor's cached service is shared; each upload call checks a transport out of its pool
+    drive_service = get_drive_service(professor_id, token_info)
+    return drive_service.upload_file(file, metadata)
+
 # File Upload Routes
 @professor_bp.route('/drive/subjects/<int:subject_id>/upload', methods=['POST'])
 @login_required
@@ -588,14 +639,9 @@ def upload_to_drive(subject_id):
         return jsonify({"error": "No file provided"}), 400
         
     file = request.files['file']
-    if not file or not file.filename:
-        return jsonify({"error": "No file selected"}), 400
-        
-    if not allowed_file(file.filename):
-        return jsonify({"error": "File type not allowed"}), 400
-        
-    if file.content_length and file.content_length > MAX_FILE_SIZE:
-        return jsonify({"error": "File size exceeds limit"}), 400
+    error = _upload_error(file)
+    if error:
+        return jsonify({"error": error}), 400
 
     db = next(get_db())
     try:
@@ -618,21 +664,11 @@ def upload_to_drive(subject_id):
             return jsonify({"error": "Drive not connected"}), 403
             
         # Initialize Drive service
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
+        drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
         
         # Upload file
-        filename = secure_filename(file.filename)
-        mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
-        
-        file_metadata = {
-            'name': filename,
-            'parents': [subject.drive_folder_id],
-            'mimeType': mime_type
-        }
-        
-        uploaded_file = drive_service.upload_file(file, file_metadata)
+        uploaded_file = drive_service.upload_file(file, _file_metadata(file, subject.drive_folder_id))
+        drive_mirror.record_file(db, current_user.id, uploaded_file)
         
         return jsonify({
             "message": "File uploaded successfully",
@@ -644,17 +680,91 @@ def upload_to_drive(subject_id):
         })
         
     except Exception as e:
-        print(f"Upload error: {str(e)}")
+        logger.error("Upload error: %s", e)
         return jsonify({"error": "Failed to upload file"}), 500
     finally:
         db.close()
 
+@professor_bp.route('/drive/subjects/<int:subject_id>/upload/batch', methods=['POST'])
+@login_required
+@professor_required
+def upload_many_to_drive(subject_id):
+    """Upload several files to a subject folder, UPLOAD_CONCURRENCY at a time"""
+    files = request.files.getlist('files')
+    if not files:
+        return jsonify({"error": "No files provided"}), 400
+
+    db = next(get_db())
+    try:
+        subject = db.query(Subject).filter_by(
+            id=subject_id,
+            professor_id=current_user.id
+        ).first()
+        
+        if not subject or not subject.drive_folder_id:
+            return jsonify({"error": "Subject not found or not Drive-enabled"}), 404
+            
+        drive_creds = db.query(GoogleDriveCredentials).filter_by(
+            professor_id=current_user.id,
+            is_active=True
+        ).first()
+        
+        if not drive_creds:
+            return jsonify({"error": "Drive not connected"}), 403
+
+        results = []
+        pending = []
+        for file in files:
+            error = _upload_error(file)
+            if error:
+                results.append({"name": file.filename, "success": False, "error": error})
+                continue
+            pending.append((file, _upload_executor.submit(
+                _upload_in_worker,
+                drive_creds.professor_id,
+                drive_creds.token_info,
+                file,
+                _file_metadata(file, subject.drive_folder_id)
+            )))
+
+        for file, future in pending:
+            try:
+                uploaded_file = future.result()
+                drive_mirror.record_file(db, current_user.id, uploaded_file)
+                results.append({
+                    "name": file.filename,
+                    "success": True,
+                    "file": {
+                        "id": uploaded_file.get('id'),
+                        "name": uploaded_file.get('name'),
+                        "mimeType": uploaded_file.get('mimeType')
+                    }
+                })
+            except Exception as e:
+                logger.error("Upload error for %s: %s", file.filename, e)
+                results.append({"name": file.filename, "success": False, "error": "Failed to upload file"})
+
+        uploaded = sum(1 for result in results if result["success"])
+        return jsonify({
+            "message": f"Uploaded {uploaded} of {len(files)} files",
+            "uploaded": uploaded,
+            "failed": len(files) - uploaded,
+            "files": results
+        })
+        
+    except Exception as e:
+        logger.error("Batch upload error: %s", e)
+        return jsonify({"error": "Failed to upload files"}), 500
+    finally:
+        db.close()
+
 @professor_bp.route('/drive/subjects/<int:subject_id>/files', methods=['GET'])
 @login_required
 @professor_required
 def get_drive_files(subject_id):
     """Get files from Drive subject folder"""
     page = int(request.args.get('page', 1))
+    page_token = request.args.get('page_token')
     search = request.args.get('search', '')
     items_per_page = 10
     
@@ -679,29 +789,60 @@ def get_drive_files(subject_id):
             return jsonify({"error": "Drive not connected"}), 403
             
         # Initialize Drive service
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
+        drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
         
-        # Get files with pagination
-        files, total_files = drive_service.list_folder_files(
-            subject.drive_folder_id,
-            search_term=search,
-            page=page,
-            page_size=items_per_page
-        )
+        # Serve the listing from the metadata mirror when it can be brought up to date
+        if not page_token:
+            try:
+                drive_mirror.ensure_fresh(db, current_user.id, drive_service, drive_creds.drive_folder_id)
+                files, total_files = drive_mirror.list_folder(
+                    db, subject.drive_folder_id, search, page, items_per_page
+                )
+                return jsonify({
+                    "files": files,
+                    "currentPage": page,
+                    "totalPages": (total_files + items_per_page - 1) // items_per_page,
+                    "totalFiles": total_files,
+                    "nextPageToken": None
+                })
+            except Exception as e:
+                db.rollback()
+                logger.error("Drive mirror unavailable, listing live: %s", e)
         
+        # Get one page by cursor; page numbers map to cached cursors
+        files, next_page_token = [], None
+        try:
+            if not page_token:
+                page_token = drive_service.get_page_token(
+                    subject.drive_folder_id, search, page, items_per_page
+                )
+        except PageOutOfRange:
+            # Past the last page: an empty page, as from the mirror
+            pass
+        else:
+            files, next_page_token = drive_service.list_folder_files(
+                subject.drive_folder_id,
+                search_term=search,
+                page_size=items_per_page,
+                page_token=page_token
+            )
+            drive_service.remember_page_token(
+                subject.drive_folder_id, search, page + 1, items_per_page, next_page_token
+            )
+        
+        total_files = drive_service.count_folder_files(subject.drive_folder_id, search)
         total_pages = (total_files + items_per_page - 1) // items_per_page
         
         return jsonify({
             "files": files,
             "currentPage": page,
             "totalPages": total_pages,
-            "totalFiles": total_files
+            "totalFiles": total_files,
+            "nextPageToken": next_page_token
         })
         
     except Exception as e:
-        print(f"Error listing files: {str(e)}")
+        logger.error("Error listing files: %s", e)
         return jsonify({"error": "Failed to list files"}), 500
     finally:
         db.close()
@@ -723,9 +864,19 @@ def get_file_preview(file_id):
             return jsonify({"error": "Drive not connected"}), 403
             
         # Initialize Drive service
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
+        drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
+        
+        # Mirrored metadata avoids two Drive calls for files this professor owns
+        mirrored = drive_mirror.get_file(db, file_id)
+        if mirrored and mirrored.professor_id == current_user.id:
+            return jsonify({
+                "id": mirrored.id,
+                "name": mirrored.name,
+                "mimeType": mirrored.mime_type,
+                "size": mirrored.size,
+                "modifiedTime": mirrored.modified_time,
+                "previewUrl": f"https://drive.google.com/file/d/{mirrored.id}/view?usp=drivesdk"
+            })
         
         # Get file metadata and preview URL
         file_info = drive_service.get_file_info(file_id)
@@ -740,7 +891,7 @@ def get_file_preview(file_id):
         })
         
     except Exception as e:
-        print(f"Error getting preview: {str(e)}")
+        logger.error("Error getting preview: %s", e)
         return jsonify({"error": "Failed to get file preview"}), 500
     finally:
         db.close()
@@ -762,9 +913,7 @@ def delete_drive_file(file_id):
             return jsonify({"error": "Drive not connected"}), 403
             
         # Initialize Drive service
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
+        drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
         
         # Get file info first
         file_info = drive_service.get_file_info(file_id)
@@ -774,12 +923,14 @@ def delete_drive_file(file_id):
             }), 403
         
         # Delete file
-        drive_service.delete_file(file_id)
+        parents = file_info.get('parents') or [None]
+        drive_service.delete_file(file_id, folder_id=parents[0])
+        drive_mirror.forget_file(db, file_id)
         
         return jsonify({"message": "File deleted successfully"})
         
     except Exception as e:
-        print(f"Error deleting file: {str(e)}")
+        logger.error("Error deleting file: %s", e)
         return jsonify({"error": "Failed to delete file"}), 500
     finally:
         db.close()
@@ -811,12 +962,10 @@ def sync_drive_files(subject_id):
             return jsonify({"error": "Drive not connected"}), 403
             
         # Initialize Drive service
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
+        drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
         
-        # Sync files
-        drive_service.sync_folder(subject.drive_folder_id)
+        # Apply the Changes API delta to the metadata mirror
+        drive_mirror.sync(db, current_user.id, drive_service, drive_creds.drive_folder_id)
         
         # Update last synced time
         drive_creds.last_synced = datetime.utcnow()
@@ -825,7 +974,7 @@ def sync_drive_files(subject_id):
         return jsonify({"message": "Files synced successfully"})
         
     except Exception as e:
-        print(f"Error syncing files: {str(e)}")
+        logger.error("Error syncing files: %s", e)
         return jsonify({"error": "Failed to sync files"}), 500
     finally:
         db.close()
@@ -860,9 +1009,7 @@ def update_drive_subject(subject_id):
             return jsonify({"error": "Drive not connected"}), 403
 
         # Initialize Drive service
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
+        drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
 
         # Update Drive folder name if name is being changed
         if 'name' in data and data['name'] != subject.name:
@@ -919,12 +1066,11 @@ def rename_drive_file(file_id):
             return jsonify({"error": "Drive not connected"}), 403
             
         # Initialize Drive service
-        google_auth = GoogleDriveAuth()
-        credentials = google_auth.get_credentials_from_token(drive_creds.token_info)
-        drive_service = GoogleDriveService(credentials)
+        drive_service = get_drive_service(drive_creds.professor_id, drive_creds.token_info)
         
         # Rename file
         updated_file = drive_service.rename_file(file_id, new_name)
+        drive_mirror.record_file(db, current_user.id, updated_file)
         
         return jsonify({
             "message": "File renamed successfully",
@@ -937,7 +1083,7 @@ def rename_drive_file(file_id):
         })
         
     except Exception as e:
-        print(f"Error renaming file: {str(e)}")
+        logger.error("Error renaming file: %s", e)
         return jsonify({"error": "Failed to rename file"}), 500
     finally:
         db.close()
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+subject_activity.py
+Records when students query a subject, for ordering bulk index rebuilds
+(rebuild_indexes.py) by recent use. Queries are counted in memory and written
+to subject_activity by a background thread every ACTIVITY_FLUSH_INTERVAL, so
+chat requests never wait on a database write.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+from src.config import settings
+from src.models import Subject, SubjectActivity, SessionLocal
+from src.logging_config import get_logger
+
+logger = get_logger("kb")
+
+
+class ActivityRecorder:
+    """Per-subject query counts and last query time, flushed in batches"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[int, Tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, subject_id: int):
+        with self._lock:
+            count, _ = self._pending.get(subject_id, (0, None))
+            self._pending[subject_id] = (count + 1, datetime.utcnow())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="subject-activity", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Error recording subject activity: %s", e)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        db = SessionLocal()
+        try:
+            rows = {row.subject_id: row for row in
+                    db.query(SubjectActivity).filter(SubjectActivity.subject_id.in_(pending))}
+            # Subjects deleted since they were queried would fail the foreign key
+            existing = {subject_id for (subject_id,) in db.query(Subject.id).filter(Subject.id.in_(pending))}
+            for subject_id, (count, last_queried_at) in pending.items():
+                if subject_id not in existing:
+                    continue
+                row = rows.get(subject_id)
+                if row is None:
+                    row = SubjectActivity(subject_id=subject_id, query_count=0)
+                    db.add(row)
+                row.query_count += count
+                row.last_queried_at = last_queried_at
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+activity_recorder = ActivityRecorder(settings.ACTIVITY_FLUSH_INTERVAL)
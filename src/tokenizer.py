@@ -0,0 +1,45 @@
+"""
+tokenizer.py
+Token counting for prompt budgeting.
+Loads the tokenizer named by settings.TOKENIZER_MODEL once per process and
+falls back to a whitespace approximation when it cannot be loaded.
+"""
+
+import threading
+from src.config import settings
+from src.logging_config import get_logger
+
+logger = get_logger("chat")
+
+_tokenizer = None
+_tokenizer_loaded = False
+_lock = threading.Lock()
+
+
+def _get_tokenizer():
+    """Load the configured tokenizer on first use"""
+    global _tokenizer, _tokenizer_loaded
+    if _tokenizer_loaded:
+        return _tokenizer
+
+    with _lock:
+        if not _tokenizer_loaded:
+            try:
+                from tokenizers import Tokenizer
+                _tokenizer = Tokenizer.from_pretrained(settings.TOKENIZER_MODEL)
+            except Exception as e:
+                logger.warning("Could not load tokenizer %s, falling back to whitespace counting: %s",
+                               settings.TOKENIZER_MODEL, e)
+                _tokenizer = None
+            _tokenizer_loaded = True
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text using the configured tokenizer"""
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return len(text.split())
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
@@ -1,42 +1,347 @@
 """ vector_store.py
 Manages vector store creation and similarity search using FAISS.
 Handles embedding model initialization and storage persistence.
+LangChain, FAISS and the HuggingFace model (torch) are imported on first use,
+and the embedding model is loaded once per process.
+
+Each build is saved to its own directory under versions/ and published by
+atomically replacing the subject's CURRENT file, under a per-subject file
+lock. Readers follow CURRENT, so they never see a half-written index, and
+loaded indexes are cached per process and swapped when CURRENT moves on.
+
+    data/vector_bases/professor_<id>/subject_<id>/
+        CURRENT             name of the published version
+        versions/<version>/ index.faiss, index.pkl, manifest.json
+
+The manifest records the settings the index was built with and the Drive
+files it was built from, so rebuilds can skip subjects that are up to date.
 """
 
-"""vector_store.py"""
+import json
 import os
-from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+from filelock import FileLock
 from src.config import settings
+from src.logging_config import get_logger
+
+logger = get_logger("kb")
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings():
+    """Process-wide embedding model, loaded on first use"""
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                from langchain.embeddings import HuggingFaceEmbeddings
+                _embeddings = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
+    return _embeddings
+
+
+def _version_key(version: str) -> int:
+    """Versions are named v<build start ns>-<suffix>; later builds sort higher"""
+    try:
+        return int(version[1:].split("-", 1)[0])
+    except ValueError:
+        return -1
+
+
+class IndexCache:
+    """
+    Loaded indexes by subject, least recently used dropped past KB_INDEX_CACHE_SIZE
+
+    While a new version loads, other readers keep getting the previous one.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[str, object]]" = OrderedDict()
+        self._loading = set()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[int, int], version: str, load):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry[0] == version or key in self._loading:
+                    return entry[1]
+            self._loading.add(key)
+
+        try:
+            store = load()
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or _version_key(version) >= _version_key(entry[0]):
+                self._entries[key] = (version, store)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return store
+
+    def evict(self, key: Tuple[int, int]):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+index_cache = IndexCache(settings.KB_INDEX_CACHE_SIZE)
+
+
+def subject_path(professor_id, subject_id) -> str:
+    return os.path.join("data", "vector_bases", f"professor_{professor_id}", f"subject_{subject_id}")
+
+
+def subject_lock(professor_id, subject_id) -> FileLock:
+    """Inter-process lock serializing publishes (and deletion) of one subject's index"""
+    path = subject_path(professor_id, subject_id)
+    os.makedirs(path, exist_ok=True)
+    return FileLock(os.path.join(path, ".lock"))
+
+
+def published_version(professor_id, subject_id) -> Optional[str]:
+    """Name of the subject's published index version, or None if it has none"""
+    try:
+        with open(os.path.join(subject_path(professor_id, subject_id), "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def published_at(professor_id, subject_id) -> Optional[float]:
+    """Timestamp the current version (or the pre-versioning index) was saved"""
+    base = subject_path(professor_id, subject_id)
+    for name in ("CURRENT", "index.faiss"):
+        try:
+            return os.path.getmtime(os.path.join(base, name))
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def index_fingerprint() -> dict:
+    """Settings that change the contents of an index; a mismatch means it must be rebuilt"""
+    return {
+        "embedding_model": settings.EMBEDDING_MODEL,
+        "chunk_size": settings.CHUNK_SIZE,
+        "chunk_overlap": settings.CHUNK_OVERLAP
+    }
+
+
+def read_manifest(professor_id, subject_id) -> Optional[dict]:
+    """Manifest of the published version, or None (no index, or built before manifests)"""
+    version = published_version(professor_id, subject_id)
+    if version is None:
+        return None
+    try:
+        with open(os.path.join(version_path(professor_id, subject_id, version), "manifest.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def has_index(professor_id, subject_id) -> bool:
+    """Whether the subject has a published (or pre-versioning) index, without loading it"""
+    return published_version(professor_id, subject_id) is not None or \
+        os.path.exists(os.path.join(subject_path(professor_id, subject_id), "index.faiss"))
+
+
+def version_path(professor_id, subject_id, version: str) -> str:
+    return os.path.join(subject_path(professor_id, subject_id), "versions", version)
+
+
+def publish(professor_id, subject_id, staging_path: str, version: str) -> bool:
+    """
+    Move a saved build into versions/ and point CURRENT at it
+
+    A build that finishes after a newer one was published is discarded, and
+    versions older than the last KB_KEEP_VERSIONS are removed.
+
+    Returns:
+        bool: Whether the build became the current version
+    """
+    base = subject_path(professor_id, subject_id)
+    with subject_lock(professor_id, subject_id):
+        current = published_version(professor_id, subject_id)
+        if current and _version_key(current) > _version_key(version):
+            shutil.rmtree(staging_path, ignore_errors=True)
+            logger.info("Discarded index %s of subject %s; %s is newer", version, subject_id, current)
+            return False
+
+        os.makedirs(os.path.join(base, "versions"), exist_ok=True)
+        os.replace(staging_path, version_path(professor_id, subject_id, version))
+        pointer = os.path.join(base, f"CURRENT.{uuid.uuid4().hex}.tmp")
+        with open(pointer, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer, os.path.join(base, "CURRENT"))
+        _prune_versions(professor_id, subject_id)
+    return True
+
+
+def _prune_versions(professor_id, subject_id):
+    """Remove old versions and pre-versioning files; called under the subject lock"""
+    base = subject_path(professor_id, subject_id)
+    versions = sorted(os.listdir(os.path.join(base, "versions")), key=_version_key, reverse=True)
+    for version in versions[max(1, settings.KB_KEEP_VERSIONS):]:
+        shutil.rmtree(os.path.join(base, "versions", version), ignore_errors=True)
+    for legacy in ("index.faiss", "index.pkl"):
+        if os.path.exists(os.path.join(base, legacy)):
+            os.remove(os.path.join(base, legacy))
+
+
+def delete_subject_index(professor_id, subject_id):
+    """Remove every version of a subject's index and drop it from the cache"""
+    path = subject_path(professor_id, subject_id)
+    if os.path.exists(path):
+        with subject_lock(professor_id, subject_id):
+            for name in os.listdir(path):
+                if name == ".lock":
+                    continue
+                full = os.path.join(path, name)
+                if os.path.isdir(full):
+                    shutil.rmtree(full)
+                else:
+                    os.remove(full)
+        shutil.rmtree(path, ignore_errors=True)
+    index_cache.evict((professor_id, subject_id))
+
 
 class VectorStore:
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=settings.EMBEDDING_MODEL
-        )
         self.vector_store = None
 
-    def _get_vector_store_path(self, professor_id, subject_id):
-        """Generate path for vector store based on professor and subject"""
-        base_path = os.path.join("data", "vector_bases", f"professor_{professor_id}", f"subject_{subject_id}")
-        os.makedirs(base_path, exist_ok=True)
-        return base_path
-
-    def create_from_documents(self, documents, professor_id, subject_id):
-        """Create vector store for specific subject and save to disk"""
-        save_path = self._get_vector_store_path(professor_id, subject_id)
-        self.vector_store = FAISS.from_documents(
-            documents, self.embeddings
+    @property
+    def embeddings(self):
+        return get_embeddings()
+
+    def _embed_documents(self, documents, progress=None):
+        """Texts and embeddings of documents, in batches of EMBED_BATCH_SIZE reported as progress("embed", ...)"""
+        texts = [doc.page_content for doc in documents]
+        vectors = []
+        batch_size = max(1, settings.EMBED_BATCH_SIZE)
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(self.embeddings.embed_documents(texts[start:start + batch_size]))
+            if progress:
+                progress("embed", len(vectors), len(texts))
+        return texts, vectors
+
+    def _save_and_publish(self, store, professor_id, subject_id, version, files):
+        """Write to a private staging directory with its manifest, then publish it in one rename"""
+        staging_path = os.path.join(subject_path(professor_id, subject_id), "staging", version)
+        os.makedirs(staging_path, exist_ok=True)
+        try:
+            store.save_local(staging_path)
+            with open(os.path.join(staging_path, "manifest.json"), "w") as f:
+                json.dump({
+                    "version": version,
+                    "built_at": time.time(),
+                    "fingerprint": index_fingerprint(),
+                    "chunk_count": len(store.index_to_docstore_id),
+                    "files": files or {}
+                }, f)
+            publish(professor_id, subject_id, staging_path, version)
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+    def create_from_documents(self, documents, professor_id, subject_id, progress=None, files=None):
+        """
+        Create vector store for specific subject, save it as a new version and publish it
+
+        Chunks are embedded in batches of EMBED_BATCH_SIZE so that
+        progress("embed", done, total) can report chunks embedded.
+        files (Drive file id -> name, md5Checksum, modifiedTime, failed) goes into the manifest.
+        """
+        from langchain.vectorstores import FAISS
+
+        version = f"v{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        texts, vectors = self._embed_documents(documents, progress)
+        self.vector_store = FAISS.from_embeddings(
+            list(zip(texts, vectors)), self.embeddings,
+            metadatas=[doc.metadata for doc in documents]
         )
-        self.vector_store.save_local(save_path)
+        self._save_and_publish(self.vector_store, professor_id, subject_id, version, files)
         return self.vector_store
 
-    def load_subject_vector_store(self, professor_id, subject_id):
-        """Load vector store for specific subject"""
-        path = self._get_vector_store_path(professor_id, subject_id)
-        if not os.path.exists(path):
+    def update_from_documents(self, documents, professor_id, subject_id, keep_file_ids,
+                              progress=None, files=None):
+        """
+        Update a subject's published index in place of a full rebuild
+
+        Chunks of Drive files not in keep_file_ids (changed or removed files)
+        are dropped and the new documents are embedded and added; the result
+        is published as a new version. Readers keep the cached old version
+        until then, since the update works on a fresh copy.
+
+        Returns:
+            The updated store, or None if the subject has no versioned index to update
+        """
+        current = published_version(professor_id, subject_id)
+        if current is None:
             return None
-        self.vector_store = FAISS.load_local(
-            path, self.embeddings, allow_dangerous_deserialization=True
+
+        version = f"v{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        store = self._load_version(professor_id, subject_id, current)
+        stale = [
+            doc_id for doc_id, doc in store.docstore._dict.items()
+            if doc.metadata.get("drive_file_id") not in keep_file_ids
+        ]
+        if stale:
+            store.delete(stale)
+
+        texts, vectors = self._embed_documents(documents, progress)
+        if texts:
+            store.add_embeddings(list(zip(texts, vectors)), metadatas=[doc.metadata for doc in documents])
+
+        self.vector_store = store
+        self._save_and_publish(store, professor_id, subject_id, version, files)
+        return self.vector_store
+
+    def _load_version(self, professor_id, subject_id, version):
+        from langchain.vectorstores import FAISS
+        return FAISS.load_local(
+            version_path(professor_id, subject_id, version), self.embeddings,
+            allow_dangerous_deserialization=True
         )
-        return self.vector_store
\ No newline at end of file
+
+    def _load_legacy(self, professor_id, subject_id):
+        """Index saved before versioning, straight into the subject directory"""
+        from langchain.vectorstores import FAISS
+        path = subject_path(professor_id, subject_id)
+        if not os.path.exists(os.path.join(path, "index.faiss")):
+            return None
+        return FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+
+    def load_subject_vector_store(self, professor_id, subject_id):
+        """Load the published vector store of a subject, from the cache when it is current"""
+        version = published_version(professor_id, subject_id)
+        if version is None:
+            self.vector_store = self._load_legacy(professor_id, subject_id)
+            return self.vector_store
+
+        key = (professor_id, subject_id)
+        try:
+            self.vector_store = index_cache.get(
+                key, version, lambda: self._load_version(professor_id, subject_id, version)
+            )
+        except (FileNotFoundError, RuntimeError):
+            # The version was pruned between reading CURRENT and loading it; follow CURRENT again
+            version = published_version(professor_id, subject_id)
+            if version is None:
+                return None
+            self.vector_store = index_cache.get(
+                key, version, lambda: self._load_version(professor_id, subject_id, version)
+            )
+        return self.vector_store
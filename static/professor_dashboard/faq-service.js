@@ -10,34 +10,59 @@
  * Key Functions:
  * - loadFAQs(): Fetches and displays all FAQs for a subject
  * - answerQuestion(): Handles answering pending questions
+ * - answerCluster(): Answers a group of similar pending questions at once
  * - updateFAQ(): Updates existing FAQ questions/answers
  * - deleteFAQ(): Removes FAQ entries
  * - filterQuestions(): Switches between pending and all questions view
  */
 const FAQService = {
-    async loadFAQs(subjectId) {
+    faqState: {
+        page: {}
+    },
+
+    async loadFAQs(subjectId, page = this.faqState.page[subjectId] || 1) {
         try {
-            const response = await fetch(`/professor/faq/subject/${subjectId}/questions`);
+            const response = await fetch(`/professor/faq/subject/${subjectId}/questions?page=${page}`);
             if (!response.ok) throw new Error('Failed to load FAQs');
             
             const data = await response.json();
+            this.faqState.page[subjectId] = data.page;
+            data.clusters = await this.loadClusters(subjectId);
             this.updateFAQUI(subjectId, data);
-            this.updatePendingBadge(subjectId, data.pending_questions.length);
+            this.updatePendingBadge(subjectId, data.pending_total);
         } catch (error) {
             console.error('Error loading FAQs:', error);
             alert('Failed to load FAQs');
         }
     },
 
+    async loadClusters(subjectId) {
+        // Grouping is optional; without it pending questions are listed one by one
+        try {
+            const response = await fetch(`/professor/faq/subject/${subjectId}/questions/clusters`);
+            if (!response.ok) return [];
+            const data = await response.json();
+            return data.clusters.filter(cluster => cluster.size > 1);
+        } catch (error) {
+            console.error('Error loading question clusters:', error);
+            return [];
+        }
+    },
+
     updateFAQUI(subjectId, data) {
         const pendingContainer = document.getElementById(`pending-questions-${subjectId}`);
         const answeredContainer = document.getElementById(`answered-questions-${subjectId}`);
 
-        // Update pending questions
-        pendingContainer.innerHTML = this.createPendingQuestionsHTML(subjectId, data.pending_questions);
+        // Update pending questions, similar ones grouped
+        const clusters = data.clusters || [];
+        const grouped = new Set(clusters.flatMap(cluster => cluster.questions.map(q => q.number)));
+        const ungrouped = data.pending_questions.filter(q => !grouped.has(q.number));
+        pendingContainer.innerHTML = this.createClustersHTML(subjectId, clusters) +
+            (clusters.length && !ungrouped.length ? '' : this.createPendingQuestionsHTML(subjectId, ungrouped));
 
         // Update answered questions
-        answeredContainer.innerHTML = this.createAnsweredQuestionsHTML(subjectId, data.answered_questions);
+        answeredContainer.innerHTML = this.createAnsweredQuestionsHTML(subjectId, data.answered_questions) +
+            this.createPagerHTML(subjectId, data.page, data.total_pages);
     },
 
     createPendingQuestionsHTML(subjectId, questions) {
@@ -67,6 +92,75 @@ const FAQService = {
         `).join('');
     },
 
+    createPagerHTML(subjectId, page, totalPages) {
+        if (totalPages <= 1) return '';
+        return `
+            <div class="faq-pager">
+                <button class="btn btn-secondary btn-sm" ${page <= 1 ? 'disabled' : ''}
+                        onclick="FAQService.loadFAQs(${subjectId}, ${page - 1})">Previous</button>
+                <span>Page ${page} of ${totalPages}</span>
+                <button class="btn btn-secondary btn-sm" ${page >= totalPages ? 'disabled' : ''}
+                        onclick="FAQService.loadFAQs(${subjectId}, ${page + 1})">Next</button>
+            </div>
+        `;
+    },
+
+    createClustersHTML(subjectId, clusters) {
+        return clusters.map(cluster => `
+            <div class="faq-item pending faq-cluster" id="faq-cluster-${cluster.id}">
+                <div class="faq-question">
+                    <span class="question-number">${cluster.size} similar questions</span>
+                    <ul class="cluster-questions">
+                        ${cluster.questions.map(q => `
+                            <li>
+                                <span class="question-number">#${q.number}</span>
+                                <span class="question-text">${q.question}</span>
+                                <span class="question-date">Asked: ${q.date_asked}</span>
+                            </li>
+                        `).join('')}
+                    </ul>
+                </div>
+                <div class="faq-answer">
+                    <textarea class="answer-input" placeholder="One answer for all of these questions..."></textarea>
+                    <div class="answer-actions">
+                        <button onclick="FAQService.answerCluster(${subjectId}, ${cluster.id})" class="btn btn-primary">
+                            Answer All ${cluster.size}
+                        </button>
+                    </div>
+                </div>
+            </div>
+        `).join('');
+    },
+
+    async answerCluster(subjectId, clusterId) {
+        const answerInput = document.querySelector(`#faq-cluster-${clusterId} .answer-input`);
+        const answer = answerInput ? answerInput.value.trim() : '';
+        if (!answer) {
+            alert('Please provide an answer');
+            return;
+        }
+
+        try {
+            const response = await fetch(`/professor/faq/subject/${subjectId}/questions/clusters/${clusterId}/answer`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ answer: answer })
+            });
+
+            if (!response.ok) {
+                const errorData = await response.json();
+                throw new Error(errorData.error || 'Failed to submit answer');
+            }
+
+            await this.loadFAQs(subjectId);
+        } catch (error) {
+            console.error('Error answering question cluster:', error);
+            alert(error.message || 'Failed to submit answer');
+        }
+    },
+
     createAnsweredQuestionsHTML(subjectId, questions) {
         if (questions.length === 0) {
             return '<div class="no-questions">No answered questions</div>';
@@ -202,17 +202,36 @@ const FileService = {
         progressDiv.style.display = 'block';
         
         try {
-            for (let i = 0; i < files.length; i++) {
-                const file = files[i];
+            if (files.length > 1) {
+                // Several files go in one request; the server uploads them concurrently
                 const formData = new FormData();
-                formData.append('file', file);
+                files.forEach(file => formData.append('files', file));
+                
+                progressText.textContent = `Uploading ${files.length} files...`;
+                progressBar.style.width = '50%';
                 
-                // Update progress text
-                progressText.textContent = `Uploading ${i + 1}/${files.length}: ${file.name}`;
+                const response = await fetch(`/professor/drive/subjects/${subjectId}/upload/batch`, {
+                    method: 'POST',
+                    body: formData
+                });
+                
+                if (!response.ok) {
+                    throw new Error('Failed to upload files');
+                }
+                
+                const data = await response.json();
+                progressBar.style.width = '100%';
+                const failed = data.files.filter(result => !result.success);
+                if (failed.length) {
+                    throw new Error(`Failed to upload ${failed.map(result => result.name).join(', ')}`);
+                }
+            } else {
+                const file = files[0];
+                const formData = new FormData();
+                formData.append('file', file);
                 
-                // Calculate total progress
-                const progress = ((i + 1) / files.length) * 100;
-                progressBar.style.width = `${progress}%`;
+                progressText.textContent = `Uploading 1/1: ${file.name}`;
+                progressBar.style.width = '100%';
                 
                 const response = await fetch(`/professor/drive/subjects/${subjectId}/upload`, {
                     method: 'POST',
@@ -7,7 +7,8 @@
  * - Managing KB-related UI elements
  * 
  * Key Functions:
- * - updateKnowledgeBase(): Syncs files and updates the knowledge base
+ * - updateKnowledgeBase(): Syncs files and queues a knowledge base build
+ * - pollJob(): Follows a queued build and shows its progress on the button
  * - updateKnowledgeBaseButton(): Updates KB button state based on file count
  * - syncDriveFiles(): Synchronizes files with Google Drive
  */
@@ -20,6 +21,7 @@ const KnowledgeBaseService = {
 
         // Set loading state
         kbButton.disabled = true;
+        kbButton.title = '';
         kbButton.classList.add('loading');
         kbButton.innerHTML = `
             <div class="spinner"></div>
@@ -34,12 +36,15 @@ const KnowledgeBaseService = {
             
             if (!syncResponse.ok) throw new Error('Failed to sync files');
 
-            // Then update knowledge base
+            // Then queue the knowledge base build and follow it
             const kbResponse = await fetch(`/professor/subjects/${subjectId}/knowledge-base`, {
                 method: 'POST'
             });
 
             if (!kbResponse.ok) throw new Error('Failed to update knowledge base');
+            const job = await kbResponse.json();
+            const finished = await this.pollJob(job.status_url, kbButton);
+            if (finished.status !== 'succeeded') throw new Error(finished.error || 'Knowledge base build failed');
             
             // Success state
             kbButton.classList.remove('loading');
@@ -60,10 +65,47 @@ const KnowledgeBaseService = {
                 <i class="fas fa-exclamation-triangle"></i>
                 <span>Update Failed</span>
             `;
+            kbButton.title = error.message;
             kbButton.disabled = false;
         }
     },
 
+    async pollJob(statusUrl, kbButton, interval = 2000, queuedTimeout = 120000) {
+        const labels = {
+            sync: 'Syncing',
+            download: 'Downloading',
+            parse: 'Parsing',
+            split: 'Splitting',
+            embed: 'Embedding',
+            save: 'Saving'
+        };
+
+        // Builds run in `python -m src.jobs`; a job nobody claims means no runner is up
+        const queuedSince = Date.now();
+        while (true) {
+            const response = await fetch(statusUrl);
+            if (!response.ok) throw new Error('Failed to get knowledge base build status');
+            const job = await response.json();
+            if (job.status === 'succeeded' || job.status === 'failed') return job;
+            if (job.status === 'queued' && Date.now() - queuedSince > queuedTimeout) {
+                throw new Error('No build worker picked up the job; is python -m src.jobs running?');
+            }
+
+            let text = 'Queued...';
+            if (job.status === 'running') {
+                const progress = job.progress[job.stage];
+                text = labels[job.stage] || 'Building';
+                if (progress && progress.total) text += ` ${progress.done}/${progress.total}`;
+                text += '...';
+            }
+            kbButton.innerHTML = `
+                <div class="spinner"></div>
+                <span>${text}</span>
+            `;
+            await new Promise(resolve => setTimeout(resolve, interval));
+        }
+    },
+
     updateKnowledgeBaseButton(subjectId, fileCount = 0) {
         const kbButton = document.getElementById(`kb-btn-${subjectId}`);
         if (kbButton) {
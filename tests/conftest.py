@@ -0,0 +1,48 @@
+"""Shared fixtures; tests run against a throwaway SQLite file instead of university.db"""
+
+import atexit
+import itertools
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# src.config reads the environment once, on first import
+_db_dir = tempfile.mkdtemp(prefix="university-tests-")
+atexit.register(shutil.rmtree, _db_dir, ignore_errors=True)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_db_dir, "test.db")
+
+
+@pytest.fixture
+def db():
+    """Session on an emptied test database"""
+    from src.models import Base, SessionLocal, engine
+
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_subject(db):
+    """Factory for a subject owned by a new professor"""
+    from src.models import Subject, User
+
+    counter = itertools.count(1)
+
+    def make(name: str = "Algebra", **fields) -> Subject:
+        professor = User(username=f"prof{next(counter)}@example.edu", role="professor")
+        db.add(professor)
+        db.flush()
+        subject = Subject(name=name, professor_id=professor.id, **fields)
+        db.add(subject)
+        db.commit()
+        return subject
+
+    return make
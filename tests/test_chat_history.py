@@ -0,0 +1,80 @@
+"""Token-budgeted history truncation in src.chat_bot.ChatBot"""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from src import chat_bot
+from src.config import settings
+
+
+def _whitespace_tokens(text):
+    return len(text.split())
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    monkeypatch.setattr(chat_bot, "get_ner_pipeline", lambda: None)
+    monkeypatch.setattr(chat_bot, "count_tokens", _whitespace_tokens)
+    monkeypatch.setattr(settings, "HISTORY_SUMMARY_ENABLED", False)
+    return chat_bot.ChatBot(vector_store=None, subject_name="Algebra")
+
+
+def _exchange(i):
+    # "User: q<i> one two\nAssistant: a<i> one two" is 8 words, 9 tokens with the joining newline
+    return {"question": f"q{i} one two", "response": f"a{i} one two"}
+
+
+def test_keeps_the_newest_exchanges_that_fit_the_budget(bot, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_HISTORY_LENGTH", 10)
+    monkeypatch.setattr(settings, "MAX_HISTORY_TOKENS", 9 * 3 + 8)
+    bot.conversation_history = [_exchange(i) for i in range(6)]
+
+    history = bot._get_truncated_history()
+
+    assert [line.split()[1] for line in history.splitlines() if line.startswith("User:")] == ["q3", "q4", "q5"]
+
+
+def test_whole_exchanges_are_dropped_never_split(bot, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_HISTORY_LENGTH", 10)
+    monkeypatch.setattr(settings, "MAX_HISTORY_TOKENS", 9 * 2)
+    bot.conversation_history = [_exchange(0), _exchange(1), _exchange(2)]
+
+    assert bot._get_truncated_history() == "\n".join(
+        bot._format_exchange(item) for item in bot.conversation_history[1:]
+    )
+
+
+def test_an_exchange_over_the_budget_leaves_no_history(bot, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_HISTORY_TOKENS", 5)
+    bot.conversation_history = [_exchange(0)]
+
+    assert bot._get_truncated_history() == ""
+
+
+def test_history_length_limit_applies_before_the_token_budget(bot, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_HISTORY_LENGTH", 2)
+    monkeypatch.setattr(settings, "MAX_HISTORY_TOKENS", 10_000)
+    bot.conversation_history = [_exchange(i) for i in range(5)]
+
+    history = bot._get_truncated_history()
+
+    assert "q2" not in history
+    assert "q3" in history and "q4" in history
+
+
+def test_token_counts_are_cached_on_the_exchange(bot, monkeypatch):
+    calls = []
+
+    def counting(text):
+        calls.append(text)
+        return _whitespace_tokens(text)
+
+    monkeypatch.setattr(chat_bot, "count_tokens", counting)
+    bot.conversation_history = [_exchange(0), _exchange(1)]
+
+    bot._get_truncated_history()
+    bot._get_truncated_history()
+
+    assert len(calls) == 2
+    assert bot.conversation_history[0]["tokens"] == 9
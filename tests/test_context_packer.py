@@ -0,0 +1,70 @@
+"""Prompt context packing in src.context_packer"""
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain")
+from langchain.schema import Document
+
+from src import context_packer
+from src.config import settings
+
+
+@pytest.fixture(autouse=True)
+def whitespace_tokens(monkeypatch):
+    monkeypatch.setattr(context_packer, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(settings, "CONTEXT_DEDUP_THRESHOLD", 0.9)
+
+
+def _doc(text, source="notes.pdf", start=None):
+    metadata = {"source": source}
+    if start is not None:
+        metadata["start_index"] = start
+    return Document(page_content=text, metadata=metadata)
+
+
+def _words(prefix, count):
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+
+def test_near_duplicates_keep_the_most_relevant_copy():
+    best = _doc(_words("w", 30), source="a.pdf")
+    copy = _doc(_words("w", 30) + " extra", source="b.pdf")
+    other = _doc(_words("x", 30), source="c.pdf")
+
+    packed = context_packer.pack_context([best, copy, other], max_tokens=1000)
+
+    assert [doc.metadata["source"] for doc in packed] == ["a.pdf", "c.pdf"]
+
+
+def test_overlapping_chunks_of_one_source_are_merged():
+    first = _doc("alpha beta gamma delta", start=0)
+    second = _doc("gamma delta epsilon", start=len("alpha beta "))
+    other = _doc("unrelated text here", source="other.pdf")
+
+    packed = context_packer.pack_context([second, other, first], max_tokens=1000)
+
+    assert [doc.page_content for doc in packed] == ["alpha beta gamma delta epsilon", "unrelated text here"]
+    assert packed[0].metadata["start_index"] == 0
+
+
+def test_chunks_fill_the_budget_in_relevance_order():
+    docs = [
+        _doc(_words("a", 6), source="1"),
+        _doc(_words("b", 8), source="2"),   # does not fit after the first
+        _doc(_words("c", 3), source="3"),   # still fits
+        _doc(_words("d", 2), source="4"),   # budget used up
+    ]
+
+    packed = context_packer.pack_context(docs, max_tokens=10)
+
+    assert [doc.metadata["source"] for doc in packed] == ["1", "3"]
+    assert sum(len(doc.page_content.split()) for doc in packed) <= 10
+
+
+def test_the_best_chunk_is_sent_even_over_budget():
+    docs = [_doc(_words("a", 50), source="1"), _doc(_words("b", 40), source="2")]
+
+    packed = context_packer.pack_context(docs, max_tokens=10)
+
+    assert [doc.metadata["source"] for doc in packed] == ["1"]
@@ -0,0 +1,36 @@
+"""Parsing of faq.csv rows by src.faq_csv"""
+
+import io
+
+from src import faq_csv
+
+
+def _read(text: str):
+    return list(faq_csv.read_records(io.StringIO(text)))
+
+
+def test_malformed_numbers_are_read_as_missing():
+    records = _read(
+        "number,question,answer,date_asked,date_answered\n"
+        "3.0,Q3,,,\n"
+        "inf,Q-inf,,,\n"
+        "1e999,Q-huge,,,\n"
+        "nan,Q-nan,,,\n"
+        "abc,Q-abc,,,\n"
+    )
+    assert [(record['number'], record['question']) for record in records] == [
+        (3, "Q3"), (None, "Q-inf"), (None, "Q-huge"), (None, "Q-nan"), (None, "Q-abc")
+    ]
+
+
+def test_round_trip_skips_rows_without_question():
+    stream = io.StringIO()
+    faq_csv.write_records(stream, [
+        {'number': 1, 'question': 'What?', 'answer': 'This.', 'date_asked': '2024-01-01', 'date_answered': None},
+        {'number': 2, 'question': ' ', 'answer': None, 'date_asked': None, 'date_answered': None},
+    ])
+    records = _read(stream.getvalue())
+    assert records == [{
+        'number': 1, 'question': 'What?', 'answer': 'This.',
+        'date_asked': '2024-01-01', 'date_answered': None
+    }]
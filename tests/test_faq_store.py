@@ -0,0 +1,247 @@
+"""FAQ rows in the database (src.faq_store): numbering, Drive merges and the debounced exporter"""
+
+import hashlib
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from src import faq_store
+from src.models import FAQEntry, FAQSyncState, GoogleDriveCredentials
+
+HEADER = "number,question,answer,date_asked,date_answered\n"
+
+
+class RecordingExporter:
+    """Stands in for a background worker (exporter, clustering); records what was scheduled"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def schedule(self, subject_id, delay=None):
+        self.scheduled.append(subject_id)
+
+
+class FakeDrive:
+    """faq.csv in Drive: content plus a head revision that changes with every write"""
+
+    def __init__(self, content=HEADER):
+        self.content = content
+        self.revision = 1
+        self.downloads = 0
+        self.uploads = []
+
+    def edit(self, content):
+        """An edit made by hand in Drive"""
+        self.content = content
+        self.revision += 1
+
+    def get_file_revision(self, file_id):
+        return {
+            'headRevisionId': f"r{self.revision}",
+            'version': str(self.revision),
+            'md5Checksum': hashlib.md5(self.content.encode('utf-8')).hexdigest()
+        }
+
+    def download_file(self, file_id):
+        self.downloads += 1
+        return self.content
+
+    def update_file(self, file_id, content):
+        self.uploads.append(content)
+        self.edit(content)
+        return self.get_file_revision(file_id)
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    recording = RecordingExporter()
+    monkeypatch.setattr(faq_store, "faq_exporter", recording)
+    return recording
+
+
+@pytest.fixture
+def subject(db, make_subject):
+    subject = make_subject(faq_file_id="faq-file")
+    db.add(GoogleDriveCredentials(professor_id=subject.professor_id, token_info={}, is_active=True))
+    db.commit()
+    return subject
+
+
+def _import(db, subject, drive):
+    faq_store.ensure_imported(db, subject, lambda: drive)
+
+
+def _entries(db, subject_id):
+    db.expire_all()
+    return [
+        (entry.number, entry.question, entry.answer, entry.status)
+        for entry in db.query(FAQEntry).filter_by(subject_id=subject_id).order_by(FAQEntry.number)
+    ]
+
+
+def _version(db, subject_id):
+    db.expire_all()
+    state = db.get(FAQSyncState, subject_id)
+    return state.version, state.exported_version
+
+
+def test_import_renumbers_duplicate_and_missing_numbers(db, subject):
+    drive = FakeDrive(HEADER + "2,Q2,A2,,\n2,Q2 again,,,\n,Q-none,,,\n1,Q1,,,\n")
+    _import(db, subject, drive)
+    assert _entries(db, subject.id) == [
+        (1, "Q1", None, "pending"),
+        (2, "Q2", "A2", "answered"),
+        (3, "Q2 again", None, "pending"),
+        (4, "Q-none", None, "pending"),
+    ]
+
+
+def test_submissions_are_numbered_after_existing_questions(db, subject, exporter):
+    _import(db, subject, FakeDrive(HEADER + "1,Q1,A1,,\n"))
+    for question in ("Q2", "Q3"):
+        faq_store.submit_question(db, subject.id, question)
+    # Submissions wait in the inbox until the exporter drains them
+    assert _entries(db, subject.id) == [(1, "Q1", "A1", "answered")]
+    assert exporter.scheduled == [subject.id, subject.id]
+
+    assert faq_store.drain_submissions(db, subject.id) == 2
+    assert faq_store.drain_submissions(db, subject.id) == 0
+    assert _entries(db, subject.id) == [
+        (1, "Q1", "A1", "answered"),
+        (2, "Q2", None, "pending"),
+        (3, "Q3", None, "pending"),
+    ]
+    assert _version(db, subject.id) == (1, 0)
+
+
+def test_answering_marks_entries_answered_and_schedules_one_export(db, subject, exporter):
+    _import(db, subject, FakeDrive(HEADER + "1,Q1,,,\n2,Q2,,,\n3,Q3,,,\n"))
+    entries = [faq_store.get_entry(db, subject.id, number) for number in (1, 3)]
+
+    faq_store.answer_entries(db, entries, "Same answer")
+
+    assert _entries(db, subject.id) == [
+        (1, "Q1", "Same answer", "answered"),
+        (2, "Q2", None, "pending"),
+        (3, "Q3", "Same answer", "answered"),
+    ]
+    assert all(entry.date_answered for entry in entries)
+    assert exporter.scheduled == [subject.id]
+    assert _version(db, subject.id) == (1, 0)
+
+
+def test_delete_closes_the_gap_in_numbering(db, subject, exporter):
+    _import(db, subject, FakeDrive(HEADER + "1,Q1,,,\n2,Q2,,,\n3,Q3,A3,,\n4,Q4,,,\n"))
+
+    faq_store.delete_entry(db, faq_store.get_entry(db, subject.id, 2))
+
+    assert _entries(db, subject.id) == [
+        (1, "Q1", None, "pending"),
+        (2, "Q3", "A3", "answered"),
+        (3, "Q4", None, "pending"),
+    ]
+    assert exporter.scheduled == [subject.id]
+
+
+def test_drive_edit_replaces_rows_when_nothing_is_unexported(db, subject, exporter):
+    drive = FakeDrive(HEADER + "1,Q1,,,\n2,Q2,,,\n")
+    _import(db, subject, drive)
+    drive.edit(HEADER + "1,Q1,Answered in Drive,,\n3,Q3,,,\n")
+
+    assert faq_store.sync_from_drive(db, subject, drive) is True
+
+    assert _entries(db, subject.id) == [
+        (1, "Q1", "Answered in Drive", "answered"),
+        (3, "Q3", None, "pending"),
+    ]
+    # Drive is the latest state, so there is nothing to export back
+    assert _version(db, subject.id) == (0, 0)
+
+
+def test_drive_edit_is_merged_into_unexported_local_changes(db, subject, exporter):
+    drive = FakeDrive(HEADER + "1,Q1,,,\n2,Q2,,,\n")
+    _import(db, subject, drive)
+    faq_store.update_entry(db, faq_store.get_entry(db, subject.id, 1), answer="Local answer")
+    drive.edit(HEADER + "1,Q1,Drive answer,,\n2,Q2,Drive answer,,\n3,Drive only,,,\n")
+
+    assert faq_store.sync_from_drive(db, subject, drive) is True
+
+    # Local answers win, answers given only in Drive are kept, Drive-only questions are appended
+    assert _entries(db, subject.id) == [
+        (1, "Q1", "Local answer", "answered"),
+        (2, "Q2", "Drive answer", "answered"),
+        (3, "Drive only", None, "pending"),
+    ]
+    version, exported = _version(db, subject.id)
+    assert version > exported
+
+
+def test_unchanged_revision_is_not_downloaded(db, subject, exporter):
+    drive = FakeDrive(HEADER + "1,Q1,,,\n")
+    _import(db, subject, drive)
+    downloads = drive.downloads
+
+    assert faq_store.sync_from_drive(db, subject, drive) is False
+    assert drive.downloads == downloads
+
+
+def test_export_merges_a_concurrent_drive_edit_instead_of_overwriting_it(db, subject, exporter, monkeypatch):
+    drive = FakeDrive(HEADER + "1,Q1,,,\n")
+    clustering = RecordingExporter()
+    monkeypatch.setattr("src.google_drive.service_cache.get_drive_service", lambda professor_id, token_info: drive)
+    monkeypatch.setattr(faq_store.faq_clusters, "cluster_worker", clustering)
+    _import(db, subject, drive)
+    faq_store.submit_question(db, subject.id, "Student question")
+    drive.edit(HEADER + "1,Q1,Drive answer,,\n")
+
+    assert faq_store.FAQExporter(delay=0, retry_delay=0).export(subject.id) is True
+
+    records = faq_store.parse_csv(drive.uploads[-1])
+    assert [(r['number'], r['question'], r['answer']) for r in sorted(records, key=lambda r: r['number'])] == [
+        (1, "Q1", "Drive answer"),
+        (2, "Student question", None),
+    ]
+    version, exported = _version(db, subject.id)
+    assert version == exported
+    assert clustering.scheduled == [subject.id]
+
+
+class TestExporterDebounce:
+    @pytest.fixture
+    def exports(self, db, monkeypatch):
+        calls = []
+        done = threading.Event()
+
+        def export(self, subject_id):
+            calls.append((subject_id, time.monotonic()))
+            done.set()
+            return True
+
+        monkeypatch.setattr(faq_store.FAQExporter, "export", export)
+        return calls, done
+
+    def test_writes_within_the_delay_are_exported_once(self, exports):
+        calls, done = exports
+        exporter = faq_store.FAQExporter(delay=0.3, retry_delay=0)
+        started = time.monotonic()
+        for _ in range(5):
+            exporter.schedule(7)
+            time.sleep(0.02)
+
+        assert done.wait(2)
+        time.sleep(0.4)
+        assert [subject_id for subject_id, _ in calls] == [7]
+        assert calls[0][1] - started >= 0.3
+
+    def test_later_writes_do_not_postpone_the_first_deadline(self, exports):
+        calls, done = exports
+        exporter = faq_store.FAQExporter(delay=5, retry_delay=0)
+        started = time.monotonic()
+        exporter.schedule(7, delay=0.1)
+        exporter.schedule(7)
+
+        assert done.wait(2)
+        assert calls[0][1] - started < 1
@@ -0,0 +1,87 @@
+"""Hedged LLM completions in src.llm.hedging"""
+
+import threading
+import time
+
+import pytest
+
+from src.llm import hedging
+from src.llm.providers import LLMProvider
+
+
+class ScriptedProvider(LLMProvider):
+    """Streams per model: a delay before the first chunk, then the chunks, or an error"""
+
+    name = "scripted"
+
+    def __init__(self, script):
+        super().__init__("primary")
+        self.script = script
+        self.started = []
+        self.cancelled = {}
+
+    def complete(self, prompt, model=None):
+        return "".join(self.stream(prompt, model))
+
+    def stream(self, prompt, model=None, cancel=None):
+        delay, chunks = self.script[model]
+        self.started.append(model)
+        self.cancelled[model] = threading.Event()
+        deadline = time.monotonic() + delay
+        while time.monotonic() < deadline:
+            if cancel is not None and cancel.is_set():
+                self.cancelled[model].set()
+                return
+            time.sleep(0.005)
+        if isinstance(chunks, Exception):
+            raise chunks
+        for chunk in chunks:
+            if cancel is not None and cancel.is_set():
+                self.cancelled[model].set()
+                return
+            yield chunk
+
+
+def _hedged(script, hedge_after_ms=50):
+    provider = ScriptedProvider(script)
+    return provider, hedging.HedgedProvider(provider, fallback_model="fallback", hedge_after_ms=hedge_after_ms)
+
+
+def test_no_hedge_when_the_primary_answers_in_time():
+    provider, hedged = _hedged({"primary": (0, ["fast ", "answer"]), "fallback": (0, ["unused"])})
+    hedges = hedging.hedges_total.value(model="fallback")
+
+    assert hedged.complete("prompt") == "fast answer"
+    assert provider.started == ["primary"]
+    assert hedging.hedges_total.value(model="fallback") == hedges
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled():
+    provider, hedged = _hedged({"primary": (5, ["too late"]), "fallback": (0, ["fallback ", "answer"])})
+    hedges = hedging.hedges_total.value(model="fallback")
+    wins = hedging.wins_total.value(model="fallback")
+
+    started = time.monotonic()
+    assert hedged.complete("prompt") == "fallback answer"
+    assert time.monotonic() - started < 2
+
+    assert provider.started == ["primary", "fallback"]
+    assert provider.cancelled["primary"].wait(1)
+    assert hedging.hedges_total.value(model="fallback") == hedges + 1
+    assert hedging.wins_total.value(model="fallback") == wins + 1
+
+
+def test_primary_error_hedges_at_once():
+    provider, hedged = _hedged({"primary": (0, RuntimeError("503")), "fallback": (0, ["recovered"])},
+                               hedge_after_ms=10_000)
+
+    started = time.monotonic()
+    assert hedged.complete("prompt") == "recovered"
+    assert time.monotonic() - started < 2
+
+
+def test_both_failing_raises():
+    _, hedged = _hedged({"primary": (0, RuntimeError("primary down")), "fallback": (0, RuntimeError("fallback down"))})
+
+    with pytest.raises(RuntimeError):
+        hedged.complete("prompt")
@@ -0,0 +1,111 @@
+"""Knowledge base job queue (src.jobs) on a SQLite file database"""
+
+import threading
+from datetime import datetime, timedelta
+
+from src import jobs
+from src.config import settings
+from src.models import KBJob, SessionLocal
+
+
+def _status(db, job_id):
+    db.expire_all()
+    return jobs.get_job(db, job_id).status
+
+
+def test_enqueue_reuses_the_queued_job(db, make_subject):
+    subject = make_subject()
+    job, created = jobs.enqueue(db, subject.id, subject.professor_id, priority=-5, trigger='scheduled')
+    assert created
+
+    again, created = jobs.enqueue(db, subject.id, subject.professor_id, priority=0, full_rebuild=True)
+    assert not created
+    assert again.id == job.id
+    assert (again.priority, again.full_rebuild) == (0, True)
+
+    # A lower priority, incremental request changes nothing
+    again, created = jobs.enqueue(db, subject.id, subject.professor_id, priority=-10)
+    assert not created
+    assert (again.priority, again.full_rebuild) == (0, True)
+    assert db.query(KBJob).count() == 1
+
+
+def test_enqueue_while_running_queues_a_follow_up(db, make_subject):
+    subject = make_subject()
+    job, _ = jobs.enqueue(db, subject.id, subject.professor_id)
+    assert jobs.claim_next(db, "worker-1") == job.id
+
+    follow_up, created = jobs.enqueue(db, subject.id, subject.professor_id)
+    assert created
+    assert follow_up.id != job.id
+    # Never two builds of one subject at once
+    assert jobs.claim_next(db, "worker-2") is None
+
+
+def test_claim_takes_the_highest_priority_then_the_oldest(db, make_subject):
+    low, high, older = (make_subject(name) for name in ("Low", "High", "Older"))
+    older_job, _ = jobs.enqueue(db, older.id, older.professor_id, priority=1)
+    low_job, _ = jobs.enqueue(db, low.id, low.professor_id, priority=-1)
+    high_job, _ = jobs.enqueue(db, high.id, high.professor_id, priority=1)
+    older_job.created_at = datetime.utcnow() - timedelta(minutes=1)
+    db.commit()
+
+    claimed = [jobs.claim_next(db, "worker") for _ in range(4)]
+    assert claimed == [older_job.id, high_job.id, low_job.id, None]
+
+
+def test_concurrent_workers_claim_each_job_once(db, make_subject):
+    subjects = [make_subject(f"Subject{i}") for i in range(3)]
+    job_ids = {jobs.enqueue(db, s.id, s.professor_id)[0].id for s in subjects}
+
+    workers = 8
+    barrier = threading.Barrier(workers)
+    claims = []
+    lock = threading.Lock()
+
+    def worker(name):
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            while True:
+                job_id = jobs.claim_next(session, name)
+                if job_id is None:
+                    return
+                with lock:
+                    claims.append((job_id, name))
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker, args=(f"worker-{i}",)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(job_id for job_id, _ in claims) == sorted(job_ids)
+    db.expire_all()
+    for job_id, name in claims:
+        job = jobs.get_job(db, job_id)
+        assert (job.status, job.worker) == ('running', name)
+
+
+def test_fail_stale_only_fails_running_jobs_without_heartbeat(db, make_subject):
+    stale_subject, live_subject, queued_subject = (make_subject(name) for name in ("Stale", "Live", "Queued"))
+    stale, _ = jobs.enqueue(db, stale_subject.id, stale_subject.professor_id)
+    live, _ = jobs.enqueue(db, live_subject.id, live_subject.professor_id)
+    queued, _ = jobs.enqueue(db, queued_subject.id, queued_subject.professor_id, priority=-1)
+    assert jobs.claim_next(db, "worker") == stale.id
+    assert jobs.claim_next(db, "worker") == live.id
+    db.query(KBJob).filter_by(id=stale.id).update({
+        KBJob.heartbeat_at: datetime.utcnow() - timedelta(seconds=settings.JOB_STALE_AFTER + 1)
+    })
+    db.commit()
+
+    assert jobs.fail_stale(db) == 1
+
+    assert _status(db, stale.id) == 'failed'
+    assert jobs.get_job(db, stale.id).error == 'Worker stopped responding'
+    assert _status(db, live.id) == 'running'
+    assert _status(db, queued.id) == 'queued'
+    # The subject can be built again
+    assert jobs.enqueue(db, stale_subject.id, stale_subject.professor_id)[1]
@@ -0,0 +1,25 @@
+"""Prometheus text output of src.metrics"""
+
+from src.metrics import Counter, Histogram
+
+
+def test_label_values_are_escaped():
+    counter = Counter("requests_total", "Requests", ["subject"])
+    counter.inc(subject='say "hi"\\now\nplease')
+
+    assert counter.collect()[-1] == 'requests_total{subject="say \\"hi\\"\\\\now\\nplease"} 1.0'
+
+
+def test_histogram_series_escape_labels_next_to_le():
+    histogram = Histogram("latency_seconds", "Latency", ["stage"], buckets=(1.0,))
+    histogram.observe(0.5, stage='a"b')
+
+    assert 'latency_seconds_bucket{stage="a\\"b",le="1.0"} 1' in histogram.collect()
+    assert 'latency_seconds_count{stage="a\\"b"} 1' in histogram.collect()
+
+
+def test_plain_values_are_unchanged():
+    counter = Counter("jobs_total", "Jobs", ["status"])
+    counter.inc(status="ok")
+
+    assert counter.collect()[-1] == 'jobs_total{status="ok"} 1.0'
@@ -0,0 +1,42 @@
+"""Retry behaviour of src.google_drive.rate_limit.call_with_backoff"""
+
+import pytest
+
+httplib2 = pytest.importorskip("httplib2")
+errors = pytest.importorskip("googleapiclient.errors")
+
+from src.google_drive import rate_limit
+
+
+def _http_error(status: int) -> Exception:
+    return errors.HttpError(httplib2.Response({"status": status}), b"")
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda seconds: None)
+
+
+def test_retries_throttled_call_once_then_succeeds():
+    outcomes = [_http_error(429), "ok"]
+    calls = []
+
+    def call():
+        calls.append(1)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    before = rate_limit.retries_total.value()
+    assert rate_limit.call_with_backoff(call, professor_id=1) == "ok"
+    assert len(calls) == 2
+    assert rate_limit.retries_total.value() == before + 1
+
+
+def test_does_not_retry_client_errors():
+    def call():
+        raise _http_error(404)
+
+    with pytest.raises(errors.HttpError):
+        rate_limit.call_with_backoff(call, professor_id=1)
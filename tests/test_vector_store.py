@@ -0,0 +1,125 @@
+"""Versioned index publishing in src.vector_store: CURRENT pointer, staging and pruning"""
+
+import os
+
+import pytest
+
+pytest.importorskip("faiss")
+fake_embeddings = pytest.importorskip("langchain_community.embeddings")
+from langchain.schema import Document
+
+from src import vector_store
+from src.config import settings
+
+PROFESSOR, SUBJECT = 1, 1
+
+
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch):
+    """Indexes under a temporary data/ directory, a small deterministic embedding and an empty cache"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(vector_store, "_embeddings", fake_embeddings.DeterministicFakeEmbedding(size=16))
+    monkeypatch.setattr(vector_store, "index_cache", vector_store.IndexCache(max_size=4))
+    return tmp_path
+
+
+def _documents(*texts):
+    return [Document(page_content=text, metadata={"drive_file_id": text}) for text in texts]
+
+
+def _build(*texts):
+    vector_store.VectorStore().create_from_documents(_documents(*texts), PROFESSOR, SUBJECT)
+    return vector_store.published_version(PROFESSOR, SUBJECT)
+
+
+def _published_texts():
+    store = vector_store.VectorStore().load_subject_vector_store(PROFESSOR, SUBJECT)
+    return sorted(doc.page_content for doc in store.docstore._dict.values())
+
+
+def _versions():
+    return sorted(os.listdir(os.path.join(vector_store.subject_path(PROFESSOR, SUBJECT), "versions")))
+
+
+def _staging():
+    path = os.path.join(vector_store.subject_path(PROFESSOR, SUBJECT), "staging")
+    return os.listdir(path) if os.path.exists(path) else []
+
+
+def test_build_publishes_a_version_with_its_manifest():
+    version = _build("alpha", "beta")
+
+    assert _versions() == [version]
+    assert _published_texts() == ["alpha", "beta"]
+    manifest = vector_store.read_manifest(PROFESSOR, SUBJECT)
+    assert manifest["version"] == version
+    assert manifest["chunk_count"] == 2
+    assert _staging() == []
+
+
+def test_failed_embedding_leaves_the_previous_version_published(monkeypatch):
+    previous = _build("alpha")
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("embedding model crashed")
+
+    monkeypatch.setattr(vector_store.VectorStore, "_embed_documents", fail)
+    with pytest.raises(RuntimeError):
+        _build("beta")
+
+    assert vector_store.published_version(PROFESSOR, SUBJECT) == previous
+    assert _versions() == [previous]
+    assert _published_texts() == ["alpha"]
+
+
+def test_failed_publish_cleans_staging_and_keeps_the_previous_version(monkeypatch):
+    previous = _build("alpha")
+
+    def interrupted(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(vector_store, "publish", interrupted)
+    with pytest.raises(OSError):
+        _build("beta")
+
+    assert vector_store.published_version(PROFESSOR, SUBJECT) == previous
+    assert _staging() == []
+    assert _published_texts() == ["alpha"]
+
+
+def test_staging_left_by_a_killed_build_is_never_read():
+    previous = _build("alpha")
+    # A build killed mid-save leaves a partial staging directory behind
+    partial = os.path.join(vector_store.subject_path(PROFESSOR, SUBJECT), "staging", "v9999999999999999999-dead")
+    os.makedirs(partial)
+    with open(os.path.join(partial, "index.faiss"), "wb") as f:
+        f.write(b"truncated")
+
+    assert vector_store.published_version(PROFESSOR, SUBJECT) == previous
+    assert _published_texts() == ["alpha"]
+    assert _build("beta") != previous
+    assert _published_texts() == ["beta"]
+
+
+def test_a_build_finishing_after_a_newer_one_is_discarded(workspace):
+    older = "v1-older"
+    newer = _build("newer")
+    staging = os.path.join(workspace, "older-build")
+    os.makedirs(staging)
+
+    assert vector_store.publish(PROFESSOR, SUBJECT, staging, older) is False
+
+    assert vector_store.published_version(PROFESSOR, SUBJECT) == newer
+    assert not os.path.exists(staging)
+    assert _published_texts() == ["newer"]
+
+
+@pytest.mark.parametrize("keep", [0, 1, 2])
+def test_pruning_keeps_the_current_version(monkeypatch, keep):
+    monkeypatch.setattr(settings, "KB_KEEP_VERSIONS", keep)
+    built = [_build(f"build{i}") for i in range(4)]
+
+    current = vector_store.published_version(PROFESSOR, SUBJECT)
+    assert current == built[-1]
+    assert _versions() == sorted(built[-max(1, keep):])
+    assert _published_texts() == ["build3"]